@@ -156,9 +156,11 @@ class AnnotationPropertyClass(PropertyClass):
     raise ValueError("Cannot create a property value restriction on an annotation property!")
   
   def _get_indirect_values_for_individual(Prop, entity):
+    Props  = list(Prop.descendants(world = entity.namespace.world))
+    groups = entity.namespace.world._get_triples_ssps_spod([entity.storid], [P.storid for P in Props])
     values = [entity.namespace.ontology._to_python(o, d)
-              for P in Prop.descendants(world = entity.namespace.world)
-              for o, d in entity.namespace.world._get_triples_sp_od(entity.storid, P.storid)]
+              for P in Props
+              for o, d in groups.get((entity.storid, P.storid), ())]
     return values
   
   _get_indirect_values_for_class = _get_indirect_values_for_individual
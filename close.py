@@ -68,8 +68,11 @@ def close_world(self, Properties = None, close_instance_list = True, recursive =
             if isinstance(r.value, OneOf): range_instances.extend(r.value.instances)
             else: range_classes.append(r.value)
             
+      instance_storids = [instance.storid for instance in instances]
+      if Prop._inverse_storid: values = self.namespace.world._get_obj_triples_sspi_so(instance_storids, Prop.storid, Prop._inverse_storid)
+      else:                    values = self.namespace.world._get_obj_triples_ssp_so (instance_storids, Prop.storid)
       for instance in instances:
-        range_instances.extend(Prop[instance])
+        range_instances.extend(instance.namespace.ontology._to_python(o) for o in values.get(instance.storid, ()))
         for r in _inherited_property_value_restrictions(instance, Prop, set()):
           if   (r.type == SOME):  range_classes  .append(r.value)
           elif (r.type == VALUE): range_instances.append(r.value)
@@ -17,7 +17,9 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io, re, time, tempfile, shutil
 from functools import lru_cache
+from array import array
 
 import owlready2
 from owlready2.base import *
@@ -40,10 +42,11 @@ FLOAT_DATATYPES = { "http://www.w3.org/2001/XMLSchema#decimal", "http://www.w3.o
 
 
 class _FakeQueue(object):
-  def __init__(self, insert_objs, insert_datas, finish):
-    self.insert_objs  = insert_objs
-    self.insert_datas = insert_datas
-    self.finish       = finish
+  def __init__(self, insert_objs, insert_datas, finish, insert_encoded = None):
+    self.insert_objs    = insert_objs
+    self.insert_datas   = insert_datas
+    self.finish         = finish
+    self.insert_encoded = insert_encoded
     
   def put(self, args):
     command, triples = args
@@ -51,8 +54,371 @@ class _FakeQueue(object):
     elif command == "datas":  self.insert_datas(triples)
     elif command == "finish": return self.finish()
     elif command == "error":  raise OwlReadyOntologyParsingError(*args)
+    else:                     self.insert_encoded(command, triples)
     
     
+class _LoadProgress(object):
+  """Statistics of a load, reported to the progress callback as a dict with the following keys: phase ("parse", "diff",
+"analyze", "imports", "load_properties" or "done"), bytes_read and bytes_total (None if unknown), triples_parsed,
+triples_inserted, elapsed, triples_per_second and timings (seconds per phase; "abbreviate" and "insert" are the time spent
+importing the triples in the quadstore, and "parse" the rest of the time until the end of parsing, i.e. parsing or
+waiting for the parser process)."""
+  def __init__(self, callback):
+    self.callback         = callback
+    self.f                = None
+    self.bytes_read       = None
+    self.bytes_total      = None
+    self.triples_parsed   = 0
+    self.triples_inserted = 0
+    self.timings          = { "abbreviate" : 0.0, "insert" : 0.0 }
+    self.parse_time       = None
+    self.start            = time.perf_counter()
+    
+  def set_source(self, f, in_process = True):
+    self.f           = f if in_process else None # Otherwise, positions are sent by the parser process
+    self.bytes_total = _source_size(f)
+    
+  def batch(self, nb_parsed, nb_inserted, abbreviate_time, insert_time):
+    self.triples_parsed        += nb_parsed
+    self.triples_inserted      += nb_inserted
+    self.timings["abbreviate"] += abbreviate_time
+    self.timings["insert"]     += insert_time
+    if not self.f is None: self.bytes_read = _tell(self.f)
+    if nb_parsed: self.report("parse")
+    
+  def add_bytes_read(self, nb): self.bytes_read = (self.bytes_read or 0) + nb
+  
+  def phase(self, phase, duration):
+    if self.parse_time is None: # End of parsing
+      self.parse_time = max(0.0, time.perf_counter() - self.start - duration - self.timings["abbreviate"] - self.timings["insert"])
+      if not self.bytes_total is None: self.bytes_read = self.bytes_total
+    self.timings[phase] = self.timings.get(phase, 0.0) + duration
+    self.report(phase)
+    
+  def report(self, phase):
+    elapsed = time.perf_counter() - self.start
+    timings = dict(self.timings)
+    if self.parse_time is None: timings["parse"] = max(0.0, elapsed - timings["abbreviate"] - timings["insert"])
+    else:                       timings["parse"] = self.parse_time
+    self.callback({
+      "phase"              : phase,
+      "bytes_read"         : self.bytes_read,
+      "bytes_total"        : self.bytes_total,
+      "triples_parsed"     : self.triples_parsed,
+      "triples_inserted"   : self.triples_inserted,
+      "elapsed"            : elapsed,
+      "triples_per_second" : self.triples_parsed / elapsed if elapsed else 0.0,
+      "timings"            : timings,
+    })
+    
+def _compressed_source(f):
+  if isinstance(getattr(f, "raw", None), _DecompressedReader): return f.raw.f # Progress is measured on the compressed file
+  return f
+
+def _source_size(f):
+  f = _compressed_source(f)
+  try:    return os.fstat(f.fileno()).st_size
+  except: pass
+  if isinstance(f, io.BytesIO): return len(f.getbuffer())
+  length = getattr(f, "headers", None) and f.headers.get("Content-Length") # URL
+  if length: return int(length)
+  
+def _tell(f):
+  f = _compressed_source(f)
+  try:    return f.tell()
+  except: return None
+  
+
+class _EncodingQueue(object):
+  """Wraps the queue of a parser worker process. In the batches of triples, IRIs are replaced by integer ids local to
+the worker, and sent as arrays of 64-bit integers; the IRIs not seen before are sent first, with their ids.
+If f is given, the number of bytes read in f since the previous batch is sent before each batch (for progress reports)."""
+  def __init__(self, queue, f = None):
+    self.queue    = queue
+    self.ids      = {}
+    self.f        = f
+    self.position = 0 if f is None else f.tell()
+    
+  def put(self, args):
+    command, triples = args
+    if (not self.f is None) and (command == "objs" or command == "datas"):
+      position = self.f.tell()
+      self.queue.put(("bytes_read", position - self.position))
+      self.position = position
+    if   command == "objs":
+      start, ids = self._encode(x for triple in triples for x in triple)
+      self.queue.put(("objs_ids", ids.tobytes()))
+    elif command == "datas":
+      start, ids = self._encode(x for s, p, o, d in triples for x in (s, p, d))
+      self.queue.put(("datas_ids", (ids.tobytes(), [o for s, p, o, d in triples])))
+    else:
+      return self.queue.put(args)
+    
+  def _encode(self, iris):
+    ids   = self.ids
+    start = len(ids)
+    new   = []
+    def get_id(iri):
+      i = ids.get(iri)
+      if i is None:
+        i = ids[iri] = len(ids)
+        new.append(iri)
+      return i
+    encoded = array("q", [get_id(iri) for iri in iris])
+    if new: self.queue.put(("iris", (start, new)))
+    return start, encoded
+  
+  
+    
+def _parse_ntriples(f, queue, default_base, batch_size):
+  if owlready2_optimized:
+    owlready2_optimized.parse_ntriples(f, queue, default_base, batch_size)
+    return
+  
+  splitter     = re.compile("\\s")
+  objs         = []
+  datas        = []
+  current_line = 0
+  try:
+    line = f.readline().decode("utf8")
+    while line:
+      current_line += 1
+      if (not line.startswith("#")) and (not line.startswith("\n")):
+        if not line.endswith("\n"): s,p,o = splitter.split(line[:-2], 2)
+        else:                       s,p,o = splitter.split(line[:-3], 2)
+        
+        if s.startswith("<"): s = s[1:-1]
+        
+        p = p[1:-1]
+        
+        if   o.startswith("<"):
+          objs.append((s, p, o[1:-1]))
+          if len(objs) > batch_size:
+            queue.put(("objs", objs))
+            objs = []
+            
+        elif o.startswith("_"): objs.append((s, p, o))
+          
+        else: #if o.startswith('"'):
+          o, d = o.rsplit('"', 1)
+          if d.startswith("^"):
+            d = d[3:-1]
+            if   d in INT_DATATYPES:   o = int  (o[1:])
+            elif d in FLOAT_DATATYPES: o = float(o[1:])
+            else:                      o = o[1:].encode("raw-unicode-escape").decode("unicode-escape")
+          elif d.startswith("@"):      o = o[1:].encode("raw-unicode-escape").decode("unicode-escape")
+          else:                        o = o[1:].encode("raw-unicode-escape").decode("unicode-escape"); d = ""
+          datas.append((s, p, o, d))
+          if len(datas) > batch_size:
+            queue.put(("datas", datas))
+            datas = []
+            
+      line = f.readline().decode("utf8")
+  except Exception as e:
+    e.ntriples_line = current_line
+    raise
+  
+  if objs:  queue.put(("objs", objs))
+  if datas: queue.put(("datas", datas))
+  
+  
+_NQUAD = re.compile(r"""(<[^>]*>|_:\S+)\s+<([^>]*)>\s+(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)\s*(?:<([^>]*)>)?\s*\.\s*$""")
+
+def _parse_nquads(f, queue, batch_size):
+  """parses an N-Quads file; the batches put in queue are ("objs", [(s,p,o,g)]) and ("datas", [(s,p,o,d,g)]), with g None for the default graph."""
+  match        = _NQUAD.match
+  objs         = []
+  datas        = []
+  current_line = 0
+  for line in f:
+    current_line += 1
+    try:
+      line = line.decode("utf8")
+      if line.startswith("#") or (not line.strip()): continue
+      s, p, o, g = match(line).groups()
+      if s.startswith("<"): s = s[1:-1]
+      
+      if   o.startswith("<"): objs.append((s, p, o[1:-1], g))
+      elif o.startswith("_"): objs.append((s, p, o, g))
+      else:
+        o, d = o.rsplit('"', 1)
+        if d.startswith("^"):
+          d = d[3:-1]
+          if   d in INT_DATATYPES:   o = int  (o[1:])
+          elif d in FLOAT_DATATYPES: o = float(o[1:])
+          else:                      o = o[1:].encode("raw-unicode-escape").decode("unicode-escape")
+        elif d.startswith("@"):      o = o[1:].encode("raw-unicode-escape").decode("unicode-escape")
+        else:                        o = o[1:].encode("raw-unicode-escape").decode("unicode-escape"); d = ""
+        datas.append((s, p, o, d, g))
+        
+    except Exception as e:
+      e.ntriples_line = current_line
+      raise
+    
+    if len(objs) > batch_size:
+      queue.put(("objs", objs))
+      objs = []
+    if len(datas) > batch_size:
+      queue.put(("datas", datas))
+      datas = []
+      
+  if objs:  queue.put(("objs", objs))
+  if datas: queue.put(("datas", datas))
+  
+  
+_PARALLEL_NTRIPLES_MIN_SIZE   = 8000000  # Smaller N-Triples files are parsed in the current process
+_PARALLEL_NTRIPLES_CHUNK_SIZE = 16000000 # Approximate size of the chunks parsed by each worker process
+
+def _nb_cpus():
+  try:                   return len(os.sched_getaffinity(0))
+  except AttributeError: return os.cpu_count() or 1
+  
+class _ListQueue(list):
+  def put(self, args): self.append(args)
+  
+def _split_ntriples(filename, chunk_size = None):
+  """returns (start, end) byte ranges of the file, cut at line boundaries."""
+  chunk_size = chunk_size or _PARALLEL_NTRIPLES_CHUNK_SIZE
+  size       = os.path.getsize(filename)
+  bounds     = [0]
+  with open(filename, "rb") as f:
+    while bounds[-1] + chunk_size < size:
+      f.seek(bounds[-1] + chunk_size)
+      f.readline()
+      if f.tell() >= size: break
+      bounds.append(f.tell())
+  bounds.append(size)
+  return list(zip(bounds[:-1], bounds[1:]))
+
+def _parse_ntriples_chunk(args):
+  filename, start, end, default_base = args
+  with open(filename, "rb") as f:
+    f.seek(start)
+    data = f.read(end - start)
+  queue = _ListQueue()
+  queue.put(("bytes_read", end - start))
+  try:
+    _parse_ntriples(io.BytesIO(data), _EncodingQueue(queue), default_base, 800000)
+  except Exception as e:
+    if getattr(e, "ntriples_line", 0): # Make the line number relative to the whole file
+      with open(filename, "rb") as f: e.ntriples_line += sum(block.count(b"\n") for block in iter(lambda: f.read(min(1048576, start - f.tell())), b""))
+    raise
+  return queue # Encoded with ids local to the chunk; the importer resets its id table at the beginning of each chunk
+
+def _parse_ntriples_parallel(filename, queue, default_base, memory_budget = None):
+  """parses an N-Triples file by chunks in a pool of worker processes; the current process imports the triples in queue."""
+  import multiprocessing
+  nb_workers = _nb_cpus()
+  if memory_budget: # Each chunk in flight is held in memory twice (as text, then as encoded triples)
+    chunks = _split_ntriples(filename, max(1000000, min(_PARALLEL_NTRIPLES_CHUNK_SIZE, memory_budget // (4 * nb_workers))))
+  else:
+    chunks = _split_ntriples(filename)
+  with multiprocessing.Pool(min(len(chunks), nb_workers)) as pool:
+    tasks = [(filename, start, end, default_base) for start, end in chunks]
+    if memory_budget: results = _imap_bounded(pool, _parse_ntriples_chunk, tasks, nb_workers)
+    else:             results = pool.imap_unordered(_parse_ntriples_chunk, tasks)
+    for commands in results:
+      for command in commands: queue.put(command)
+      
+def _imap_bounded(pool, func, tasks, max_in_flight):
+  """like pool.imap(), but does not submit more than max_in_flight tasks ahead of the results consumed (back-pressure)."""
+  from collections import deque
+  pending = deque()
+  for task in tasks:
+    pending.append(pool.apply_async(func, (task,)))
+    if len(pending) >= max_in_flight: yield pending.popleft().get()
+  while pending: yield pending.popleft().get()
+  
+_BYTES_PER_TRIPLE = 400 # Rough size of a parsed triple in a batch (Python tuple and strings)
+
+def _budget_batch_size(memory_budget, batch_size):
+  """returns the size of the batches of triples for parsing with the given memory budget (in bytes), if any. Up to 4 batches may be
+alive at the same time (one being filled, two in a queue and one being imported), and they get half of the budget."""
+  if not memory_budget: return batch_size
+  return max(1000, min(batch_size, memory_budget // (8 * _BYTES_PER_TRIPLE)))
+
+
+_PARALLEL_MIN_SIZE = 8000000 # Smaller RDF/XML, OWL/XML and Turtle files are parsed in the current process
+
+def _parse_rdf(f, format, default_base, queue, batch_size = 30000, memory_budget = None):
+  try:
+    return _parse_rdf_raising(f, format, default_base, queue, batch_size, memory_budget)
+  except Exception as e:
+    sys.excepthook(*sys.exc_info())
+    queue.put(("error", e.args))
+    
+def _parse_rdf_raising(f, format, default_base, queue, batch_size = 30000, memory_budget = None):
+  """same as _parse_rdf(), but raises parsing errors instead of reporting them and putting them in the queue."""
+  if owlready2_optimized:
+    if   format == "rdfxml": owlready2_optimized.parse_rdfxml(f, queue, default_base, batch_size, memory_budget)
+    elif format == "owlxml": owlready2_optimized.parse_owlxml(f, queue, default_base, batch_size)
+    else:                    owlready2_optimized.parse_turtle(f, queue, default_base, batch_size)
+  else:
+    batch_size = min(batch_size, 30000) # Larger batches do not speed up the Python parsers
+    objs  = []
+    datas = []
+    def on_prepare_obj(*triple):
+      nonlocal objs
+      objs.append(triple)
+      if len(objs) > batch_size: queue.put(("objs", objs));  objs = []
+    def on_prepare_data(*triple):
+      nonlocal datas
+      datas.append(triple)
+      if len(datas) > batch_size: queue.put(("datas", datas)); datas = []
+    if   format == "rdfxml":
+      import owlready2.rdfxml_2_ntriples
+      owlready2.rdfxml_2_ntriples.parse(f, on_prepare_obj, on_prepare_data, None, default_base, memory_budget)
+    elif format == "owlxml":
+      import owlready2.owlxml_2_ntriples
+      owlready2.owlxml_2_ntriples.parse(f, on_prepare_obj, on_prepare_data, None, default_base)
+    else:
+      import owlready2.turtle_2_ntriples
+      owlready2.turtle_2_ntriples.parse(f, on_prepare_obj, on_prepare_data, None, default_base)
+      
+    if objs:  queue.put(("objs",  objs))
+    if datas: queue.put(("datas", datas))
+    
+  return queue.put(("finish", None))
+  
+    
+def _parse_rdf_file(filename, start, format, default_base, queue, memory_budget = None):
+  """parses an RDF/XML, OWL/XML or Turtle file in a worker process. The file is reopened by name, so as the worker can be spawned as well as forked."""
+  with open(filename, "rb") as f:
+    f.seek(start)
+    _parse_rdf(f, format, default_base, _EncodingQueue(queue, f), _budget_batch_size(memory_budget, 30000), memory_budget)
+    
+    
+def _parse_onto_source(args):
+  """parses the file or URL of an ontology in a worker process, and returns the batches of triples, encoded with ids local
+to the worker (see _EncodingQueue), or None if the source cannot be read or parsed (the error is not reported here, but when the
+ontology is then loaded as usual). The format is guessed, since each import may have its own format. Other errors are raised."""
+  import urllib.request, urllib.error
+  f, default_base = args
+  queue = _ListQueue()
+  try:
+    if f.startswith(("http:", "https:")):
+      fileobj = urllib.request.urlopen(f)
+    else:
+      fileobj = open(f, "rb")
+    fileobj = _open_decompressed(fileobj)
+    try:
+      format = _guess_format(fileobj)
+      if format == "ntriples":
+        try:
+          _parse_ntriples(fileobj, _EncodingQueue(queue), default_base, 800000)
+        except ValueError as e:
+          raise OwlReadyOntologyParsingError("NTriples parsing error in %s, line %s." % (f, getattr(e, "ntriples_line", "?"))) from e
+        queue.put(("finish", None))
+      else:
+        _parse_rdf_raising(fileobj, format, default_base, _EncodingQueue(queue), 800000)
+    finally:
+      fileobj.close()
+  except (OSError, OwlReadyOntologyParsingError, urllib.error.URLError):
+    return None
+  if queue[-1][0] != "finish": return None
+  return queue
+  
+
 class BaseGraph(object):
   _SUPPORT_CLONING = False
   #READ_METHODS  = ["_refactor", "_new_numbered_iri", "_abbreviate", "_unabbreviate",
@@ -69,9 +435,12 @@ class BaseGraph(object):
                    
                    "_get_triples_spod_spod", "_get_triples_sp_od", "_get_triple_sp_od", "_get_triples_s_pod", "_get_triples_s_p", "_get_obj_triples_o_p",
                    
-                   "_get_obj_triples_transitive_sp", "_get_obj_triples_transitive_po", "_get_obj_triples_transitive_sym", "_get_obj_triples_transitive_sp_indirect"]
+                   "_get_obj_triples_transitive_sp", "_get_obj_triples_transitive_po", "_get_obj_triples_transitive_sym", "_get_obj_triples_transitive_sp_indirect",
+                   
+                   "_get_obj_triples_ssp_so", "_get_obj_triples_ssp_sco", "_get_obj_triples_sspi_so", "_get_data_triples_ssp_sod", "_get_triples_ssp_sod",
+                   "_get_obj_triples_ssps_spo", "_get_data_triples_ssps_spod", "_get_triples_ssps_spod", "_get_obj_triples_psos_pos"]
   
-  WORLD_METHODS = [] # "get_equivs_s_o"
+  WORLD_METHODS = ["_is_subsumed"] # "get_equivs_s_o"
   
   ONTO_METHODS = ["_add_obj_triple_raw_spo", "_set_obj_triple_raw_spo", "_add_data_triple_raw_spod", "_set_data_triple_raw_spod"]
   
@@ -83,6 +452,8 @@ class BaseGraph(object):
     
   def save(self, f, format = "pretty-xml", filter = None): raise NotImplementedError
   
+  def snapshot_to(self, filename, progress = None): raise NotImplementedError
+  
   def _abbreviate  (self, iri, create_if_missing = True): return iri
   def _unabbreviate(self, iri): return iri
   
@@ -135,7 +506,22 @@ class BaseGraph(object):
   
 
 class BaseMainGraph(BaseGraph):
-  def parse(self, f): raise NotImplementedError
+  def parse(self, f, format = "nquads", get_context = None, delete_existing_triples = True, memory_budget = None):
+    """loads an N-Quads file in the contexts given by get_context(graph_iri); returns the list of the contexts loaded."""
+    if format != "nquads": raise ValueError("Cannot load '%s' format in a world; only 'nquads' is supported (use Ontology.load() for other formats)." % format)
+    decompressed = _open_decompressed(f)
+    if not decompressed is f:
+      with decompressed: return self.parse(decompressed, format, get_context, delete_existing_triples, memory_budget)
+      
+    queue = _FakeQueue(*self.import_quads_from_queue(None, get_context, getattr(f, "name", ""), delete_existing_triples))
+    try:
+      _parse_nquads(f, queue, _budget_batch_size(memory_budget, 800000))
+    except Exception as e:
+      if not getattr(e, "ntriples_line", 0): raise
+      raise OwlReadyOntologyParsingError("NQuads parsing error in %s, line %s." % (getattr(f, "name", getattr(f, "url", "???")), e.ntriples_line)) from e
+    return queue.put(("finish", None))
+  
+  def import_quads_from_queue(self, queue, get_context, filename = None, delete_existing_triples = True): raise NotImplementedError
   
   def save(self, f, format = "rdfxml", **kargs): _save(f, format, self, **kargs)
   
@@ -145,63 +531,33 @@ class BaseSubGraph(BaseGraph):
     self.parent = parent
     self.onto   = onto
     
-  def parse(self, f, format = None, delete_existing_triples = True, default_base = ""):
+  def parse(self, f, format = None, delete_existing_triples = True, default_base = "", incremental = False, memory_budget = None, progress = None):
+    decompressed = _open_decompressed(f)
+    if not decompressed is f:
+      with decompressed: return self.parse(decompressed, format, delete_existing_triples, default_base, incremental, memory_budget, progress)
+      
     format = format or _guess_format(f)
+    if progress and not isinstance(progress, _LoadProgress): progress = _LoadProgress(progress)
+    batch_size = _budget_batch_size(memory_budget, 100000 if progress else 800000) # Smaller batches for more frequent progress reports
     
     if   format == "ntriples":
       current_line = 0
       try:
-        queue = _FakeQueue(*self.import_triples_from_queue(None, getattr(f, "name", ""), delete_existing_triples))
-        if  owlready2_optimized:
-          owlready2_optimized.parse_ntriples(f, queue, default_base, 800000)
-          
-        else:
-          splitter = re.compile("\\s")
-          objs  = []
-          datas = []
-          line  = f.readline().decode("utf8")
-          while line:
-            current_line += 1
-            if (not line.startswith("#")) and (not line.startswith("\n")):
-              if not line.endswith("\n"): s,p,o = splitter.split(line[:-2], 2)
-              else:                       s,p,o = splitter.split(line[:-3], 2)
-              
-              if s.startswith("<"): s = s[1:-1]
-              
-              p = p[1:-1]
-              
-              if   o.startswith("<"):
-                objs.append((s, p, o[1:-1]))
-                if len(objs) > 800000:
-                  queue.put(("objs", objs))
-                  objs = []
-                  
-              elif o.startswith("_"): objs.append((s, p, o))
-                
-              else: #if o.startswith('"'):
-                o, d = o.rsplit('"', 1)
-                if d.startswith("^"):
-                  d = d[3:-1]
-                  if   d in INT_DATATYPES:   o = int  (o[1:])
-                  elif d in FLOAT_DATATYPES: o = float(o[1:])
-                  else:                      o = o[1:].encode("raw-unicode-escape").decode("unicode-escape")
-                elif d.startswith("@"):      o = o[1:].encode("raw-unicode-escape").decode("unicode-escape")
-                else:                        o = o[1:].encode("raw-unicode-escape").decode("unicode-escape"); d = ""
-                datas.append((s, p, o, d))
-                if len(datas) > 800000:
-                  queue.put(("datas", datas))
-                  datas = []
-                  
-            line = f.readline().decode("utf8")
-            
-          if objs:  queue.put(("objs", objs))
-          if datas: queue.put(("datas", datas))
+        try:
+          parallel = isinstance(f, io.BufferedReader) and f.seekable() and (os.path.getsize(f.name) >= _PARALLEL_NTRIPLES_MIN_SIZE) and (_nb_cpus() > 1)
+        except:
+          parallel = False
           
+        if progress: progress.set_source(f, not parallel)
+        queue = _FakeQueue(*self.import_triples_from_queue(None, getattr(f, "name", ""), delete_existing_triples, incremental, progress))
+        if parallel: _parse_ntriples_parallel(f.name, queue, default_base, memory_budget)
+        else:        _parse_ntriples(f, queue, default_base, batch_size)
         onto_base_iri = queue.put(("finish", None))
-
+        
       except Exception as e:
         if len(self) == 0:
           self._add_obj_triple_raw_spo(self.onto.storid, rdf_type, owl_ontology)
+        current_line = getattr(e, "ntriples_line", 0)
         if current_line:
           raise OwlReadyOntologyParsingError("NTriples parsing error (or unrecognized file format) in %s, line %s." % (getattr(f, "name", getattr(f, "url", "???")), current_line)) from e
         else:
@@ -209,58 +565,21 @@ class BaseSubGraph(BaseGraph):
 
         
     else:
-      queue = None
-      def do_parse(batch_size = 30000):
-        nonlocal queue
-        try:
-          if owlready2_optimized:
-            if   format == "rdfxml": owlready2_optimized.parse_rdfxml(f, queue, default_base, batch_size)
-            elif format == "owlxml": owlready2_optimized.parse_owlxml(f, queue, default_base, batch_size)
-          else:
-            objs  = []
-            datas = []
-            def on_prepare_obj(*triple):
-              nonlocal objs
-              objs.append(triple)
-              if len(objs) > 30000: queue.put(("objs", objs));  objs = []
-            def on_prepare_data(*triple):
-              nonlocal datas
-              datas.append(triple)
-              if len(datas) > 30000: queue.put(("datas", datas)); datas = []
-            if format == "rdfxml":
-              import owlready2.rdfxml_2_ntriples
-              owlready2.rdfxml_2_ntriples.parse(f, on_prepare_obj, on_prepare_data, None, default_base)
-            else:
-              import owlready2.owlxml_2_ntriples
-              owlready2.owlxml_2_ntriples.parse(f, on_prepare_obj, on_prepare_data, None, default_base)
-              
-            if objs:  queue.put(("objs",  objs))
-            if datas: queue.put(("datas", datas))
-            
-          return queue.put(("finish", None))
-          
-        except Exception as e:
-          sys.excepthook(*sys.exc_info())
-          queue.put(("error", e.args))
-          
       try:
-        parallel = os.path.getsize(f.name) >= 8000000
-        if parallel:
-          import multiprocessing
-          if multiprocessing.get_start_method() != "fork":
-            parallel = False # Spawn is not supported -- I still need to figure out how to transfer the file object to the spawned process
-            
+        parallel = isinstance(f, io.BufferedReader) and f.seekable() and (os.path.getsize(f.name) >= _PARALLEL_MIN_SIZE)
       except:
         parallel = False
         
+      if progress: progress.set_source(f, not parallel)
       try:
         if parallel:
-          queue = multiprocessing.Queue()
-          multiprocessing.Process(target = do_parse).start()
-          onto_base_iri = self.import_triples_from_queue(queue, getattr(f, "name", ""), delete_existing_triples)
+          import multiprocessing
+          queue = multiprocessing.Queue(2 if memory_budget else 0) # Bounded queue: the parser waits for the importer
+          multiprocessing.Process(target = _parse_rdf_file, args = (f.name, f.tell(), format, default_base, queue, memory_budget)).start()
+          onto_base_iri = self.import_triples_from_queue(queue, getattr(f, "name", ""), delete_existing_triples, incremental, progress)
         else:
-          queue = _FakeQueue(*self.import_triples_from_queue(None, getattr(f, "name", ""), delete_existing_triples))
-          onto_base_iri = do_parse(800000)
+          queue = _FakeQueue(*self.import_triples_from_queue(None, getattr(f, "name", ""), delete_existing_triples, incremental, progress))
+          onto_base_iri = _parse_rdf(f, format, default_base, queue, batch_size, memory_budget)
           
       except OwlReadyOntologyParsingError as e:
         if len(self) == 0: self._add_obj_triple_raw_spo(self.onto.storid, rdf_type, owl_ontology)
@@ -275,6 +594,173 @@ class BaseSubGraph(BaseGraph):
 
 
           
+_COMPRESSED_EXTENSIONS = { ".gz" : "gzip", ".bz2" : "bz2", ".xz" : "xz", ".zst" : "zstd" }
+_COMPRESSED_MAGICS     = [(b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd")]
+_DECOMPRESS_CHUNK_SIZE = 1048576
+_COMPRESS_CHUNK_SIZE   = 1048576
+
+class _DecompressedReader(io.RawIOBase):
+  """reads a compressed file, decompressed in a background thread so as the parser does not wait for decompression
+(zlib, bz2 and lzma release the GIL while decompressing). Use _open_decompressed() to get a buffered reader."""
+  def __init__(self, f, compression):
+    import threading, queue
+    self.f       = f
+    self.name    = getattr(f, "name", "")
+    self.chunks  = queue.Queue(8)
+    self.chunk   = b""
+    self.pos     = 0
+    self.eof     = False
+    self.stopped = False
+    if   compression == "gzip":
+      import gzip
+      self.decompressed = gzip.GzipFile(fileobj = f, mode = "rb")
+    elif compression == "bz2":
+      import bz2
+      self.decompressed = bz2.BZ2File(f, "rb")
+    elif compression == "xz":
+      import lzma
+      self.decompressed = lzma.LZMAFile(f, "rb")
+    else:
+      try:
+        from compression import zstd # Python >= 3.14
+        self.decompressed = zstd.ZstdFile(f, "rb")
+      except ImportError:
+        try: import zstandard
+        except ImportError: raise ImportError("Reading Zstandard-compressed files requires Python >= 3.14 or the 'zstandard' module.")
+        self.decompressed = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames = True)
+    self.thread = threading.Thread(target = self._decompress, daemon = True)
+    self.thread.start()
+    
+  def _decompress(self):
+    try:
+      while not self.stopped:
+        chunk = self.decompressed.read(_DECOMPRESS_CHUNK_SIZE)
+        self.chunks.put(chunk)
+        if not chunk: break
+    except Exception as e:
+      self.chunks.put(e)
+      
+  def readable(self): return True
+  
+  def readinto(self, b):
+    if self.pos >= len(self.chunk):
+      if self.eof: return 0
+      self.chunk = self.chunks.get()
+      self.pos   = 0
+      if not isinstance(self.chunk, bytes):
+        e, self.chunk, self.eof = self.chunk, b"", True
+        raise e
+      if not self.chunk:
+        self.eof = True
+        return 0
+    n = min(len(b), len(self.chunk) - self.pos)
+    b[:n] = self.chunk[self.pos : self.pos + n]
+    self.pos += n
+    return n
+  
+  def close(self):
+    if not self.closed:
+      self.stopped = True
+      while self.thread.is_alive(): # Unblock the decompression thread
+        try:    self.chunks.get(timeout = 0.1)
+        except: pass
+      self.decompressed.close()
+      self.f.close()
+    super().close()
+    
+def _open_decompressed(f):
+  """returns f, or a buffered reader of its decompressed content if f is compressed (gzip, bzip2, xz or Zstandard).
+The compression is recognized from the file extension or the magic number."""
+  if isinstance(getattr(f, "raw", None), _DecompressedReader): return f
+  name = getattr(f, "name", "")
+  compression = _COMPRESSED_EXTENSIONS.get(os.path.splitext(name)[1]) if isinstance(name, str) else None
+  if not compression:
+    if   f.seekable():
+      pos  = f.tell()
+      head = f.read(6)
+      f.seek(pos)
+    elif hasattr(f, "peek"):
+      head = f.peek(6)
+    else:
+      return f
+    if not isinstance(head, bytes): return f
+    for magic, compression in _COMPRESSED_MAGICS:
+      if head.startswith(magic): break
+    else:
+      return f
+  return io.BufferedReader(_DecompressedReader(f, compression), _DECOMPRESS_CHUNK_SIZE)
+
+class _CompressedWriter(io.RawIOBase):
+  """writes a compressed file, compressed in a background thread so as the serializer does not wait for compression
+(zlib, bz2 and lzma release the GIL while compressing). Use _open_compressed() to get a buffered writer.
+The compressed file f is not closed."""
+  def __init__(self, f, compression, level = None):
+    import threading, queue
+    self.f      = f
+    self.name   = getattr(f, "name", "")
+    self.chunks = queue.Queue(8)
+    self.error  = None
+    if   compression == "gzip":
+      import gzip
+      self.compressed = gzip.GzipFile(fileobj = f, mode = "wb", compresslevel = 6 if level is None else level)
+    elif compression == "bz2":
+      import bz2
+      self.compressed = bz2.BZ2File(f, "wb", compresslevel = 9 if level is None else level)
+    elif compression == "xz":
+      import lzma
+      self.compressed = lzma.LZMAFile(f, "wb", preset = level)
+    elif compression == "zstd":
+      try:
+        from compression import zstd # Python >= 3.14
+        self.compressed = zstd.ZstdFile(f, "wb", level = level)
+      except ImportError:
+        try: import zstandard
+        except ImportError: raise ImportError("Writing Zstandard-compressed files requires Python >= 3.14 or the 'zstandard' module.")
+        self.compressed = zstandard.ZstdCompressor(level = 3 if level is None else level).stream_writer(f, closefd = False)
+    else:
+      raise ValueError("Unsupported compression '%s'! Supported compressions are: %s." % (compression, ", ".join(_COMPRESSED_EXTENSIONS.values())))
+    self.thread = threading.Thread(target = self._compress, daemon = True)
+    self.thread.start()
+    
+  def _compress(self):
+    try:
+      while True:
+        chunk = self.chunks.get()
+        if chunk is None: break
+        self.compressed.write(chunk)
+      self.compressed.close()
+    except Exception as e:
+      self.error = e
+      while not self.chunks.get() is None: pass # Unblock the writer
+      
+  def writable(self): return True
+  
+  def write(self, b):
+    if self.error: raise self.error
+    self.chunks.put(bytes(b))
+    return len(b)
+  
+  def close(self):
+    if not self.closed:
+      self.chunks.put(None)
+      self.thread.join()
+      super().close()
+      if self.error: raise self.error
+    
+def _open_compressed(f, compression, level = None):
+  """returns a buffered writer that compresses what is written in f (with gzip, bz2, xz or zstd compression)."""
+  return io.BufferedWriter(_CompressedWriter(f, compression, level), _COMPRESS_CHUNK_SIZE)
+
+def _compression_of(f):
+  """returns the compression corresponding to the extension of the name of the file f, if f is a plain file."""
+  if not isinstance(f, (io.BufferedWriter, io.FileIO)): return None # e.g. already compressed
+  name = getattr(f, "name", "")
+  if not isinstance(name, str): return None
+  return _COMPRESSED_EXTENSIONS.get(os.path.splitext(name)[1])
+
+_NTRIPLES_TERM = rb'(?:<[^>\s]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9\-]+|\^\^<[^>\s]*>)?)'
+_NTRIPLES_LINE = re.compile(rb'\s*(?:(?:<[^>\s]*>|_:\S+)\s*<[^>\s]*>\s*%s(?:\s*(?:<[^>\s]*>|_:\S+))?\s*\.\s*)?(?:#.*)?$' % _NTRIPLES_TERM)
+
 def _guess_format(f):
   if f.seekable():
     s = f.read(1000)
@@ -285,34 +771,98 @@ def _guess_format(f):
   if isinstance(s, str): s = s.encode("utf8")
   if s.startswith(b"\xef\xbb\xbf"): s = s[3:] # Ignore byte-order mask
   
-  if not s.lstrip().startswith(b"<"): return "ntriples"
-  if s[s.find(b"\n") -1] == b".": return "ntriples"
-  if s.strip().split(b"\n", 1)[0].endswith(b"."): return "ntriples"
+  name = getattr(f, "name", "")
+  if isinstance(name, str):
+    name = re.sub("\\.(?:gz|bz2|xz|zst)$", "", name)
+    if name.endswith(".ttl"):  return "turtle"
+    if name.endswith(".trig"): return "trig"
+    
+  first = re.sub(b"^(?:\\s+|#[^\\n]*)+", b"", s) # Skip comments
+  if re.match(b"@prefix|@base|(?i:prefix|base)\\s", first): return "turtle"
+  
+  # XML declaration, comment, doctype, or root tag with attributes or alone on its line (an IRI such as <urn:x> is followed by the rest of the triple)
+  is_xml = re.match(b"<(?:\\?xml|!--|!DOCTYPE)|<[A-Za-z_][\\w.-]*(?::[A-Za-z_][\\w.-]*)?(?:\\s+[A-Za-z_][\\w.:-]*\\s*=|\\s*/?>(?:[ \\t\\r]*(?:\\n|$)|<))", first)
+  if (not is_xml) and ((not first.startswith(b"<")) or re.match(b"<[^>\\s]*>\\s*(?:<|_:|[A-Za-z:])", first) or s.strip().split(b"\n", 1)[0].endswith(b".")):
+    # Turtle without prefixes looks like N-Triples at first sight; it is N-Triples only if all lines follow its grammar
+    lines = s.split(b"\n")
+    if len(s) >= 1000: del lines[-1] # Last line may be truncated
+    for line in lines:
+      if not _NTRIPLES_LINE.match(line): return "turtle"
+    return "ntriples"
   
   if (b"<!DOCTYPE Ontology" in s) or (b"<!DOCTYPE owl:Ontology" in s) or (b"<Ontology xmlns=" in s): return "owlxml"
   
   return "rdfxml"
 
 
-def _save(f, format, graph, filter = None):
-  if   format == "ntriples":
+_SAVE_SPOOL_SIZE            = 16777216 # Size of the RDF/XML output kept in memory for each group of resources before using a temporary file
+_SAVE_BLANK_NODES_IN_MEMORY = 100000   # Blank nodes kept in memory when saving in RDF/XML or Turtle
+
+_SAVE_TURTLE_MAX_NESTING    = 50       # Blank nodes nested deeper are written apart, with a label, when saving in Turtle
+
+_TURTLE_PREFIX     = re.compile(r"^(?:[A-Za-z](?:[A-Za-z0-9_.\-]*[A-Za-z0-9_\-])?)?:$")
+_TURTLE_LOCAL_NAME = re.compile(r"^(?:[A-Za-z0-9_:](?:[A-Za-z0-9_.\-:]*[A-Za-z0-9_\-:])?)?$")
+_TURTLE_IRI_ESCAPE = re.compile(r"""[\x00-\x20<>"{}|^`\\]""")
+
+def _turtle_iri(iri): return "<%s>" % _TURTLE_IRI_ESCAPE.sub(lambda m: "\\u%04X" % ord(m.group()), iri)
+
+def _prefix_of(left, xmlns, xmlns_abbbrevs):
+  """returns the prefix (e.g. "owl:") for the namespace IRI left, and creates a new one in xmlns if needed."""
+  xmln = xmlns.get(left)
+  if xmln is None:
+    splitted = left[:-1].rsplit("/", 1)
+    if len(splitted) == 2:
+      xmln0 = left[:-1].rsplit("/", 1)[1][:4].replace("#", "").replace(":", "")
+    else:
+      xmln0 = left[:4].replace("#", "").replace(":", "")
+      
+    if (not xmln0) or (not xmln0[0] in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"): xmln0 = "x_" + xmln0
+    xmln  = "%s:" % xmln0
+    i = 2
+    while xmln in xmlns_abbbrevs: xmln = "%s%s:" % (xmln0, i) ; i += 1
+    
+    xmlns[left] = xmln
+    xmlns_abbbrevs.add(xmln)
+  return xmln
+
+def _ntriples_terms(_unabbreviate, s, p, o, d):
+  if   s < 0: s = "_:%s" % (-s)
+  else:       s = "<%s>" % _unabbreviate(s)
+  p = "<%s>" % _unabbreviate(p)
+  if d is None:
+    if o < 0: o = "_:%s" % (-o)
+    else:     o = "<%s>" % _unabbreviate(o)
+  else:
+    if isinstance(o, str):  o = o.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    if   isinstance(d, str) and d.startswith("@"): o = '"%s"%s' % (o, d)
+    elif d == 0:                                   o = '"%s"' % o
+    else:                                          o = '"%s"^^<%s>' % (o, _unabbreviate(d)) # Unabbreviate datatype's iri
+  return "%s %s %s" % (s, p, o)
+
+def _ntriples_lines(rows, _unabbreviate, c_2_iri = None):
+  """returns the N-Triples text (or N-Quads, if c_2_iri is given) of a batch of (line, s, p, o, d, c) rows, where line
+is the line already built by the quadstore, or None if it must be built in Python."""
+  if c_2_iri is None:
+    def build(row): return "%s .\n" % _ntriples_terms(_unabbreviate, *row[1:5])
+  else:
+    def build(row): return "%s <%s> .\n" % (_ntriples_terms(_unabbreviate, *row[1:5]), c_2_iri[row[5]])
+  return "".join([row[0] or build(row) for row in rows])
+
+def _save(f, format, graph, filter = None, parallel = False, compression = None, compression_level = None):
+  if compression is None: compression = _compression_of(f)
+  if compression:
+    with _open_compressed(f, compression, compression_level) as compressed:
+      return _save(compressed, format, graph, filter, parallel, "") # "" for not compressing twice
+    
+  if   ((format == "ntriples") or (format == "nquads")) and (not (filter and callable(filter))) and hasattr(graph, "_save_ntriples"):
+    graph._save_ntriples(f, format == "nquads", parallel) # Lines are built by the quadstore
+    
+  elif format == "ntriples":
     _unabbreviate = lru_cache(None)(graph._unabbreviate)
     
     for s,p,o,d in graph._iter_triples():
       if filter and callable(filter) and not filter(graph, s, p, o, d): continue
-      if   s < 0: s = "_:%s" % (-s)
-      else:       s = "<%s>" % _unabbreviate(s)
-      p = "<%s>" % _unabbreviate(p)
-      if d is None:
-        if o < 0: o = "_:%s" % (-o)
-        else:     o = "<%s>" % _unabbreviate(o)
-      else:
-        if isinstance(o, str):  o = o.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
-        if   isinstance(d, str) and d.startswith("@"): o = '"%s"%s' % (o, d)
-        elif d == 0:                                   o = '"%s"' % o
-        else:                                          o = '"%s"^^<%s>' % (o, _unabbreviate(d)) # Unabbreviate datatype's iri
-        
-      f.write(("%s %s %s .\n" % (s, p, o)).encode("utf8"))
+      f.write(("%s .\n" % _ntriples_terms(_unabbreviate, s, p, o, d)).encode("utf8"))
       
   elif format == "nquads":
     _unabbreviate = lru_cache(None)(graph._unabbreviate)
@@ -321,22 +871,13 @@ def _save(f, format, graph, filter = None):
     
     for c,s,p,o,d in graph._iter_triples(True):
       if filter and callable(filter) and not filter(graph, s, p, o, d, c): continue
-      if   s < 0: s = "_:%s" % (-s)
-      else:       s = "<%s>" % _unabbreviate(s)
-      p = "<%s>" % _unabbreviate(p)
-      if d is None:
-        if o < 0: o = "_:%s" % (-o)
-        else:     o = "<%s>" % _unabbreviate(o)
-      else:
-        if isinstance(o, str):  o = o.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
-        if   isinstance(d, str) and d.startswith("@"): o = '"%s"%s' % (o, d)
-        elif d == 0:                                   o = '"%s"' % o
-        else:                                          o = '"%s"^^<%s>' % (o, _unabbreviate(d)) # Unabbreviate datatype's iri
-        
-      f.write(("<%s> %s %s %s .\n" % (c_2_iri[c], s, p, o)).encode("utf8"))
+      f.write(("%s <%s> .\n" % (_ntriples_terms(_unabbreviate, s, p, o, d), c_2_iri[c])).encode("utf8"))
       
   elif format == "rdfxml":
-    @lru_cache(None)
+    # Single scan of the triples, sorted by subject. Named resources are written in temporary files (one per type,
+    # for grouping them in the output), and blank nodes are kept (spilled on disk if too many) until nested in the
+    # resources referring to them.
+    @lru_cache(100000)
     def _unabbreviate(storid):
       r = graph._unabbreviate(storid).replace("&", "&amp;")
       if r.startswith(base_iri):
@@ -370,29 +911,13 @@ def _save(f, format, graph, filter = None):
       if splitat == -1: return x
       left = x[:splitat + 1]
       
-      xmln = xmlns.get(left)
-      if xmln is None:
-        splitted = left[:-1].rsplit("/", 1)
-        if len(splitted) == 2:
-          xmln0 = left[:-1].rsplit("/", 1)[1][:4].replace("#", "").replace(":", "")
-        else:
-          xmln0 = left[:4].replace("#", "").replace(":", "")
-          
-        if not xmln0[0] in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ": xmln0 = "x_" + xmln0
-        xmln  = "%s:" % xmln0
-        i = 2
-        while xmln in xmlns_abbbrevs: xmln = "%s%s:" % (xmln0, i) ; i += 1
-        
-        xmlns[left] = xmln = xmln
-        xmlns_abbbrevs.add(xmln)
-        
+      xmln = _prefix_of(left, xmlns, xmlns_abbbrevs)
       x = x[splitat + 1:]
       r = "%s%s" % (xmln, x)
       if not x[0] in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ": bad_types.add(r)
       return r
     
-    lines  = []
-    liness = {}
+    groups = {}
     for type in [
         "owl:Ontology",
         "owl:ObjectProperty",
@@ -404,10 +929,11 @@ def _save(f, format, graph, filter = None):
         "owl:NamedIndividual",
         "owl:AllDifferent",
         "", ]:
-      liness[type] = l = []
-      lines.append(l)
-    
-    bn_2_inner_list = defaultdict(list)
+      groups[type] = tempfile.SpooledTemporaryFile(_SAVE_SPOOL_SIZE)
+      
+    from owlready2.rdfxml_2_ntriples import _SpillingDict
+    bn_2_inner_list  = _SpillingDict(_SAVE_BLANK_NODES_IN_MEMORY) # Lines of the blank nodes; nested blank nodes are given by their ids
+    bns              = array("q") # Blank nodes, in the order of the scan
     inner_lists_used = set()
     
     tags_with_list = {
@@ -427,59 +953,57 @@ def _save(f, format, graph, filter = None):
       "owl:IrreflexiveProperty",
       }
     
+    list_firsts = {} # All list cells are loaded at once
+    list_rests  = {}
+    for s, p, o, d in graph._get_triples_ps_spod((rdf_first, rdf_rest)):
+      if   p == rdf_first: list_firsts.setdefault(s, (o, d))
+      elif d is None:      list_rests .setdefault(s, o)
+      
     def parse_list(bn):
       has_literal = False
       r = []
       while bn and (bn != rdf_nil):
-        inner_lists_used.add(id(bn_2_inner_list[bn]))
-        #first = graph._get_obj_triple_sp_o(bn, rdf_first)
-        first, d = graph._get_triple_sp_od(bn, rdf_first)
+        inner_lists_used.add(bn)
+        first, d = list_firsts.get(bn, (rdf_nil, None))
         if not ((d is None) and (first == rdf_nil)):
           if not d is None: has_literal = True
           r.append((first, d))
-        bn = graph._get_obj_triple_sp_o(bn, rdf_rest)
+        bn = list_rests.get(bn)
       return has_literal, r
     
+    def write_lines(out, l):
+      buf   = []
+      stack = [iter(l)]
+      while stack:
+        for v in stack[-1]:
+          if isinstance(v, int): # Nested blank node
+            nested = bn_2_inner_list.get(v)
+            if nested:
+              stack.append(iter(nested))
+              break
+          else:
+            buf.append("%s%s\n" % ("    " * (len(stack) - 1), v))
+        else:
+          del stack[-1]
+      out.write("".join(buf).encode("utf8"))
+      
     def purge():
-      nonlocal s_lines, current_s, type
+      nonlocal s_lines
+      
+      if current_s < 0: about = ""
+      else:             about = ' rdf:about="%s"' % _unabbreviate(current_s)
+      if s_lines: l = ["""<%s%s>""" % (type, about), *s_lines, """</%s>""" % type]
+      else:       l = ["""<%s%s/>""" % (type, about)]
+      s_lines = []
       
       if current_s < 0:
-        l = bn_2_inner_list[current_s]
-        current_s = 0
+        bn_2_inner_list[current_s] = l
+        bns.append(current_s)
       else:
-        l = liness.get(type)
-        if l is None: l = lines[-1]
+        l.append("")
+        write_lines(groups.get(type, groups[""]), l) # Blank nodes come first in the scan, thus they are all available
         
-      if s_lines:
-        if current_s < 0:
-          l.append("""<%s rdf:nodeID="node%s">""" % (type, -current_s))
-          
-        elif current_s > 0:
-          current_s = _unabbreviate(current_s)
-          l.append("""<%s rdf:about="%s">""" % (type, current_s))
-          
-        else:
-          l.append("""<%s>""" % type)
-          
-        l.extend(s_lines)
-        s_lines = []
         
-        l.append("""</%s>""" % type)
-        
-      else:
-        if current_s < 0:
-          l.append("""<%s rdf:nodeID="node%s"/>""" % (type, -current_s))
-          
-        elif current_s > 0:
-          current_s = _unabbreviate(current_s)
-          l.append("""<%s rdf:about="%s"/>""" % (type, current_s))
-          
-        else:
-          l.append("""<%s/>""" % type)
-
-      if current_s: l.append("")
-      
-      
     type      = "rdf:Description"
     s_lines   = []
     current_s = ""
@@ -537,33 +1061,24 @@ def _save(f, format, graph, filter = None):
               s_lines.append("""  <%s rdf:parseType="Collection">""" % p)
               for i, d in list_elements:
                 if i < 0:
-                  l = bn_2_inner_list[i]
-                  inner_lists_used.add(id(l))
-                  s_lines.append(l)
+                  inner_lists_used.add(i)
+                  s_lines.append(i)
                 elif isinstance(i, int):
                   i = _unabbreviate(i)
                   s_lines.append("""    <rdf:Description rdf:about="%s"/>""" % i)
                   
           else:
-            l = bn_2_inner_list[o]
-            inner_lists_used.add(id(l))
+            inner_lists_used.add(o)
             s_lines.append("""  <%s>""" % p)
-            s_lines.append(l)
+            s_lines.append(o)
           s_lines.append("""  </%s>""" % p)
           
       else:
         o = _unabbreviate(o)
         s_lines.append("""  <%s rdf:resource="%s"/>""" % (p, o))
         
-    purge()
-
-    if len(bn_2_inner_list) != len(inner_lists_used):
-      lines.append([])
-      for l in bn_2_inner_list.values():
-        if not id(l) in inner_lists_used:
-          lines[-1].extend(l)
-          lines[-1].append("")
-          
+    if current_s: purge()
+    
     decls = []
     for iri, abbrev in xmlns.items():
       if   abbrev == "":  decls.append('xml:base="%s"' % iri)
@@ -572,31 +1087,161 @@ def _save(f, format, graph, filter = None):
     if base_iri.endswith("/"):
       decls.append('xmlns="%s"' % base_iri)
       
-    def flatten(l):
-      if not l: return
+    f.write(b"""<?xml version="1.0"?>\n""")
+    f.write(("""<rdf:RDF %s>\n\n""" % "\n         ".join(decls)).encode("utf8"))
+    empty = True
+    for group in groups.values():
+      if group.tell(): empty = False
+      group.seek(0)
+      shutil.copyfileobj(group, f)
+      group.close()
+    for bn in bns:
+      if not bn in inner_lists_used: # Blank nodes not nested in other resources
+        empty = False
+        write_lines(f, [*bn_2_inner_list[bn], ""])
+    if empty: f.write(b"""\n""")
+    f.write(b"""\n</rdf:RDF>\n""")
+    
+  elif format == "turtle":
+    # Single scan of the triples, sorted by subject. Named resources are written in a temporary file (for declaring
+    # the prefixes first), and blank nodes are kept (spilled on disk if too many) until nested in the resource referring
+    # to them. Blank nodes referred several times, or not at all, are written apart with a label.
+    base_iri = graph._iter_ontology_iri(graph.c)
+    
+    prefixes = {
+      "http://www.w3.org/1999/02/22-rdf-syntax-ns#" : "rdf:",
+      "http://www.w3.org/2001/XMLSchema#" : "xsd:",
+      "http://www.w3.org/2000/01/rdf-schema#" : "rdfs:",
+      "http://www.w3.org/2002/07/owl#" : "owl:",
+    }
+    if isinstance(base_iri, str): prefixes[base_iri] = ":"
+    prefixes_abbrevs = set(prefixes.values())
+    prefixes_used    = set()
+    
+    @lru_cache(100000)
+    def abbrev(storid):
+      x = graph._unabbreviate(storid)
+      splitat = max(x.rfind("/"), x.rfind("#"), x.rfind(":"))
+      if splitat != -1:
+        left   = x[:splitat + 1]
+        local  = x[splitat + 1:]
+        prefix = _prefix_of(left, prefixes, prefixes_abbrevs)
+        if _TURTLE_PREFIX.match(prefix) and _TURTLE_LOCAL_NAME.match(local):
+          prefixes_used.add(left)
+          return "%s%s" % (prefix, local)
+      return _turtle_iri(x)
+    
+    xsd_integer = _universal_datatype_2_abbrev[int]
+    def literal(o, d):
+      if   (d == xsd_integer) and isinstance(o, int): return "%s" % o
+      if isinstance(o, str): o = o.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+      if   isinstance(d, str) and d.startswith("@"): return '"%s"%s' % (o, d)
+      elif d == 0:                                   return '"%s"' % o
+      else:                                          return '"%s"^^%s' % (o, abbrev(d))
       
-      c = [l]
-      p = [0]
-      while c:
-        v = c[-1][p[-1]]
-        deep = len(c)
+    from owlready2.rdfxml_2_ntriples import _SpillingDict
+    bn_2_pos   = _SpillingDict(_SAVE_BLANK_NODES_IN_MEMORY) # Predicates and objects of the blank nodes; nested blank nodes are given by their ids
+    bns        = array("q") # Blank nodes, in the order of the scan
+    referred   = set()
+    written    = set()
+    shared_bns = graph._get_shared_blank_nodes()
+    
+    def collection(bn, pos):
+      items = []
+      cells = set()
+      while True:
+        pos = dict(pos)
+        if (len(pos) != 2) or (len(pos.get("rdf:first", ())) != 1) or (len(pos.get("rdf:rest", ())) != 1): return None
+        items.append(pos["rdf:first"][0])
+        rest = pos["rdf:rest"][0]
+        if rest == "rdf:nil": break
+        if (not isinstance(rest, int)) or (rest == bn) or (rest in cells) or (rest in shared_bns) or (rest in written): return None
+        cells.add(rest)
+        pos = bn_2_pos.get(rest)
+        if not pos: return None
+      written.update(cells)
+      return items
+    
+    def write_bn(out, bn, depth):
+      if (bn in shared_bns) or (bn in written) or (depth > _SAVE_TURTLE_MAX_NESTING):
+        out.append("_:b%s" % -bn)
+        return
+      written.add(bn)
+      pos = bn_2_pos.get(bn)
+      if not pos:
+        out.append("[]")
+        return
+      items = collection(bn, pos)
+      if items is None:
+        out.append("[ ")
+        write_pos(out, pos, depth + 1)
+        out.append(" ]")
+      else:
+        out.append("(")
+        for item in items:
+          out.append(" ")
+          if isinstance(item, int): write_bn(out, item, depth + 1)
+          else:                     out.append(item)
+        out.append(" )")
         
-        if p[-1] + 1 < len(c[-1]):
-          p[-1] += 1
-        else:
-          del c[-1]
-          del p[-1]
-          
-        if isinstance(v, list):
-          if v:
-            c.append(v)
-            p.append(0)
-        else:
-          yield "%s%s" % ("    " * (deep - 1), v)
+    def write_pos(out, pos, depth):
+      for i, (p, os) in enumerate(pos):
+        if i: out.append(" ;\n%s" % ("    " * depth))
+        out.append(p)
+        for j, o in enumerate(os):
+          out.append(", " if j else " ")
+          if isinstance(o, int): write_bn(out, o, depth)
+          else:                  out.append(o)
           
-    f.write(b"""<?xml version="1.0"?>\n""")
-    f.write(("""<rdf:RDF %s>\n\n""" % "\n         ".join(decls)).encode("utf8"))
-    f.write( """\n""".join(flatten(sum(lines, []))).encode("utf8"))
+    def write_subject(subject, pos):
+      out = [subject, " "]
+      write_pos(out, pos, 1)
+      out.append(" .\n\n")
+      body.write("".join(out).encode("utf8"))
+      
+    def purge():
+      pos = sorted(s_pos.items(), key = lambda po: po[0] != "a") # rdf:type first
+      s_pos.clear()
+      if current_s < 0:
+        bn_2_pos[current_s] = pos
+        bns.append(current_s)
+      else:
+        write_subject(abbrev(current_s), pos) # Blank nodes come first in the scan, thus they are all available
+        
+    body      = tempfile.SpooledTemporaryFile(_SAVE_SPOOL_SIZE)
+    s_pos     = {}
+    current_s = 0
+    for s,p,o,d in graph._iter_triples(False, True):
+      if filter and callable(filter) and not filter(graph, s, p, o, d): continue
+      if s != current_s:
+        if current_s: purge()
+        current_s = s
+        
+      if p == rdf_type: p = "a"
+      else:             p = abbrev(p)
+      
+      if   not d is None: o = literal(o, d)
+      elif o < 0:         referred.add(o)
+      else:               o = abbrev(o)
+      
+      os = s_pos.get(p)
+      if os is None: s_pos[p] = [o]
+      else:          os.append(o)
+      
+    if current_s: purge()
     
-
-    f.write(b"""\n\n</rdf:RDF>\n""")
+    for bn in bns: # Blank nodes not nested in other resources
+      if not ((bn in written) or (bn in referred)):
+        written.add(bn)
+        write_subject("_:b%s" % -bn, bn_2_pos[bn])
+    for bn in bns: # Blank nodes shared, or nested too deeply
+      if not bn in written:
+        written.add(bn)
+        write_subject("_:b%s" % -bn, bn_2_pos[bn])
+        
+    for iri, prefix in prefixes.items():
+      if iri in prefixes_used: f.write(("@prefix %s %s .\n" % (prefix, _turtle_iri(iri))).encode("utf8"))
+    if prefixes_used: f.write(b"\n")
+    body.seek(0)
+    shutil.copyfileobj(body, f)
+    body.close()
@@ -429,13 +429,10 @@ def issubclass_owlready(Class, Parent_or_tuple):
   if isinstance(Class, EntityClass):
     if not isinstance(Parent_or_tuple, tuple): Parent_or_tuple = (Parent_or_tuple,)
     parent_storids = { Parent.storid for Parent in Parent_or_tuple }
-    
-    Class_parents = set(Class.namespace.world._get_obj_triples_transitive_sp(Class.storid, Class._rdfs_is_a))
-    Class_parents.add(Class.storid)
-    if not parent_storids.isdisjoint(Class_parents): return True
+    if Class.namespace.world._is_subsumed(Class.storid, Class._rdfs_is_a, parent_storids): return True
     
     equivalent_storids = { Equivalent.storid for Parent in Parent_or_tuple for Equivalent in Parent.equivalent_to.indirect() }
-    if not equivalent_storids.isdisjoint(Class_parents): return True
+    if equivalent_storids and Class.namespace.world._is_subsumed(Class.storid, Class._rdfs_is_a, equivalent_storids): return True
     
   return False
 
@@ -19,11 +19,13 @@
 
 import importlib, urllib.request, urllib.parse
 from functools import lru_cache
+from itertools import islice
 
 from owlready2.base import *
 from owlready2.base import _universal_abbrev_2_iri, _universal_iri_2_abbrev, _universal_abbrev_2_datatype, _universal_datatype_2_abbrev
 
 from owlready2.triplelite import *
+from owlready2.driver import _COMPRESSED_EXTENSIONS
 
 CURRENT_NAMESPACES = ContextVar("CURRENT_NAMESPACES", default = None)
 
@@ -36,11 +38,19 @@ PREDEFINED_ONTOLOGIES = {
   "http://purl.org/dc/terms/" : "dcterms.owl",
   }
 
+_BULK_ADD_CHUNK_SIZE = 100000
+
 _LOG_LEVEL = 0
 def set_log_level(x):
   global _LOG_LEVEL
   _LOG_LEVEL = x
   
+def _uncache_value(entity, prop):
+  try:
+    if type.__instancecheck__(Thing, entity): delattr(entity, prop.python_name)
+    else:                                     delattr(entity, "__%s" % prop.python_name)
+  except: pass
+  
 class Namespace(object):
   def __init__(self, world_or_ontology, base_iri, name = None):
     if not(base_iri.endswith("#") or base_iri.endswith("/") or base_iri.endswith(":")): raise ValueError("base_iri must end with '#', '/' or ':' !")
@@ -107,6 +117,7 @@ class _GraphManager(object):
   def _get_obj_triples_transitive_po (self, predicate, object, already = None): return set()
   def _get_obj_triples_transitive_sym(self, subject, predicate): return set()
   def _get_obj_triples_transitive_sp_indirect(self, subject, predicates_inverses, already = None): return set()
+  def _is_subsumed(self, s, p, os): return s in os
   def _get_obj_triples_spo_spo(self, subject = None, predicate = None, object = None): return []
   _get_triples_s_p = _get_obj_triples_spo_spo
   
@@ -118,6 +129,13 @@ class _GraphManager(object):
   def _get_obj_triples_sp_co(self, s, p): return []
   def _get_triples_sp_od(self, s, p): return []
   
+  def _get_obj_triples_ssp_so(self, ss, p): return {}
+  _get_obj_triples_ssp_sco = _get_data_triples_ssp_sod = _get_triples_ssp_sod = _get_obj_triples_ssp_so
+  def _get_obj_triples_sspi_so(self, ss, p, i): return {}
+  def _get_obj_triples_ssps_spo(self, ss, ps): return {}
+  _get_data_triples_ssps_spod = _get_triples_ssps_spod = _get_obj_triples_ssps_spo
+  def _get_obj_triples_psos_pos(self, ps, os): return {}
+  
   def get_triples(self, s = None, p = None, o = None):
     if   isinstance(o, int):
       return self._get_obj_triples_spo_spo(s, p, o)
@@ -465,6 +483,93 @@ class World(_GraphManager):
       if _LOG_LEVEL: print("* Owlready2 * Saving world %s to %s..." % (self, getattr(file, "name", "???")), file = sys.stderr)
       self.graph.save(file, format, **kargs)
       
+  def save_changed(self, directory, format = "rdfxml", **kargs):
+    """saves in directory the ontologies modified since they were last saved there (one file per ontology), and returns them.
+The saves are recorded in the manifest.json file of the directory. The changes are counted by the quadstore, starting
+at the first call (see Graph.enable_change_tracking()); thus the first call saves all ontologies."""
+    import json
+    self.graph.enable_change_tracking()
+    changes           = self.graph.get_context_changes()
+    manifest_filename = os.path.join(directory, "manifest.json")
+    try:
+      with open(manifest_filename) as f: manifest = json.load(f)
+    except FileNotFoundError:
+      os.makedirs(directory, exist_ok = True)
+      manifest = {}
+    compression = kargs.get("compression")
+    ext         = ".%s%s" % (_SAVE_EXTENSIONS.get(format, format), { v : k for k, v in _COMPRESSED_EXTENSIONS.items() }.get(compression, ""))
+    if (manifest.get("format") != format) or (manifest.get("compression") != compression) or (manifest.get("tracking") != changes[0]):
+      manifest = {} # Changes were not tracked, or other format
+    entries     = manifest.get("ontologies", {})
+    new_entries = {}
+    filenames   = { entry["file"] for entry in entries.values() }
+    saved       = []
+    for c, iri, last_update in self.graph.execute("SELECT c, iri, last_update FROM ontologies").fetchall():
+      entry = entries.get(iri)
+      if entry and (entry["changes"] == changes.get(c, 0)) and (entry["last_update"] == last_update) and os.path.exists(os.path.join(directory, entry["file"])):
+        new_entries[iri] = entry
+        continue
+      
+      onto = self.graph.context_2_user_context(c)
+      if entry: filename = entry["file"]
+      else:
+        name = urllib.parse.quote(onto.name, safe = "") or "ontology"
+        filename = "%s%s" % (name, ext)
+        i = 2
+        while filename in filenames:
+          filename = "%s_%s%s" % (name, i, ext)
+          i += 1
+        filenames.add(filename)
+        
+      onto.save(os.path.join(directory, filename), format, **kargs)
+      new_entries[iri] = { "file" : filename, "changes" : changes.get(c, 0), "last_update" : last_update, "saved" : time.time() }
+      saved.append(onto)
+      
+    with open("%s.tmp" % manifest_filename, "w") as f:
+      json.dump({ "format" : format, "compression" : compression, "tracking" : changes[0], "ontologies" : new_entries }, f, indent = 1)
+    os.replace("%s.tmp" % manifest_filename, manifest_filename)
+    return saved
+  
+  def load(self, file, format = "nquads", default_ontology = None, memory_budget = None):
+    """loads a file containing several ontologies, e.g. saved with World.save(file, format = "nquads"), in a single pass.
+Each graph is loaded in the ontology whose IRI is the graph IRI (created if needed), replacing its previous content;
+triples outside any graph are loaded in default_ontology. memory_budget (in bytes) limits the size of the batches of quads.
+Returns the list of the ontologies loaded."""
+    ontologies = []
+    def get_context(iri):
+      if iri is None:
+        if default_ontology is None: raise ValueError("Triple without graph, but no default ontology!")
+        onto = default_ontology
+      else:
+        onto = self.get_ontology(iri)
+      if onto.loaded: onto._destroy_cached_entities()
+      ontologies.append(onto)
+      return onto.graph.c
+    
+    if isinstance(file, str):
+      if _LOG_LEVEL: print("* Owlready2 * Loading world %s from %s..." % (self, file), file = sys.stderr)
+      fileobj = open(file, "rb")
+    else:
+      if _LOG_LEVEL: print("* Owlready2 * Loading world %s from %s..." % (self, getattr(file, "name", "???")), file = sys.stderr)
+      fileobj = file
+    self.graph.acquire_write_lock()
+    try:
+      self.graph.parse(fileobj, format, get_context, memory_budget = memory_budget)
+    finally:
+      self.graph.release_write_lock()
+      if fileobj is not file: fileobj.close()
+      
+    for onto in ontologies: onto.loaded = True
+    for onto in ontologies:
+      onto._imported_ontologies._set([self.get_ontology(self._unabbreviate(abbrev_iri)).load() for abbrev_iri in self._get_obj_triples_sp_o(onto.storid, owl_imports)])
+    if self.graph.indexed:
+      for onto in ontologies: onto._load_properties()
+    return ontologies
+  
+  def snapshot_to(self, filename, progress = None):
+    if _LOG_LEVEL: print("* Owlready2 * Copying quadstore of world %s to %s..." % (self, filename), file = sys.stderr)
+    self.graph.snapshot_to(filename, progress)
+    
   def as_rdflib_graph(self):
     if self._rdflib_store is None:
       import owlready2.rdflib_store
@@ -637,6 +742,85 @@ class World(_GraphManager):
         for o in os: ontology._add_obj_triple_raw_spo(s, p, o)
         
     
+  def bulk_add(self, quads):
+    """Adds many quads at once. Each quad is (ontology, s, p, o) or (ontology, s, p, o, d), as in the quadstore.
+
+s and p can be entities, storids or IRIs (IRIs starting with '_:' are blank nodes, local to the call).
+In (ontology, s, p, o) quads, o can be an entity or a Python value (converted with to_literal()).
+In (ontology, s, p, o, d) quads, o is a storid or an IRI if d is None, and a raw literal with datatype d otherwise.
+ontology can be None, in that case the ontology of the current 'with' block is used."""
+    return self._bulk_add(quads)
+  
+  def _bulk_add(self, quads, ontology = None):
+    l = CURRENT_NAMESPACES.get()
+    default_c = (ontology or (l and l[-1].ontology) or self).graph.c
+    
+    nb      = 0
+    blanks  = {}
+    structural_ps = { rdf_type, rdfs_subclassof, owl_equivalentindividual, owl_equivalentclass, owl_equivalentproperty, owl_inverse_property, rdf_domain, rdf_range }
+    
+    def to_storid(x):
+      if x.__class__ is int: return x
+      if x.__class__ is str:
+        if x.startswith("_:"): return blanks.get(x) or blanks.setdefault(x, self.graph.new_blank_node())
+        return x
+      return x.storid
+    
+    quads = iter(quads)
+    while True:
+      chunk = list(islice(quads, _BULK_ADD_CHUNK_SIZE))
+      if not chunk: break
+      nb += len(chunk)
+      
+      rows = []
+      for quad in chunk:
+        if ontology: g = ontology; s, p, o, *d = quad
+        else:        g, s, p, o, *d = quad
+        c = default_c if g is None else (g if isinstance(g, int) else g.graph.c)
+        if c is None: raise ValueError("Cannot add triples outside a 'with' block. Please start a 'with' block to indicate in which ontology the new triples are added, or give the ontology in the quads.")
+        if d:
+          d = d[0]
+          if   d is None: o = to_storid(o)
+          elif hasattr(d, "storid"): d = d.storid
+        else:
+          if hasattr(o, "storid"): o, d = o.storid, None
+          else:                    o, d = self._to_rdf(o)
+        rows.append((c, to_storid(s), to_storid(p), o, d))
+        
+      # Datatypes given as strings are IRIs, except language tags
+      iris = [x for row in rows for x in (row[1], row[2], row[3] if row[4] is None else row[4]) if isinstance(x, str) and not x.startswith("@")]
+      if iris:
+        abbrevs = self.graph._abbreviate_many(iris)
+        rows    = [(c, abbrevs.get(s, s), abbrevs.get(p, p), abbrevs.get(o, o) if d is None else o, d if d.__class__ is not str else abbrevs.get(d, d)) for c, s, p, o, d in rows]
+        
+      # Invalidate the cached values of the loaded entities, and add structural triples (is_a,...) through them
+      updated  = []
+      inserted = []
+      loadeds  = self._entities.data # The underlying dict is much faster to test than the WeakValueDictionary
+      props    = {}
+      for row in rows:
+        c, s, p, o, d = row
+        if   s in loadeds: sub = self._entities.get(s)
+        elif s < 0:        sub = self.graph.c_2_onto[c]._bnodes.get(s) if c in self.graph.c_2_onto else None
+        else:              sub = None
+        if (not sub is None) and (d is None) and (p in structural_ps):
+          updated.append(row)
+          continue
+        
+        if p in props: prop = props[p]
+        else:          prop = props[p] = self._entities.get(p)
+        if prop:
+          if not sub is None: _uncache_value(sub, prop)
+          if (d is None) and (o in loadeds) and prop._inverse_storid:
+            obj = self._entities.get(o)
+            if not obj is None: _uncache_value(obj, prop.inverse_property)
+        inserted.append(row)
+        
+      self.graph._bulk_add_raw([(c, s, p, o) for c, s, p, o, d in inserted if d is None], [row for row in inserted if not row[4] is None])
+      if updated: self._add_quads_with_update(None, updated)
+      
+    return nb
+    
   def get(self, iri, default = None):
     storid = self._abbreviate(iri, False)
     if storid is None: return default
@@ -810,6 +994,7 @@ class Ontology(Namespace, _GraphManager):
       Namespace.__init__(self, self, base_iri, name)
       self._orig_base_iri        = base_iri
       self.loaded                = False
+      self._imports_pending      = False
       self._bnodes               = weakref.WeakValueDictionary()
       self.storid                = world._abbreviate(base_iri[:-1])
 
@@ -946,32 +1131,65 @@ class Ontology(Namespace, _GraphManager):
       self.loaded = True
       if self.graph: self.graph.set_last_update_time(time.time())
       
-  def _destroy_cached_entities(self):
+  def _destroy_cached_entities(self, storids = None):
     _entities = self.world._entities
-    for i, cached in enumerate(_cache):
-      if (not cached is None) and (cached.namespace.ontology is self):
-        if cached.storid in _entities: del _entities[cached.storid]
-        _cache[i] = None
-        
-  def load(self, only_local = False, fileobj = None, reload = False, reload_if_newer = False, url = None, **args):
-    if self.loaded and (not reload): return self
-    
+    if storids is None:
+      for i, cached in enumerate(_cache):
+        if (not cached is None) and (cached.namespace.ontology is self):
+          if cached.storid in _entities: del _entities[cached.storid]
+          _cache[i] = None
+          
+    else: # Only the given entities, and the loaded classes and individuals inheriting from them
+      world    = self.world
+      entities = set()
+      for storid in storids:
+        entity = _entities.get(storid)
+        if (not entity is None) and (entity.namespace.world is world): entities.add(entity) # Not owl:Thing,...
+        self._bnodes.pop(storid, None)
+      classes = [entity for entity in entities if isinstance(entity, type)]
+      for Class in classes: # Python subclasses are the loaded subclasses, including fusion classes
+        for Subclass in type.__subclasses__(Class):
+          if not Subclass in entities:
+            entities.add(Subclass)
+            classes.append(Subclass)
+      for Class_storid in { Class.storid for Class in classes }: # And their loaded individuals
+        for s in world._get_obj_triples_po_s(rdf_type, Class_storid):
+          entity = _entities.get(s)
+          if not entity is None: entities.add(entity)
+      for entity in entities:
+        storid = getattr(entity, "storid", None)
+        if _entities.get(storid) is entity: del _entities[storid]
+      self.world._fusion_class_cache.clear()
+      
+  def _get_onto_source(self, only_local = False):
     f = PREDEFINED_ONTOLOGIES.get(self._base_iri) or PREDEFINED_ONTOLOGIES.get(self._base_iri[:-1])
     if f:
-      if   f.startswith(("http://", "https://")): pass
-      elif not os.path.isabs(f): f = os.path.join(os.path.dirname(__file__), "ontos", f)
-    elif not fileobj:
-      f = fileobj or _get_onto_file(self._orig_base_iri, self.name, "r", only_local)
-    else:
-      f = ""
+      if   f.startswith(("http://", "https://")): return f
+      elif not os.path.isabs(f): return os.path.join(os.path.dirname(__file__), "ontos", f)
+      return f
+    return _get_onto_file(self._orig_base_iri, self.name, "r", only_local)
+  
+  def load(self, only_local = False, fileobj = None, reload = False, reload_if_newer = False, url = None, parallel_imports = False, incremental = False, progress = None, **args):
+    if self.loaded and (not reload):
+      if self._imports_pending: self._load_imports() # Parsed by _parse_imports_in_parallel()
+      return self
+    
+    if fileobj and not (PREDEFINED_ONTOLOGIES.get(self._base_iri) or PREDEFINED_ONTOLOGIES.get(self._base_iri[:-1])): f = ""
+    else: f = self._get_onto_source(only_local)
     
     if reload_if_newer and not(f.startswith("http:") or f.startswith("https:")):
       reload = os.path.getmtime(f) > self.graph.get_last_update_time()
       
+    if progress:
+      from owlready2.driver import _LoadProgress
+      progress = args["progress"] = _LoadProgress(progress)
+      
     self.world.graph.acquire_write_lock()
     
     try:
-      if reload: self._destroy_cached_entities()
+      incremental = incremental and reload and (self.graph.get_last_update_time() != 0.0)
+      if incremental: args["incremental"] = True
+      elif reload:    self._destroy_cached_entities()
       
       new_base_iri = None
       if f.startswith("http:") or f.startswith("https:"):
@@ -1019,31 +1237,87 @@ class Ontology(Namespace, _GraphManager):
           if _LOG_LEVEL: print("* Owlready2 *     ...loading ontology %s (cached)..." % self.name, file = sys.stderr)
 
       self.loaded = True
-
-      if new_base_iri and (new_base_iri != self._base_iri):
-        self.graph.add_ontology_alias(new_base_iri, self._base_iri)
-        self._base_iri = new_base_iri
-        self._namespaces[self._base_iri] = self.world.ontologies[self._base_iri] = self
-        if new_base_iri.endswith("#") or new_base_iri.endswith("/"):
-          self.storid = self.world._abbreviate(new_base_iri[:-1])
-        else:
-          self.storid = self.world._abbreviate(new_base_iri)
-        self.metadata = Metadata(self, self.storid) # Metadata depends on storid
-
-      elif not self.graph._has_obj_triple_spo(self.storid, rdf_type, owl_ontology): # Not always present (e.g. not in dbpedia)
-        #if self.world.graph: self.world.graph.acquire_write_lock() # Already locked
-        self._add_obj_triple_raw_spo(self.storid, rdf_type, owl_ontology)
-        #if self.world.graph: self.world.graph.release_write_lock()
-        
+      self._set_parsed_base_iri(new_base_iri)
+      if incremental: self._destroy_cached_entities(self.graph.touched_storids)
+      
     finally:
       self.world.graph.release_write_lock()
       
+    if parallel_imports: self._parse_imports_in_parallel(only_local)
+    self._load_imports(progress)
+    if progress: progress.report("done")
+    return self
+  
+  def _set_parsed_base_iri(self, new_base_iri):
+    if new_base_iri and (new_base_iri != self._base_iri):
+      self.graph.add_ontology_alias(new_base_iri, self._base_iri)
+      self._base_iri = new_base_iri
+      self._namespaces[self._base_iri] = self.world.ontologies[self._base_iri] = self
+      if new_base_iri.endswith("#") or new_base_iri.endswith("/"):
+        self.storid = self.world._abbreviate(new_base_iri[:-1])
+      else:
+        self.storid = self.world._abbreviate(new_base_iri)
+      self.metadata = Metadata(self, self.storid) # Metadata depends on storid
+
+    elif not self.graph._has_obj_triple_spo(self.storid, rdf_type, owl_ontology): # Not always present (e.g. not in dbpedia)
+      #if self.world.graph: self.world.graph.acquire_write_lock() # Already locked
+      self._add_obj_triple_raw_spo(self.storid, rdf_type, owl_ontology)
+      #if self.world.graph: self.world.graph.release_write_lock()
+      
+  def _parse_imports_in_parallel(self, only_local = False):
+    """parses the files of the ontologies imported directly or indirectly, in worker processes, one level of imports at a time.
+The current process writes the triples in the quadstore, as soon as each file is parsed; imports are then processed recursively as usual."""
+    import multiprocessing
+    from owlready2.driver import _parse_onto_source, _nb_cpus, _FakeQueue
+    
+    pool = None
+    todo = [self]
+    try:
+      while todo:
+        sources = {}
+        for onto in todo:
+          for abbrev_iri in self.world._get_obj_triples_sp_o(onto.storid, owl_imports):
+            imported = self.world.get_ontology(self._unabbreviate(abbrev_iri))
+            if imported.loaded or (imported in sources) or (imported.graph.get_last_update_time() != 0.0): continue # Cached ontologies are not parsed
+            try:    sources[imported] = imported._get_onto_source(only_local)
+            except FileNotFoundError: pass # The error will be raised when loading the import
+        if not sources: break
+        
+        if pool is None: pool = multiprocessing.Pool(max(2, _nb_cpus()))
+        todo = []
+        for imported, commands in zip(sources, pool.imap(_parse_onto_source, [(f, imported._orig_base_iri) for imported, f in sources.items()])):
+          if commands is None: continue # Failed; the ontology will be loaded as usual, which will also report the error
+          if _LOG_LEVEL: print("* Owlready2 *     ...loading ontology %s from %s..." % (imported.name, sources[imported]), file = sys.stderr)
+          f = sources[imported]
+          self.world.graph.acquire_write_lock()
+          try:
+            queue = _FakeQueue(*imported.graph.import_triples_from_queue(None, "" if f.startswith(("http:", "https:")) else f))
+            for command in commands: new_base_iri = queue.put(command)
+            imported.loaded           = True
+            imported._imports_pending = True
+            imported._set_parsed_base_iri(new_base_iri)
+          finally:
+            self.world.graph.release_write_lock()
+          todo.append(imported)
+    finally:
+      if pool:
+        pool.close()
+        pool.join()
+        
+  def _load_imports(self, progress = None):
+    self._imports_pending = False
+    
     # Load imported ontologies
+    t = time.perf_counter()
     imported_ontologies = [self.world.get_ontology(self._unabbreviate(abbrev_iri)).load() for abbrev_iri in self.world._get_obj_triples_sp_o(self.storid, owl_imports)]
     self._imported_ontologies._set(imported_ontologies)
+    if progress: progress.phase("imports", time.perf_counter() - t)
     
     # Search for property names -- must be done AFTER loading imported ontologies, because the properties might be partly defined in the imported ontologies
-    if self.world.graph.indexed: self._load_properties()
+    if self.world.graph.indexed:
+      t = time.perf_counter()
+      self._load_properties()
+      if progress: progress.phase("load_properties", time.perf_counter() - t)
     
     # Import Python module
     global default_world, IRIS, get_ontology
@@ -1062,7 +1336,6 @@ class Ontology(Namespace, _GraphManager):
         raise
       finally:
         owlready2.default_world, owlready2.IRIS, owlready2.get_ontology, owlready2.get_namespace = saved
-    return self
   
   def _load_properties(self, update_props = True):
     if update_props: # Update props from other ontologies, if needed
@@ -1116,6 +1389,10 @@ class Ontology(Namespace, _GraphManager):
       if _LOG_LEVEL: print("* Owlready2 * Saving ontology %s to %s..." % (self.name, getattr(file, "name", "???")), file = sys.stderr)
       self.graph.save(file, format, **kargs)
       
+  def bulk_add(self, triples):
+    """Adds many triples at once in the ontology. Each triple is (s, p, o) or (s, p, o, d); see World.bulk_add()."""
+    return self.world._bulk_add(triples, self)
+  
   def _add_obj_triple_spo(self, s, p, o):
     
     if o == 0 and p == owl_annotatedsource: zpj
@@ -1432,6 +1709,8 @@ def _open_onto_file(base_iri, name, mode = "r", only_local = False):
   if (mode.startswith("w")): return open(os.path.join(onto_path[0], "%s.owl" % name), mode)
   raise FileNotFoundError
 
+_SAVE_EXTENSIONS = { "rdfxml" : "owl", "ntriples" : "nt", "nquads" : "nq", "turtle" : "ttl" }
+
 def _get_onto_file(base_iri, name, mode = "r", only_local = False):
   if base_iri.endswith("#") or base_iri.endswith("/"): base_iri = base_iri[:-1]
   if base_iri.startswith("file://"): return urllib.parse.unquote(base_iri[7:])
@@ -1439,9 +1718,10 @@ def _get_onto_file(base_iri, name, mode = "r", only_local = False):
   for dir in onto_path:
     filename = os.path.join(dir, base_iri.rsplit("/", 1)[-1])
     if os.path.exists(filename) and os.path.isfile(filename): return filename
-    for ext in ["", ".nt", ".ntriples", ".rdf", ".owl"]:
-      filename = os.path.join(dir, "%s%s" % (name, ext))
-      if os.path.exists(filename) and os.path.isfile(filename): return filename
+    for ext in ["", ".nt", ".ntriples", ".rdf", ".owl", ".ttl", ".trig"]:
+      for compression in ["", ".gz", ".bz2", ".xz", ".zst"]:
+        filename = os.path.join(dir, "%s%s%s" % (name, ext, compression))
+        if os.path.exists(filename) and os.path.isfile(filename): return filename
   if (mode.startswith("r")) and not only_local: return base_iri
   if (mode.startswith("w")): return os.path.join(onto_path[0], "%s.owl" % name)
   raise FileNotFoundError
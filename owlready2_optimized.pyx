@@ -22,6 +22,10 @@ import sys, os.path, xml, xml.parsers.expat
 from collections import defaultdict
 
 from owlready2.base import OwlReadyOntologyParsingError
+from owlready2.rdfxml_2_ntriples import _SpillingDict, _SpillingListDict, _index_blank_nodes_by_content
+
+cimport cython
+from cpython.unicode cimport Py_UNICODE_ISSPACE, Py_UNICODE_ISALNUM, Py_UNICODE_ISDECIMAL
 
 INT_DATATYPES   = { "http://www.w3.org/2001/XMLSchema#integer", "http://www.w3.org/2001/XMLSchema#byte", "http://www.w3.org/2001/XMLSchema#short", "http://www.w3.org/2001/XMLSchema#int", "http://www.w3.org/2001/XMLSchema#long", "http://www.w3.org/2001/XMLSchema#unsignedByte", "http://www.w3.org/2001/XMLSchema#unsignedShort", "http://www.w3.org/2001/XMLSchema#unsignedInt", "http://www.w3.org/2001/XMLSchema#unsignedLong", "http://www.w3.org/2001/XMLSchema#negativeInteger", "http://www.w3.org/2001/XMLSchema#nonNegativeInteger", "http://www.w3.org/2001/XMLSchema#positiveInteger" }
 FLOAT_DATATYPES = { "http://www.w3.org/2001/XMLSchema#decimal", "http://www.w3.org/2001/XMLSchema#double", "http://www.w3.org/2001/XMLSchema#float", "http://www.w3.org/2002/07/owl#real" }
@@ -150,7 +154,7 @@ cdef void add_to_bn2(object bns, set known_nodes, str bn, str type, str rel, obj
         bns[bn].add((type, rel, value))
 
     
-def parse_rdfxml(object f, object queue, str default_base, int batch_size):
+def parse_rdfxml(object f, object queue, str default_base, int batch_size, object memory_budget = None):
   cdef object parser = xml.parsers.expat.ParserCreate(None, "")
   try:
     parser.buffer_text          = True
@@ -171,12 +175,12 @@ def parse_rdfxml(object f, object queue, str default_base, int batch_size):
   cdef bint tag_is_predicate          = False
   cdef str current_content            = ""
   cdef dict current_attrs             = None
-  cdef dict bns                       = {}
+  cdef object bns                     = _SpillingDict(max(100, memory_budget // 4000)) if memory_budget else {}
   cdef bint dont_create_unnamed_bn    = False
   cdef dict axiom_annotation_sources  = {}
   cdef dict axiom_annotation_props    = {}
   cdef dict axiom_annotation_targets  = {}
-  cdef dict triples_with_unnamed_bn   = {}
+  cdef object triples_with_unnamed_bn = _SpillingListDict(bns, "triples_with_unnamed_bn") if memory_budget else defaultdict(list)
   
   cdef str xml_base
   cdef str xml_dir
@@ -305,7 +309,6 @@ def parse_rdfxml(object f, object queue, str default_base, int batch_size):
         dont_create_unnamed_bn = False
         axiom_annotation_sources[iri2] = value
         if isinstance(value, str) and (value in fake_blanks):
-          if not iri2 in triples_with_unnamed_bn: triples_with_unnamed_bn[iri2] = []
           triples_with_unnamed_bn[iri2].insert(0, (tag, value, parser.CurrentLineNumber, parser.CurrentColumnNumber))
           tag_is_predicate = not tag_is_predicate
           return
@@ -317,7 +320,6 @@ def parse_rdfxml(object f, object queue, str default_base, int batch_size):
         dont_create_unnamed_bn = False
         axiom_annotation_targets[iri2] = value
         if isinstance(value, str) and (value in fake_blanks):
-          if not iri2 in triples_with_unnamed_bn: triples_with_unnamed_bn[iri2] = []
           triples_with_unnamed_bn[iri2].append((tag, value, parser.CurrentLineNumber, parser.CurrentColumnNumber))
           tag_is_predicate = not tag_is_predicate
           return
@@ -386,27 +388,18 @@ def parse_rdfxml(object f, object queue, str default_base, int batch_size):
   except Exception as e:
     raise OwlReadyOntologyParsingError("RDF/XML parsing error in file %s, line %s, column %s." % (getattr(f, "name", getattr(f, "url", "???")), parser.CurrentLineNumber, parser.CurrentColumnNumber)) from e
   
-  cdef dict content_2_bns
+  cdef object content_2_bns
   cdef str bn
   cdef set content
   cdef str axiom_iri
-  cdef object k
   cdef list candidates_bn
   
   if triples_with_unnamed_bn:
-    content_2_bns = {}
-    for bn, content in bns.items():
-      if not bn in fake_blanks:
-        k = frozenset(content)
-        if not k in content_2_bns: content_2_bns[k] = [bn]
-        else:                      content_2_bns[k].append(bn)
-        
+    content_2_bns = _index_blank_nodes_by_content(bns, fake_blanks.__contains__)
+    
     def rebuild_bn(object content):
-      nonlocal content_2_bns
       cdef str bn = new_blank()
-      k = frozenset(content)
-      if not k in content_2_bns: content_2_bns[k] = [bn]
-      else:                      content_2_bns[k].append(bn)
+      content_2_bns.add_new(frozenset(content), bn)
       cdef tuple i
       cdef object drop
       cdef str p
@@ -442,14 +435,14 @@ def parse_rdfxml(object f, object queue, str default_base, int batch_size):
           if p == "http://www.w3.org/2002/07/owl#annotatedSource":
             target = axiom_annotation_targets[axiom_iri]
             if target.startswith("_"): target = frozenset(bns[target])
-            candidates_bn = content_2_bns.get(frozenset(content | { ("REL", axiom_annotation_props[axiom_iri], target) })) or []
+            candidates_bn = content_2_bns.get(frozenset(content | { ("REL", axiom_annotation_props[axiom_iri], target) }))
             
           else:
             source = axiom_annotation_sources[axiom_iri]
             if source.startswith("_"):
               source = frozenset(bns[source] | { ("REL", axiom_annotation_props[axiom_iri], target) })
             candidates_bn = (content_2_bns.get(frozenset(content | { ("INV", axiom_annotation_props[axiom_iri], source) })) or
-                             content_2_bns.get(frozenset(content)) or [])
+                             content_2_bns.get(frozenset(content)))
             
           if candidates_bn: o = candidates_bn[-1]
           else:             o = rebuild_bn(content)
@@ -940,3 +933,494 @@ def parse_owlxml(object f, object queue, str default_base, int batch_size):
   if objs:  queue.put(("objs", objs))
   if datas: queue.put(("datas", datas))
 
+
+
+
+
+cdef int _TURTLE_CHUNK_SIZE = 1048576
+cdef int _TURTLE_MARGIN     = 4096 # Minimum number of characters ahead of the current token, as in turtle_2_ntriples.py
+
+cdef enum:
+  TK_END, TK_IRI, TK_STRING, TK_AT, TK_DATATYPE, TK_INTEGER, TK_DECIMAL, TK_DOUBLE, TK_BNODE, TK_PNAME, TK_WORD, TK_PUNCT
+  
+cdef str RDF_TYPE  = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+cdef str RDF_FIRST = "http://www.w3.org/1999/02/22-rdf-syntax-ns#first"
+cdef str RDF_REST  = "http://www.w3.org/1999/02/22-rdf-syntax-ns#rest"
+cdef str RDF_NIL   = "http://www.w3.org/1999/02/22-rdf-syntax-ns#nil"
+
+cdef inline bint _is_name_char(Py_UCS4 c): return Py_UNICODE_ISALNUM(c) or (c == u"_")
+
+cdef bint _has_scheme(str iri): # [A-Za-z][A-Za-z0-9+.-]*:
+  cdef Py_ssize_t i
+  cdef Py_UCS4    c
+  for i in range(len(iri)):
+    c = iri[i]
+    if (u"a" <= c <= u"z") or (u"A" <= c <= u"Z"): continue
+    if i == 0: return False
+    if (u"0" <= c <= u"9") or (c == u"+") or (c == u".") or (c == u"-"): continue
+    return c == u":"
+  return False
+
+cdef class _TurtleParser(object):
+  """Turtle / TriG parser with a hand-written tokenizer over the decoded text; see turtle_2_ntriples.py for the Python version."""
+  cdef object  f, queue, decoder, unescape, urljoin
+  cdef int     batch_size, next_blank, kind
+  cdef list    objs, datas
+  cdef dict    prefixes, label_2_blank
+  cdef str     base, buffer, value, datatype
+  cdef Py_ssize_t pos, size, line_start
+  cdef bint    eof, is_literal
+  cdef Py_UCS4 punct
+  
+  def __init__(self, object f, object queue, str default_base, int batch_size):
+    from owlready2.turtle_2_ntriples import unescape
+    from urllib.parse import urljoin
+    import codecs
+    self.f             = f
+    self.queue         = queue
+    self.batch_size    = batch_size
+    self.decoder       = codecs.getincrementaldecoder("utf8")()
+    self.unescape      = unescape
+    self.urljoin       = urljoin
+    self.objs          = []
+    self.datas         = []
+    self.prefixes      = {}
+    self.label_2_blank = {}
+    self.base          = default_base[:-1] if default_base.endswith("#") else default_base
+    self.buffer        = ""
+    self.line_start    = 1
+    
+  # Tokenizer, reading the file by chunks
+  
+  cdef int read_more(self) except -1:
+    cdef object data = self.f.read(_TURTLE_CHUNK_SIZE)
+    self.eof = not data
+    if isinstance(data, bytes): data = self.decoder.decode(data, self.eof)
+    self.line_start += self.buffer.count("\n", 0, self.pos)
+    if (not self.buffer) and (self.line_start == 1) and data.startswith("\ufeff"): data = data[1:] # Ignore byte-order mask
+    self.buffer = self.buffer[self.pos:] + data
+    self.size   = len(self.buffer)
+    self.pos    = 0
+    return 0
+    
+  cdef Py_ssize_t current_line(self): return self.line_start + self.buffer.count("\n", 0, self.pos)
+  
+  cdef int next_token(self) except -1:
+    while True:
+      if (not self.eof) and (self.size - self.pos < _TURTLE_MARGIN):
+        self.read_more()
+        continue
+      if self.scan(): return 0
+      self.read_more() # The token may continue in the next chunk
+      
+  cdef int error(self, Py_ssize_t i) except -1:
+    self.pos = i
+    raise ValueError("Unexpected character '%s'" % self.buffer[i])
+  
+  @cython.boundscheck(False) # Indexes are checked against size
+  @cython.wraparound(False)
+  cdef bint scan(self) except -1:
+    # Returns False if more data is needed for reading the next token
+    cdef str        b    = self.buffer
+    cdef Py_ssize_t size = self.size
+    cdef Py_ssize_t i    = self.pos
+    cdef Py_ssize_t j, k, nb_int, nb_frac
+    cdef Py_UCS4    c, q
+    
+    while True: # Skip spaces and comments
+      if i >= size:
+        if not self.eof: return False
+        self.pos   = i
+        self.kind  = TK_END
+        self.value = None
+        return True
+      c = b[i]
+      if   Py_UNICODE_ISSPACE(c): i += 1
+      elif c == u"#":
+        while (i < size) and (b[i] != u"\n"): i += 1
+      else: break
+      
+    if c == u"<":
+      j = i + 1
+      while True:
+        if j >= size:
+          if self.eof: self.error(i)
+          return False
+        c = b[j]
+        if c == u">": break
+        if (c <= u" ") or (c == u"<") or (c == u'"') or (c == u"{") or (c == u"}") or (c == u"|") or (c == u"^") or (c == u"`"): self.error(i)
+        j += 1
+      self.kind  = TK_IRI
+      self.value = b[i + 1 : j]
+      self.pos   = j + 1
+      return True
+    
+    if (c == u'"') or (c == u"'"):
+      q = c
+      if (i + 2 >= size) and not self.eof: return False
+      if (i + 2 < size) and (b[i + 1] == q) and (b[i + 2] == q): # Long string
+        j = i + 3
+        while True:
+          if j + 2 >= size:
+            if self.eof: self.error(i)
+            return False
+          c = b[j]
+          if   c == u"\\": j += 2
+          elif (c == q) and (b[j + 1] == q) and (b[j + 2] == q): break
+          else: j += 1
+        self.kind  = TK_STRING
+        self.value = b[i + 3 : j]
+        self.pos   = j + 3
+        return True
+      j = i + 1
+      while True:
+        if j >= size:
+          if self.eof: self.error(i)
+          return False
+        c = b[j]
+        if   c == u"\\": j += 2
+        elif c == q: break
+        elif (c == u"\n") or (c == u"\r"): self.error(i)
+        else: j += 1
+      self.kind  = TK_STRING
+      self.value = b[i + 1 : j]
+      self.pos   = j + 1
+      return True
+    
+    if c == u"@": # @[A-Za-z]+(-[A-Za-z0-9]+)*
+      j = i + 1
+      while (j < size) and ((u"a" <= b[j] <= u"z") or (u"A" <= b[j] <= u"Z")): j += 1
+      if j == i + 1: self.error(i)
+      while (j + 1 < size) and (b[j] == u"-") and ((u"a" <= b[j + 1] <= u"z") or (u"A" <= b[j + 1] <= u"Z") or (u"0" <= b[j + 1] <= u"9")):
+        j += 2
+        while (j < size) and ((u"a" <= b[j] <= u"z") or (u"A" <= b[j] <= u"Z") or (u"0" <= b[j] <= u"9")): j += 1
+      if (j + 1 >= size) and not self.eof: return False
+      self.kind  = TK_AT
+      self.value = b[i + 1 : j]
+      self.pos   = j
+      return True
+    
+    if c == u"^":
+      if (i + 1 < size) and (b[i + 1] == u"^"):
+        self.kind  = TK_DATATYPE
+        self.value = "^^"
+        self.pos   = i + 2
+        return True
+      if self.eof: self.error(i)
+      return False
+    
+    if (u"0" <= c <= u"9") or (c == u"+") or (c == u"-") or ((c == u".") and (i + 1 < size) and (u"0" <= b[i + 1] <= u"9")):
+      j = i + 1 if (c == u"+") or (c == u"-") else i
+      k = j
+      while (k < size) and (u"0" <= b[k] <= u"9"): k += 1
+      nb_int  = k - j
+      nb_frac = 0
+      if (k < size) and (b[k] == u"."):
+        j = k + 1
+        while (j < size) and (u"0" <= b[j] <= u"9"): j += 1
+        nb_frac = j - k - 1
+        if (nb_int or nb_frac) and (self.exponent_end(j) != -1):
+          self.kind = TK_DOUBLE
+          j = self.exponent_end(j)
+        elif nb_frac: self.kind = TK_DECIMAL
+        elif nb_int:  self.kind = TK_INTEGER; j = k
+        else:         self.error(i)
+      elif nb_int and (self.exponent_end(k) != -1):
+        self.kind = TK_DOUBLE
+        j = self.exponent_end(k)
+      elif nb_int:
+        self.kind = TK_INTEGER
+        j = k
+      else: self.error(i)
+      if (j + 2 >= size) and not self.eof: return False
+      self.value = b[i : j]
+      self.pos   = j
+      return True
+    
+    if c == u"_":
+      if (i + 2 >= size) and not self.eof: return False
+      if (i + 2 < size) and (b[i + 1] == u":") and _is_name_char(b[i + 2]):
+        j = i + 3
+        while (j < size) and (_is_name_char(b[j]) or (b[j] == u".") or (b[j] == u"-")): j += 1
+        if (j >= size) and not self.eof: return False
+        while b[j - 1] == u".": j -= 1
+        self.kind  = TK_BNODE
+        self.value = b[i + 2 : j]
+        self.pos   = j
+        return True
+      self.error(i)
+      
+    if (c == u".") or (c == u";") or (c == u",") or (c == u"[") or (c == u"]") or (c == u"(") or (c == u")") or (c == u"{") or (c == u"}"):
+      self.kind  = TK_PUNCT
+      self.punct = c
+      self.value = c
+      self.pos   = i + 1
+      return True
+    
+    # Prefixed name, i.e. ([^\W\d_]([\w.-]*[\w-])?)?:(local name)?, else word
+    j = i
+    if (c != u":") and Py_UNICODE_ISALNUM(c) and not Py_UNICODE_ISDECIMAL(c):
+      j = i + 1
+      while (j < size) and (_is_name_char(b[j]) or (b[j] == u".") or (b[j] == u"-")): j += 1
+      if (j >= size) and not self.eof: return False
+    if (j < size) and (b[j] == u":") and ((j == i) or (b[j - 1] != u".")):
+      k = j + 1
+      while k < size:
+        c = b[k]
+        if   _is_name_char(c) or (c == u":") or (c == u"%") or (c == u"-"): k += 1
+        elif (c == u".") and (k > j + 1): k += 1
+        elif (c == u"\\") and (k + 1 < size) and (b[k + 1] in u"_~.!$&'()*+,;=/?#@%-"): k += 2
+        else: break
+      if (k >= size) and not self.eof: return False
+      while (k > j + 1) and (b[k - 1] == u".") and (b[k - 2] != u"\\"): k -= 1
+      self.kind  = TK_PNAME
+      self.value = b[i : k]
+      self.pos   = k
+      return True
+    
+    j = i
+    while (j < size) and ((u"a" <= b[j] <= u"z") or (u"A" <= b[j] <= u"Z")): j += 1
+    if j == i: self.error(i)
+    self.kind  = TK_WORD
+    self.value = b[i : j]
+    self.pos   = j
+    return True
+  
+  @cython.boundscheck(False)
+  @cython.wraparound(False)
+  cdef Py_ssize_t exponent_end(self, Py_ssize_t j): # Returns the end of the exponent starting at j, or -1 if none
+    cdef str b = self.buffer
+    if (j >= self.size) or ((b[j] != u"e") and (b[j] != u"E")): return -1
+    j += 1
+    if (j < self.size) and ((b[j] == u"+") or (b[j] == u"-")): j += 1
+    if (j >= self.size) or not (u"0" <= b[j] <= u"9"): return -1
+    while (j < self.size) and (u"0" <= b[j] <= u"9"): j += 1
+    return j
+  
+  cdef inline bint is_punct(self, Py_UCS4 punct): return (self.kind == TK_PUNCT) and (self.punct == punct)
+  
+  cdef int expect(self, Py_UCS4 punct) except -1:
+    if not self.is_punct(punct): raise ValueError("Expected '%s', got '%s'" % (punct, self.value))
+    self.next_token()
+    return 0
+  
+  # Parser
+  
+  cdef str new_blank(self):
+    self.next_blank += 1
+    return "_:%s" % self.next_blank
+  
+  cdef int add_obj(self, str s, str p, str o) except -1:
+    self.objs.append((s, p, o))
+    if len(self.objs) > self.batch_size:
+      self.queue.put(("objs", self.objs))
+      self.objs = []
+    return 0
+  
+  cdef int add_data(self, str s, str p, object o, str d) except -1:
+    self.datas.append((s, p, o, d))
+    if len(self.datas) > self.batch_size:
+      self.queue.put(("datas", self.datas))
+      self.datas = []
+    return 0
+  
+  cdef int flush(self) except -1:
+    if self.objs:  self.queue.put(("objs",  self.objs))
+    if self.datas: self.queue.put(("datas", self.datas))
+    return 0
+  
+  cdef str resolve(self, str iri):
+    if u"\\" in iri: iri = self.unescape(iri)
+    if (not self.base) or _has_scheme(iri): return iri
+    if iri.startswith("#"): return "%s%s" % (self.base.split("#", 1)[0], iri)
+    return self.urljoin(self.base, iri)
+  
+  cdef str parse_iri(self):
+    cdef str iri, prefix, local
+    cdef Py_ssize_t i
+    if   self.kind == TK_IRI: iri = self.resolve(self.value)
+    elif self.kind == TK_PNAME:
+      i      = self.value.find(":")
+      prefix = self.value[:i]
+      local  = self.value[i + 1:]
+      if not prefix in self.prefixes: raise ValueError("Undefined prefix '%s:'" % prefix)
+      if u"\\" in local: local = self.unescape(local)
+      iri = self.prefixes[prefix] + local
+    else: raise ValueError("Expected IRI, got '%s'" % self.value)
+    self.next_token()
+    return iri
+  
+  cdef str parse_collection(self):
+    cdef list items = []
+    cdef str  bn, bn0, bn_next
+    cdef Py_ssize_t i
+    self.next_token()
+    while not self.is_punct(u")"):
+      if self.kind == TK_END: raise ValueError("Unterminated collection")
+      items.append(self.parse_object())
+      if self.is_literal: items[-1] = (items[-1], self.datatype)
+    self.next_token()
+    if not items: return RDF_NIL
+    bn = bn0 = self.new_blank()
+    for i in range(len(items)):
+      if isinstance(items[i], tuple): self.add_data(bn, RDF_FIRST, items[i][0], items[i][1])
+      else:                           self.add_obj (bn, RDF_FIRST, items[i])
+      if i == len(items) - 1:
+        self.add_obj(bn, RDF_REST, RDF_NIL)
+      else:
+        bn_next = self.new_blank()
+        self.add_obj(bn, RDF_REST, bn_next)
+        bn = bn_next
+    return bn0
+  
+  cdef str parse_blank_node_property_list(self):
+    cdef str bn = self.new_blank()
+    self.next_token()
+    if not self.is_punct(u"]"): self.parse_predicate_object_list(bn)
+    self.expect(u"]")
+    return bn
+  
+  cdef str parse_subject(self):
+    cdef str bn
+    if self.kind == TK_BNODE:
+      bn = self.label_2_blank.get(self.value)
+      if bn is None: bn = self.label_2_blank[self.value] = self.new_blank()
+      self.next_token()
+      return bn
+    if self.is_punct(u"["): return self.parse_blank_node_property_list()
+    if self.is_punct(u"("): return self.parse_collection()
+    return self.parse_iri()
+  
+  cdef object parse_object(self):
+    # Returns the object IRI or blank node, or the value of literals (then is_literal is true, and datatype is set)
+    cdef object o
+    cdef str    d
+    if self.kind == TK_STRING:
+      o = self.value
+      if u"\\" in o: o = self.unescape(o)
+      self.next_token()
+      if   self.kind == TK_AT:
+        d = "@%s" % self.value
+        self.next_token()
+      elif self.kind == TK_DATATYPE:
+        self.next_token()
+        d = self.parse_iri()
+        if   d in INT_DATATYPES:   o = int  (o)
+        elif d in FLOAT_DATATYPES: o = float(o)
+      else:
+        d = ""
+    elif self.kind == TK_INTEGER:
+      o = int(self.value)
+      d = "http://www.w3.org/2001/XMLSchema#integer"
+      self.next_token()
+    elif self.kind == TK_DECIMAL:
+      o = float(self.value)
+      d = "http://www.w3.org/2001/XMLSchema#decimal"
+      self.next_token()
+    elif self.kind == TK_DOUBLE:
+      o = float(self.value)
+      d = "http://www.w3.org/2001/XMLSchema#double"
+      self.next_token()
+    elif (self.kind == TK_WORD) and ((self.value == "true") or (self.value == "false")):
+      o = self.value
+      d = "http://www.w3.org/2001/XMLSchema#boolean"
+      self.next_token()
+    else:
+      o = self.parse_subject()
+      self.is_literal = False
+      return o
+    self.is_literal = True
+    self.datatype   = d
+    return o
+  
+  cdef int parse_predicate_object_list(self, str s) except -1:
+    cdef str    p
+    cdef object o
+    while True:
+      if (self.kind == TK_WORD) and (self.value == "a"):
+        p = RDF_TYPE
+        self.next_token()
+      else:
+        p = self.parse_iri()
+      while True:
+        o = self.parse_object()
+        if self.is_literal: self.add_data(s, p, o, self.datatype)
+        else:               self.add_obj (s, p, o)
+        if self.is_punct(u","): self.next_token()
+        else: break
+      if not self.is_punct(u";"): return 0
+      while self.is_punct(u";"): self.next_token()
+      if self.is_punct(u".") or self.is_punct(u"]") or self.is_punct(u"}"): return 0
+      if self.kind == TK_END: return 0
+      
+  cdef int parse_triples(self, str s = None) except -1:
+    # The subject may have been parsed already, when looking for a TriG graph name
+    cdef bint is_property_list = False
+    if s is None:
+      is_property_list = self.is_punct(u"[")
+      s = self.parse_subject()
+    if is_property_list and (self.is_punct(u".") or self.is_punct(u"{") or self.is_punct(u"}")): return 0
+    self.parse_predicate_object_list(s)
+    return 0
+  
+  cdef int parse_graph_block(self) except -1:
+    self.expect(u"{")
+    while not self.is_punct(u"}"):
+      if self.kind == TK_END: raise ValueError("Unterminated graph")
+      self.parse_triples()
+      if   self.is_punct(u"."): self.next_token()
+      elif not self.is_punct(u"}"): raise ValueError("Expected '.' or '}', got '%s'" % self.value)
+    self.next_token()
+    return 0
+  
+  cdef int parse_directive(self, str directive, bint sparql_style) except -1:
+    if directive == "prefix":
+      if (self.kind != TK_PNAME) or not self.value.endswith(":"): raise ValueError("Expected prefix, got '%s'" % self.value)
+      prefix = self.value[:-1]
+      self.next_token()
+      if self.kind != TK_IRI: raise ValueError("Expected IRI, got '%s'" % self.value)
+      self.prefixes[prefix] = self.resolve(self.value)
+    else:
+      if self.kind != TK_IRI: raise ValueError("Expected IRI, got '%s'" % self.value)
+      self.base = self.resolve(self.value)
+    self.next_token()
+    if not sparql_style: self.expect(u".")
+    return 0
+  
+  cdef int parse(self) except -1:
+    cdef str s, directive
+    self.next_token()
+    while self.kind != TK_END:
+      if   (self.kind == TK_AT) and ((self.value == "prefix") or (self.value == "base")):
+        directive = self.value
+        self.next_token()
+        self.parse_directive(directive, False)
+      elif (self.kind == TK_WORD) and (self.value.lower() in ("prefix", "base")):
+        directive = self.value.lower()
+        self.next_token()
+        self.parse_directive(directive, True)
+      elif (self.kind == TK_WORD) and (self.value.lower() == "graph"):
+        self.next_token()
+        self.parse_subject()
+        self.parse_graph_block()
+      elif self.is_punct(u"{"):
+        self.parse_graph_block()
+      elif (self.kind == TK_IRI) or (self.kind == TK_PNAME) or (self.kind == TK_BNODE):
+        s = self.parse_subject()
+        if self.is_punct(u"{"): self.parse_graph_block() # TriG named graph
+        else:
+          self.parse_triples(s)
+          self.expect(u".")
+      else:
+        self.parse_triples()
+        if self.is_punct(u"{"): self.parse_graph_block() # TriG graph named by a blank node
+        else: self.expect(u".")
+    return 0
+  
+def parse_turtle(object f, object queue, str default_base, int batch_size):
+  cdef _TurtleParser parser = _TurtleParser(f, queue, default_base, batch_size)
+  try:
+    parser.parse()
+  except Exception as e:
+    raise OwlReadyOntologyParsingError("Turtle parsing error in file %s, line %s: %s." % (getattr(f, "name", getattr(f, "url", "???")), parser.current_line(), e)) from e
+  parser.flush()
@@ -341,18 +341,16 @@ class PropertyClass(EntityClass):
     if   not isinstance(entity, EntityClass):
       eqs    = list(entity.equivalent_to.self_and_indirect_equivalent())
       values = { onto._to_python(o, d)
-                 for P    in Prop.descendants()
-                 for eq   in eqs
-                 for o, d in world._get_triples_sp_od(eq.storid, P.storid) }
+                 for ods  in world._get_triples_ssps_spod([eq.storid for eq in eqs], [P.storid for P in Prop.descendants()]).values()
+                 for o, d in ods }
       for eq in eqs:
         values.extend(Prop._get_indirect_values_for_individual(eq.__class__))
         
     else:
       storids = [ancestor.storid for ancestor in entity.ancestors()]
       values = { onto._to_python(o, d)
-                 for P      in Prop.descendants()
-                 for storid in storids
-                 for o, d   in world._get_triples_sp_od(storid, P.storid) }
+                 for ods  in world._get_triples_ssps_spod(storids, [P.storid for P in Prop.descendants()]).values()
+                 for o, d in ods }
     return list(values)
   
   def _get_indirect_value_for_class(Prop, entity):
@@ -608,8 +606,10 @@ class ObjectPropertyClass(ReasoningPropertyClass):
     eqs     = list(entity.equivalent_to.self_and_indirect_equivalent())
     already_applied_class = set()
     
-    prop_storids = []
-    values       = set()
+    prop_storids    = []
+    direct_storids  = []
+    inverse_storids = []
+    values          = set()
     if issubclass_python(Prop, ReflexiveProperty): values.add(entity)
     
     for P in Props:
@@ -617,16 +617,19 @@ class ObjectPropertyClass(ReasoningPropertyClass):
         if P._inverse_storid: prop_storids.append((P.storid, P._inverse_storid))
         else:                 prop_storids.append((P.storid, None))
       else:
-        if P._inverse_storid:
-          values.update(onto._to_python(o)
-                        for eq in eqs
-                        for g in (world._get_obj_triples_sp_o(eq.storid, P.storid), world._get_obj_triples_po_s(P._inverse_storid, eq.storid))
-                        for o in g )
-        else:
-          values.update(onto._to_python(o)
-                        for eq in eqs
-                        for o in  world._get_obj_triples_sp_o(eq.storid, P.storid) )
-          
+        direct_storids.append(P.storid)
+        if P._inverse_storid: inverse_storids.append(P._inverse_storid)
+        
+    eq_storids = [eq.storid for eq in eqs]
+    if direct_storids:
+      values.update(onto._to_python(o)
+                    for os in world._get_obj_triples_ssps_spo(eq_storids, direct_storids).values()
+                    for o  in os )
+    if inverse_storids:
+      values.update(onto._to_python(s)
+                    for ss in world._get_obj_triples_psos_pos(inverse_storids, eq_storids).values()
+                    for s  in ss )
+      
     if prop_storids:
       for eq in eqs:
         new_values = [onto._to_python(o) for o in world._get_obj_triples_transitive_sp_indirect(eq.storid, prop_storids)]
@@ -844,10 +847,12 @@ class DataPropertyClass(ReasoningPropertyClass):
   
   def _get_indirect_values_for_individual(Prop, entity):
     eqs    = list(entity.equivalent_to.self_and_indirect_equivalent())
+    Props  = list(Prop.descendants())
+    groups = entity.namespace.world._get_data_triples_ssps_spod([eq.storid for eq in eqs], [P.storid for P in Props])
     values = [entity.namespace.ontology._to_python(o, d)
-              for P    in Prop.descendants()
+              for P    in Props
               for eq   in eqs
-              for o, d in entity.namespace.world._get_data_triples_sp_od(eq.storid, P.storid)]
+              for o, d in groups.get((eq.storid, P.storid), ())]
     
     values.extend(Prop._get_indirect_values_for_class(entity.__class__))
     return values
@@ -858,10 +863,12 @@ class DataPropertyClass(ReasoningPropertyClass):
     
     if   Prop._class_property_relation:
       storids = [ancestor.storid for ancestor in entity.ancestors()]
+      Props   = list(Props)
+      groups  = entity.namespace.world._get_data_triples_ssps_spod(storids, [P.storid for P in Props])
       return [ entity.namespace.ontology._to_python(o, d)
                for storid in storids
                for P in Props
-               for o, d in entity.namespace.world._get_data_triples_sp_od(storid, P.storid) ]
+               for o, d in groups.get((storid, P.storid), ()) ]
       
     elif Prop._class_property_some:
       return list(set(r.value for r in _inherited_properties_value_restrictions(entity, Props, set())
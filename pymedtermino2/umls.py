@@ -633,7 +633,7 @@ def import_umls(umls_zip_filename, terminologies = None, langs = None, fts_index
   PYM = create_model()
   default_world.save()
   
-  #default_world.graph.set_indexed(False)
+  default_world.graph.set_indexed(False)
   
   importer = _Importer(PYM, terminologies, langs, extract_groups, extract_attributes, extract_relations, extract_definitions, remove_suppressed)
   
@@ -745,8 +745,8 @@ def import_umls(umls_zip_filename, terminologies = None, langs = None, fts_index
   importer = None # Free memory
   #default_world.save()
   
-  #print("Indexing...")
-  #default_world.graph.set_indexed(True)
+  print("Indexing...")
+  default_world.graph.set_indexed(True)
   PYM = get_ontology("http://PYM/").load()
   
   if fts_index:
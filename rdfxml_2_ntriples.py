@@ -17,9 +17,11 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import sys, os.path, xml, xml.parsers.expat
+import sys, os.path, xml, xml.parsers.expat, pickle
 #from urllib.parse import urljoin
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from itertools import groupby
+from operator import itemgetter
 
 try:
   from owlready2.base import OwlReadyOntologyParsingError
@@ -38,6 +40,140 @@ def is_fake_bn(x):
   if isinstance(x, str): return x.startswith("_ ")
   return False
 
+class _SpillingDict(object):
+  """A dict that keeps its most recently used items in memory, and spills the others in a temporary SQLite database;
+used for the blank node bookkeeping when parsing with a memory budget. Only the value returned by the last access to a key
+may be modified in place, since spilled values are pickled."""
+  def __init__(self, max_items, default_factory = None):
+    import sqlite3
+    self.db              = sqlite3.connect("") # Private temporary database, on disk
+    self.db.execute("CREATE TABLE spilled (key PRIMARY KEY, value BLOB)")
+    self.hot             = OrderedDict()
+    self.max_items       = max_items
+    self.default_factory = default_factory
+    self.nb_spilled      = 0
+    
+  def _set_hot(self, key, value):
+    self.hot[key] = value
+    self.hot.move_to_end(key)
+    if len(self.hot) > self.max_items: # Spill the least recently used tenth
+      spilled = [self.hot.popitem(False) for i in range(max(1, self.max_items // 10))]
+      self.db.executemany("INSERT INTO spilled VALUES (?,?)", [(k, pickle.dumps(v, pickle.HIGHEST_PROTOCOL)) for k, v in spilled])
+      self.nb_spilled += len(spilled)
+      
+  def _unspill(self, key):
+    if not self.nb_spilled: return None
+    r = self.db.execute("SELECT value FROM spilled WHERE key=?", (key,)).fetchone()
+    if r is None: return None
+    self.db.execute("DELETE FROM spilled WHERE key=?", (key,))
+    self.nb_spilled -= 1
+    value = pickle.loads(r[0])
+    self._set_hot(key, value)
+    return value
+  
+  def __getitem__(self, key):
+    value = self.hot.get(key)
+    if value is None:
+      value = self._unspill(key)
+      if value is None:
+        if self.default_factory is None: raise KeyError(key)
+        value = self.default_factory()
+        self._set_hot(key, value)
+    else:
+      self.hot.move_to_end(key)
+    return value
+  
+  def __setitem__(self, key, value):
+    if self.nb_spilled and not key in self.hot:
+      self.nb_spilled -= self.db.execute("DELETE FROM spilled WHERE key=?", (key,)).rowcount
+    self._set_hot(key, value)
+    
+  def __contains__(self, key): return (key in self.hot) or (self._unspill(key) is not None)
+  
+  def get(self, key, default = None):
+    if key in self: return self[key]
+    return default
+  
+  def __len__(self): return len(self.hot) + self.nb_spilled
+  
+  def items(self): # The spilled items are loaded one at a time; the dict must not be accessed during the iteration
+    yield from list(self.hot.items())
+    for key, value in self.db.execute("SELECT key, value FROM spilled"):
+      yield key, pickle.loads(value)
+      
+      
+class _SpillingListDict(object):
+  """A dict of lists, like defaultdict(list), stored in the temporary database of a _SpillingDict; the lists only support
+append() and insert(0, value). Items are sorted by key."""
+  def __init__(self, spilling_dict, name):
+    self.db   = spilling_dict.db
+    self.name = name
+    self.nb   = 0
+    self.db.execute("CREATE TABLE %s (key, pos INTEGER, value BLOB)" % name)
+    self.db.execute("CREATE INDEX index_%s ON %s(key, pos)" % (name, name))
+    
+  def _add(self, key, sign, value):
+    self.nb += 1
+    self.db.execute("INSERT INTO %s VALUES (?,?,?)" % self.name, (key, sign * self.nb, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+    
+  def __getitem__(self, key): return _SpilledList(self, key)
+  
+  def __len__(self): return self.nb
+  
+  def items(self):
+    for key, rows in groupby(self.db.execute("SELECT key, value FROM %s ORDER BY key, pos" % self.name), itemgetter(0)):
+      yield key, [pickle.loads(value) for key2, value in rows]
+      
+class _SpilledList(object):
+  __slots__ = ["list_dict", "key"]
+  def __init__(self, list_dict, key):
+    self.list_dict = list_dict
+    self.key       = key
+    
+  def append(self, value): self.list_dict._add(self.key, 1, value)
+  
+  def insert(self, index, value):
+    if index != 0: raise ValueError("Only insert(0, value) is supported!")
+    self.list_dict._add(self.key, -1, value)
+    
+    
+class _BlankNodesByContent(object):
+  """Maps the contents of blank nodes (frozensets) to the blank nodes having them, in the order they were added."""
+  def __init__(self, bns):
+    self.content_2_bns = defaultdict(list)
+    
+  def add(self, content, bn): self.content_2_bns[content].append(bn)
+  add_new = add
+  
+  def get(self, content): return self.content_2_bns.get(content) or []
+  
+class _SpilledBlankNodesByContent(object):
+  """Same as _BlankNodesByContent, but stored in the temporary database of bns, a _SpillingDict. Only the hashes of the
+contents are stored; the blank nodes found are then checked against their content in bns."""
+  def __init__(self, bns):
+    self.bns = bns
+    bns.db.execute("CREATE TABLE content_2_bns (hash INTEGER, bn)")
+    bns.db.execute("CREATE INDEX index_content_2_bns ON content_2_bns(hash)")
+    
+  def add(self, content, bn): self.bns.db.execute("INSERT INTO content_2_bns VALUES (?,?)", (hash(content), bn))
+  
+  def add_new(self, content, bn): # For blank nodes created after parsing, which are not yet in bns
+    self.bns[bn] = set(content)
+    self.add(content, bn)
+    
+  def get(self, content):
+    bns = self.bns
+    return [bn for (bn,) in bns.db.execute("SELECT bn FROM content_2_bns WHERE hash=? ORDER BY rowid", (hash(content),)).fetchall()
+            if frozenset(bns[bn]) == content]
+  
+def _index_blank_nodes_by_content(bns, is_fake_bn):
+  """returns a _BlankNodesByContent for the blank nodes in bns (a dict or a _SpillingDict), except the fake ones."""
+  if isinstance(bns, _SpillingDict): index = _SpilledBlankNodesByContent(bns)
+  else:                              index = _BlankNodesByContent(bns)
+  for bn, content in bns.items():
+    if not is_fake_bn(bn): index.add(frozenset(content), bn)
+  return index
+
 def urljoin(base, name): # Reimplement because urllib.parse.urljoin remove trailing ?
   if name.startswith(("http://", "https://")): return name
   if name.startswith("/"):
@@ -49,7 +185,7 @@ def urljoin(base, name): # Reimplement because urllib.parse.urljoin remove trail
   if base.endswith("/"): return "%s%s" % (base, name)
   return "%s/%s" % (base, name)
 
-def parse(f, on_prepare_obj = None, on_prepare_data = None, new_blank = None, default_base = ""):
+def parse(f, on_prepare_obj = None, on_prepare_data = None, new_blank = None, default_base = "", memory_budget = None):
   parser = xml.parsers.expat.ParserCreate(None, "")
   try:
     parser.buffer_text          = True
@@ -65,12 +201,12 @@ def parse(f, on_prepare_obj = None, on_prepare_data = None, new_blank = None, de
   current_content          = ""
   current_attrs            = None
   nb_triple                = 0
-  bns                      = defaultdict(set)
+  bns                      = _SpillingDict(max(100, memory_budget // 4000), set) if memory_budget else defaultdict(set) # ~1 Kb per blank node, a quarter of the budget
   dont_create_unnamed_bn   = False
   axiom_annotation_sources = {}
   axiom_annotation_props   = {}
   axiom_annotation_targets = {}
-  triples_with_unnamed_bn  = defaultdict(list)
+  triples_with_unnamed_bn  = _SpillingListDict(bns, "triples_with_unnamed_bn") if memory_budget else defaultdict(list)
   if default_base:
     xml_base = default_base
     if xml_base.endswith("#") or xml_base.endswith("/"): xml_base = xml_base[:-1]
@@ -328,14 +464,11 @@ def parse(f, on_prepare_obj = None, on_prepare_data = None, new_blank = None, de
   
   
   if triples_with_unnamed_bn:
-    content_2_bns = defaultdict(list)
-    for bn, content in bns.items():
-      if not is_fake_bn(bn):
-        content_2_bns[frozenset(content)].append(bn)
-        
+    content_2_bns = _index_blank_nodes_by_content(bns, is_fake_bn)
+    
     def rebuild_bn(content):
       bn = new_blank()
-      content_2_bns[frozenset(content)].append(bn)
+      content_2_bns.add_new(frozenset(content), bn)
       for i in content:
         if   i[0] == "REL":
           drop, p, o = i
@@ -366,14 +499,14 @@ def parse(f, on_prepare_obj = None, on_prepare_data = None, new_blank = None, de
           if p == "http://www.w3.org/2002/07/owl#annotatedSource":
             target = axiom_annotation_targets[axiom_iri]
             if is_bn(target): target = frozenset(bns[target])
-            candidates_bn = content_2_bns[frozenset(content | { ("REL", axiom_annotation_props[axiom_iri], target) })]
+            candidates_bn = content_2_bns.get(frozenset(content | { ("REL", axiom_annotation_props[axiom_iri], target) }))
             
           else:
             source = axiom_annotation_sources[axiom_iri]
             if is_bn(source):
               source = frozenset(bns[source] | { ("REL", axiom_annotation_props[axiom_iri], target) })
-            candidates_bn = (content_2_bns[frozenset(content | { ("INV", axiom_annotation_props[axiom_iri], source) })] or
-                             content_2_bns[frozenset(content)])
+            candidates_bn = (content_2_bns.get(frozenset(content | { ("INV", axiom_annotation_props[axiom_iri], source) })) or
+                             content_2_bns.get(frozenset(content)))
             
           if candidates_bn: o = candidates_bn[-1]
           else:
@@ -40,6 +40,8 @@ class Translator(object):
     self.main_query                    = None
     self.preliminary_selects           = []
     self.recursive_preliminary_selects = {}
+    self.closure_predicates            = set()
+    self.use_closure                   = True
     self.escape_mark                   = "@@@ESCAPE@@@"
     self.next_table_id                 = 1
     self.table_name_2_type             = {}
@@ -53,6 +55,8 @@ class Translator(object):
     translator = Translator(self.world, self.error_on_undefined_entities)
     translator.prefixes = self.prefixes.copy()
     translator.base_iri = self.base_iri
+    translator.closure_predicates = self.closure_predicates
+    translator.use_closure        = self.use_closure
     return translator
   
   def parse(self, sparql):
@@ -60,7 +64,11 @@ class Translator(object):
       self.escape_mark += "ç"
     CURRENT_TRANSLATOR.set(self)
     self.main_query = PARSER.parse(LEXER.lex(sparql))
-    return self.finalize()
+    r = self.finalize()
+    if r.closure_predicates: # For translating it again without the closure, if the closure is invalidated
+      r.sparql                      = sparql
+      r.error_on_undefined_entities = self.error_on_undefined_entities
+    return r
     
   def finalize(self):
     sql = ""
@@ -101,13 +109,14 @@ class Translator(object):
       sql = re.sub("%s[^ ]*" % self.escape_mark, sub, sql)
       
     if   self.main_query.type == "select":
-      return PreparedSelectQuery(self.world, sql, [column.var for column in self.main_query.columns if not column.name.endswith("d")], [column.type for column in self.main_query.columns], nb_parameter, parameter_datatypes)
+      r = PreparedSelectQuery(self.world, sql, [column.var for column in self.main_query.columns if not column.name.endswith("d")], [column.type for column in self.main_query.columns], nb_parameter, parameter_datatypes)
     
     elif self.main_query.type == "modify":
       select_param_indexes = [i - 1 for i in self.main_query.select_param_indexes]
-      return PreparedModifyQuery(self.world, sql, [column.var for column in self.main_query.columns if not column.name.endswith("d")], [column.type for column in self.main_query.columns], nb_parameter, parameter_datatypes, self.world.get_ontology(self.main_query.ontology_iri.value) if self.main_query.ontology_iri else None, self.parse_inserts_deletes(self.main_query.deletes, self.main_query.columns, False), self.parse_inserts_deletes(self.main_query.inserts, self.main_query.columns, True), select_param_indexes)
-    
-    
+      r = PreparedModifyQuery(self.world, sql, [column.var for column in self.main_query.columns if not column.name.endswith("d")], [column.type for column in self.main_query.columns], nb_parameter, parameter_datatypes, self.world.get_ontology(self.main_query.ontology_iri.value) if self.main_query.ontology_iri else None, self.parse_inserts_deletes(self.main_query.deletes, self.main_query.columns, False), self.parse_inserts_deletes(self.main_query.inserts, self.main_query.columns, True), select_param_indexes)
+      
+    r.closure_predicates = self.closure_predicates
+    return r
   
   def parse_inserts_deletes(self, triples, columns, is_insert):
     var_2_column = { column.var : column for column in self.main_query.columns if not column.name.endswith("d") }
@@ -281,6 +290,8 @@ def _list_2_json(l):
 
 
 class PreparedQuery(object):
+  closure_predicates  = ()
+  sql_without_closure = None
   def __init__(self, world, sql, column_names, column_types, nb_parameter, parameter_datatypes):
     self.world               = world
     self.sql                 = sql
@@ -289,8 +300,26 @@ class PreparedQuery(object):
     self.nb_parameter        = nb_parameter
     self.parameter_datatypes = parameter_datatypes
     
+  def _get_sql(self):
+    for p in self.closure_predicates:
+      if not self.world.graph._check_closure(p): # The closure has been invalidated since the query was prepared
+        if self.sql_without_closure is None:
+          translator = Translator(self.world, self.error_on_undefined_entities)
+          translator.use_closure = False
+          self.sql_without_closure = translator.parse(self.sparql).sql
+        return self.sql_without_closure
+    return self.sql
+  
+  def _get_closure_state(self):
+    if not self.closure_predicates: return None
+    return [tuple(self.closure_predicates), self.sparql, self.error_on_undefined_entities, self.sql_without_closure]
+  
+  def _set_closure_state(self, l):
+    if l: self.closure_predicates, self.sparql, self.error_on_undefined_entities, self.sql_without_closure = l
+    
   def execute_raw(self, params = (), spawn = False):
     self.world._nb_sparql_call += 1
+    sql = self._get_sql()
     sql_params = [_list_2_json(param) if isinstance(param, list) else self.world._to_rdf(param)[0] for param in params]
     for i in self.parameter_datatypes: sql_params.append(self.world._to_rdf(params[i])[1] or "o")
     if spawn:
@@ -299,26 +328,28 @@ class PreparedQuery(object):
         r = None
         def f():
           nonlocal r
-          r = db.execute(self.sql, sql_params)
+          r = db.execute(sql, sql_params)
         spawn(f).join()
         return r
     else:
-      return self.world.graph.execute(self.sql, sql_params)
+      return self.world.graph.execute(sql, sql_params)
     
   def execute_raw_with_db(self, params, db):
     self.world._nb_sparql_call += 1
+    sql = self._get_sql()
     sql_params = [self.world._to_rdf(param)[0] for param in params]
     for i in self.parameter_datatypes: sql_params.append(self.world._to_rdf(params[i])[1] or "o")
-    return db.execute(self.sql, sql_params)
+    return db.execute(sql, sql_params)
   
 class PreparedSelectQuery(PreparedQuery):
   def __getstate__(self):
-    return [self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes]
+    return [self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes, self._get_closure_state()]
   
   def __setstate__(self, l):
     import owlready2
-    self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes = l
+    self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes, closure_state = l
     self.world = owlready2.default_world
+    self._set_closure_state(closure_state)
     
   def execute(self, params = (), execute_raw_result = None, spawn = False):
     if execute_raw_result is None: execute_raw_result = self.execute_raw(params, spawn)
@@ -515,12 +546,13 @@ class PreparedModifyQuery(PreparedQuery):
       self.full_deletes = list(delete_s & delete_o) # Also destroy IRI/storid in resources table!
       
   def __getstate__(self):
-    return [self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes, self.ontology and self.ontology.iri, self.deletes, self.inserts, self.select_param_indexes]
+    return [self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes, self.ontology and self.ontology.iri, self.deletes, self.inserts, self.select_param_indexes, self._get_closure_state()]
   
   def __setstate__(self, l):
     import owlready2
-    self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes, ontology_iri, self.deletes, self.inserts, self.select_param_indexes = l
+    self.sql, self.column_names, self.column_types, self.nb_parameter, self.parameter_datatypes, ontology_iri, self.deletes, self.inserts, self.select_param_indexes, closure_state = l
     self.world = owlready2.default_world
+    self._set_closure_state(closure_state)
     self.ontology = ontology_iri and self.world.get_ontology(ontology_iri)
     
   def execute_raw(self, params = (), spawn = False):
@@ -584,6 +616,7 @@ class PreparedModifyQuery(PreparedQuery):
     
     if self.deletes and self.full_deletes:
       self.world.graph.db.executemany("DELETE FROM resources WHERE storid=?", full_delete_storids)
+      for (storid,) in full_delete_storids: self.world.graph._uncache_abbreviation(storid)
       
     return nb_match
   
@@ -1036,6 +1069,9 @@ class SQLQuery(FuncSupport):
         conditions = self.conditions
       self.translator.next_table_id += 1
       
+      if triple.consider_p and (triple.likelihood_p is None) and (not p.modifier) and (not getattr(p, "inversed", False)) and hasattr(p, "storid"):
+        triple.likelihood_p, triple.likelihood_o = self.translator.world.graph.get_triple_likelihoods(triple.local_table_type, p.storid, getattr(o, "storid", None))
+        
       if triple.consider_s: self.create_conditions(conditions, table, "s", s)
       if triple.consider_p: self.create_conditions(conditions, table, "p", p, triple.likelihood_p)
       if triple.consider_o: self.create_conditions(conditions, table, "o", o, triple.likelihood_o)
@@ -1389,8 +1425,26 @@ class SQLRecursivePreliminaryQuery(SQLQuery):
     self.recursive    = True
     self.preliminary  = True
     
+  def get_closure_predicate(self, p):
+    if self.need_d or isinstance(p, NegatedPropPath) or (not p.modifier in ("*", "+")): return None
+    if isinstance(p, UnionPropPath):
+      if not all(i.name == "IRI" for i in p): return None
+      direct_ps   = { i.storid for i in p if not i.inversed }
+      inversed_ps = { i.storid for i in p if     i.inversed }
+      if (direct_ps == { rdfs_subclassof, owl_equivalentclass }) and (inversed_ps == { owl_equivalentclass }): closure_p = owl_equivalentclass
+      else: return None
+    else:
+      if (p.name != "IRI") or getattr(p, "inversed", False) or (not p.storid in (rdfs_subclassof, rdfs_subpropertyof)): return None
+      closure_p = p.storid
+    if (not self.translator.use_closure) or (not self.translator.world.graph._check_closure(closure_p)): return None
+    return closure_p
+  
   def build(self, triple, prelim_triples):
     s, p, o = triple
+    self.closure_p = self.get_closure_predicate(p)
+    if self.closure_p: # A single step in the closure table, from the initial values only
+      self.need_nb = True
+      self.translator.closure_predicates.add(self.closure_p)
     column_names = [self.non_fixed] + ["d"] * self.need_d + [self.fixed] * self.need_orig + ["nb"] * self.need_nb
     if self.fixed_var and prelim_triples: value = self.fixed_var
     else:                                 value = s if self.fixed == "s" else o
@@ -1422,6 +1476,17 @@ class SQLRecursivePreliminaryQuery(SQLQuery):
       self.create_conditions(p_direct_conditions, Table(None, "q", "quads2" if self.need_d else "objs"), "p", p)
       
     self.extra_sql = ""
+    if self.closure_p:
+      self.extra_sql += """
+UNION
+SELECT q.%s%s, 1%s FROM closure q, %s rec WHERE q.p=%s AND rec.nb=0 AND q.%s=rec.%s""" % (
+  self.non_fixed,
+  ", rec.%s" % self.fixed if self.need_orig else "",
+  "".join(", rec.%s" % col.name for col in extra_cols),
+  self.name, self.closure_p,
+  self.fixed, self.non_fixed)
+      return
+    
     if p_direct_conditions:
       self.extra_sql += """
 UNION
@@ -1,4 +1,4 @@
-import sys, os, unittest, tempfile, atexit, datetime, subprocess, multiprocessing
+import sys, os, unittest, tempfile, atexit, datetime, subprocess, multiprocessing, json, gzip, pickle, contextlib
 from io import StringIO, BytesIO
 
 """
@@ -96,7 +96,23 @@ class BaseTest(object):
       
     assert not removed
     assert not added
-
+    
+  def assert_reload_equivalent(self, onto, f, **kargs):
+    if isinstance(f, bytes): f = BytesIO(f)
+    onto2 = self.new_world().get_ontology(onto.base_iri).load(fileobj = f, **kargs)
+    nt  = BytesIO(); onto .save(nt,  format = "ntriples")
+    nt2 = BytesIO(); onto2.save(nt2, format = "ntriples")
+    self.assert_ntriples_equivalent(nt2.getvalue().decode("utf8"), nt.getvalue().decode("utf8"))
+    return onto2
+  
+  @contextlib.contextmanager
+  def patch_constants(self, module, **values):
+    olds = { name : getattr(module, name) for name in values }
+    for name, value in values.items(): setattr(module, name, value)
+    try:     yield
+    finally:
+      for name, value in olds.items(): setattr(module, name, value)
+      
   def new_tmp_file(self):
     fileno, filename = tempfile.mkstemp()
     TMPFILES.append(filename)
@@ -329,6 +345,481 @@ class Test(BaseTest, unittest.TestCase):
         
     assert before != world.graph.execute("SELECT * FROM sqlite_stat1").fetchall()
     
+  def test_world_11(self):
+    world = self.new_world()
+    onto = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      c = C("c")
+      
+    storid = world._abbreviate("http://test.org/test.owl#c")
+    stats  = world.graph.get_abbreviate_cache_stats()
+    assert world._abbreviate("http://test.org/test.owl#c") == storid
+    assert world._unabbreviate(storid) == "http://test.org/test.owl#c"
+    assert world.graph.get_abbreviate_cache_stats()["hits"] == stats["hits"] + 2
+    
+    c.iri = "http://test.org/test.owl#d"
+    assert world._unabbreviate(storid) == "http://test.org/test.owl#d"
+    assert world._abbreviate("http://test.org/test.owl#c", False) is None
+    
+    onto.base_iri = "http://test.org/test2.owl#"
+    assert world._unabbreviate(C.storid) == "http://test.org/test2.owl#C"
+    
+    destroy_entity(c)
+    assert world._abbreviate("http://test.org/test2.owl#d", False) is None
+    
+  def test_world_12(self):
+    world = self.new_world()
+    world.graph.set_abbreviate_cache_size(2)
+    storids = [world._abbreviate("http://test.org/test.owl#x%s" % i) for i in range(5)]
+    assert world.graph.get_abbreviate_cache_stats()["size"] == 2
+    assert [world._unabbreviate(storid) for storid in storids] == ["http://test.org/test.owl#x%s" % i for i in range(5)]
+    
+    world.graph.set_abbreviate_cache_size(0)
+    assert world._abbreviate("http://test.org/test.owl#x1") == storids[1]
+    assert world.graph.get_abbreviate_cache_stats()["hits"] == 0
+    
+  def test_world_13(self):
+    world = self.new_world()
+    world.save() # Releases the ids reserved during world creation
+    world.graph.id_block_size = 10
+    storid0 = world.graph.execute("SELECT current_resource FROM store").fetchone()[0]
+    blank0  = world.graph.execute("SELECT current_blank FROM store").fetchone()[0]
+    
+    storids = [world._abbreviate("http://test.org/test.owl#x%s" % i) for i in range(15)]
+    blanks  = [world.new_blank_node() for i in range(3)]
+    assert storids == list(range(storid0 + 1, storid0 + 16))
+    assert blanks  == [-(blank0 + 1), -(blank0 + 2), -(blank0 + 3)]
+    assert world.graph.execute("SELECT current_resource FROM store").fetchone()[0] == storid0 + 20
+    
+    world.save()
+    assert world.graph.execute("SELECT current_resource FROM store").fetchone()[0] == storid0 + 15
+    assert world.graph.execute("SELECT current_blank FROM store").fetchone()[0] == blank0 + 3
+    assert world._abbreviate("http://test.org/test.owl#y") == storid0 + 16
+    
+  def test_world_14(self):
+    world = self.new_world()
+    onto = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      c1 = C(label = ["Maladies du rein"])
+    world.full_text_search_properties.append(label)
+    world.save()
+    
+    world.graph.set_indexed(False)
+    assert not world.graph.execute("SELECT 1 FROM sqlite_master WHERE name='index_objs_sp'").fetchone()
+    assert not world.graph.execute("SELECT 1 FROM sqlite_master WHERE type='trigger'").fetchone()
+    
+    n = world.get_ontology("http://www.semanticweb.org/jiba/ontologies/2017/0/test").load()
+    with onto:
+      c2 = C(label = ["Cancer du rein"])
+      onto._add_obj_triple_spo(c2.storid, rdf_type, C.storid) # Duplicate
+    assert world._has_obj_triple_spo(c2.storid, rdf_type, C.storid)
+    
+    world.graph.set_indexed(True)
+    assert world.graph.execute("SELECT 1 FROM sqlite_master WHERE name='index_objs_sp'").fetchone()
+    assert world.graph.execute("SELECT COUNT() FROM objs WHERE s=? AND p=? AND o=?", (c2.storid, rdf_type, C.storid)).fetchone()[0] == 1
+    assert set(world.search(label = FTS("rein"))) == { c1, c2 }
+    assert n.Pizza in n.ma_pizza.is_a
+    assert world.graph.indexed
+    
+  def test_world_15(self):
+    tmp = self.new_tmp_file()
+    world = World(filename = tmp)
+    onto = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      C(); C()
+    world.graph.set_indexed(False)
+    world.save()
+    world.close()
+    
+    world = World(filename = tmp) # Bulk loading interrupted => indexes are rebuilt
+    assert world.graph.indexed
+    assert world.graph.execute("SELECT 1 FROM sqlite_master WHERE name='index_objs_op'").fetchone()
+    assert not world.graph.execute("SELECT 1 FROM sqlite_master WHERE name='deferred_indexes'").fetchone()
+    assert len(world.get_ontology("http://test.org/test.owl").C.instances()) == 2
+    
+  def test_world_16(self):
+    world = self.new_world()
+    onto = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      c1 = C(); c2 = C()
+      
+    world.graph.set_profiling(True)
+    assert len(C.instances()) == 2
+    assert c1.is_a == [C]
+    assert len(list(world.sparql("""SELECT ?x { ?x a ?? }""", [C]))) == 2
+    assert world.graph.execute("SELECT 1").fetchone() == (1,)
+    
+    stats = world.graph.get_profiling_stats()
+    assert len(stats) > 0
+    nb_rows = 0
+    for sql, callers in stats.items():
+      assert not "\n" in sql
+      for caller, stat in callers.items():
+        assert stat["count"] >= 1
+        assert stat["p50_time"] <= stat["p99_time"]
+        nb_rows += stat["rows"]
+    assert nb_rows >= 4
+    assert any(caller.startswith("sparql.") for callers in stats.values() for caller in callers)
+    assert stats["SELECT ?"]["%s.Test.test_world_16" % __name__]["rows"] == 1
+    import json
+    assert json.loads(world.graph.get_profiling_stats("json")) == stats
+    
+    world.graph.set_profiling(False)
+    world.graph.reset_profiling()
+    assert len(C.instances()) == 2
+    assert world.graph.get_profiling_stats() == {}
+    
+  def test_world_17(self):
+    world = self.new_world()
+    onto = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class A(Thing): pass
+      class B(A): pass
+      class C(B): pass
+      class D(Thing): equivalent_to = [C]
+      class P(ObjectProperty): pass
+      class Q(P): pass
+      b = B(); d = D()
+      
+    def check():
+      assert set(A.descendants()) == { A, B, C, D }
+      assert set(A.instances()) == { b, d }
+      assert set(world.search(type = A)) == { b }
+      assert set(world.search(subclass_of = A)) == { A, B, C }
+      assert set(world.search(is_a = A)) == { A, B, C, b }
+      assert set(world.search(subproperty_of = P)) == { P, Q }
+      assert { x for (x,) in world.sparql("""SELECT ?x { ?x rdfs:subClassOf* ?? }""", [A]) } == { A, B, C }
+      assert { x for (x,) in world.sparql("""SELECT ?x { ?? rdfs:subClassOf+ ?x }""", [C]) } == { Thing, A, B }
+      assert set(world._get_obj_triples_transitive_sp(C.storid, rdfs_subclassof)) == { Thing.storid, A.storid, B.storid }
+      
+    check()
+    world.graph.enable_transitive_closure()
+    check()
+    assert "closure" in world.prepare_sparql("""SELECT ?x { ?x rdfs:subClassOf* ?? }""").sql
+    assert world.graph.execute("SELECT 1 FROM closure WHERE p=? AND s=? AND o=?", (rdfs_subclassof, C.storid, A.storid)).fetchone()
+    
+    with onto:
+      class E(D): pass
+      e = E()
+    assert world.graph.execute("SELECT 1 FROM closure WHERE p=? AND s=? AND o=?", (owl_equivalentclass, E.storid, A.storid)).fetchone() # Incremental update
+    assert set(A.instances()) == { b, d, e }
+    
+    q = pickle.loads(pickle.dumps(world.prepare_sparql("""SELECT ?x { ?x rdfs:subClassOf* ?? }""")))
+    q.world = world
+    world.graph._invalidate_closure()
+    assert { x for (x,) in q.execute([A]) } == { A, B, C }
+    assert q.sql_without_closure # Falls back to recursive SQL after unpickling
+    world.graph.update_closure()
+    
+    def check_rebuilt():
+      closure = set(world.graph.execute("SELECT * FROM closure"))
+      world.graph._invalidate_closure()
+      world.graph.update_closure()
+      assert set(world.graph.execute("SELECT * FROM closure")) == closure
+      
+    C.is_a = [Thing]
+    assert world.graph._check_closure(rdfs_subclassof) # Updated incrementally
+    assert world.graph._check_closure(owl_equivalentclass)
+    assert not world.graph.execute("SELECT 1 FROM closure WHERE p=? AND s=? AND o=?", (rdfs_subclassof, C.storid, A.storid)).fetchone()
+    assert not world.graph.execute("SELECT 1 FROM closure WHERE p=? AND s=? AND o=?", (owl_equivalentclass, E.storid, A.storid)).fetchone()
+    assert world.graph.execute("SELECT 1 FROM closure WHERE p=? AND s=? AND o=?", (owl_equivalentclass, E.storid, C.storid)).fetchone()
+    check_rebuilt()
+    
+    def check2():
+      assert set(A.descendants()) == { A, B }
+      assert set(world.search(subclass_of = A)) == { A, B }
+      assert set(world.search(is_a = A)) == { A, B, b }
+      assert { x for (x,) in world.sparql("""SELECT ?x { ?x rdfs:subClassOf* ?? }""", [A]) } == { A, B }
+    check2()
+    
+    world.graph.execute("DELETE FROM objs WHERE s=? AND p=? AND o=?", (B.storid, rdfs_subclassof, A.storid))
+    assert not world.graph._check_closure(rdfs_subclassof) # Derived again at the next commit
+    assert { x for (x,) in world.sparql("""SELECT ?x { ?x rdfs:subClassOf* ?? }""", [A]) } == { A } # Recursive SQL
+    world.graph.commit()
+    assert world.graph._check_closure(rdfs_subclassof)
+    check_rebuilt()
+    world.graph.execute("INSERT INTO objs VALUES (?,?,?,?)", (onto.graph.c, B.storid, rdfs_subclassof, A.storid))
+    assert world.graph._check_closure(rdfs_subclassof)
+    check2()
+    
+    C.is_a = [B]
+    onto2 = world.get_ontology("http://test.org/t2.owl").load(fileobj = BytesIO(b"""<http://test.org/t2.owl#F> <http://www.w3.org/2000/01/rdf-schema#subClassOf> <http://test.org/test.owl#C> .\n"""), format = "ntriples")
+    assert world.graph._check_closure(rdfs_subclassof) # Rebuilt at the end of the parsing
+    assert set(A.descendants()) == { A, B, C, D, E, onto2.F }
+    
+    destroy_entity(E)
+    assert world.graph._check_closure(rdfs_subclassof)
+    assert world.graph._check_closure(owl_equivalentclass)
+    assert not world.graph.execute("SELECT 1 FROM closure WHERE s=?", (E.storid,)).fetchone()
+    check_rebuilt()
+    assert set(A.descendants()) == { A, B, C, D, onto2.F }
+    
+    world.graph.disable_transitive_closure()
+    assert set(A.descendants()) == { A, B, C, D, onto2.F }
+    
+  def test_world_18(self):
+    world = self.new_world()
+    onto = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class A(Thing): pass
+      class B(A): pass
+      class C(Thing): pass
+      class D(B, C): pass
+      class E(Thing): pass
+      class P(ObjectProperty): pass
+      class Q(P): pass
+      
+    assert world._is_subsumed(D.storid, rdfs_subclassof, { A.storid })
+    labels = world.graph._hierarchy_labels[rdfs_subclassof]
+    assert labels.is_descendant(D.storid, A.storid)
+    assert labels.is_descendant(D.storid, C.storid)
+    assert not labels.is_descendant(A.storid, D.storid)
+    assert not labels.is_descendant(E.storid, A.storid)
+    assert set(labels.descendants(A.storid, False)) == { B.storid, D.storid }
+    assert issubclass(D, A) and issubclass(D, (E, C)) and not issubclass(E, A)
+    assert issubclass(Q, P) and not issubclass(P, Q)
+    assert set(A.descendants()) == { A, B, D }
+    
+    with onto: E.is_a.append(B)
+    assert not rdfs_subclassof in world.graph._hierarchy_labels # Invalidated
+    assert issubclass(E, A)
+    assert set(A.descendants()) == { A, B, D, E }
+    
+    for i in range(world.graph._hierarchy_delays[rdfs_subclassof] + 1): world._is_subsumed(E.storid, rdfs_subclassof, { A.storid })
+    labels = world.graph._hierarchy_labels[rdfs_subclassof] # Rebuilt
+    assert labels.is_descendant(E.storid, A.storid)
+    
+    destroy_entity(B)
+    assert not issubclass(E, A)
+    assert set(A.descendants()) == { A }
+    
+  def test_world_19(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/test.owl")
+    onto2 = world.get_ontology("http://test.org/test2.owl")
+    with onto:
+      class C(Thing): pass
+      class p(ObjectProperty): pass
+      class i(ObjectProperty): inverse_property = p
+      class d(DataProperty): pass
+    cs = [C("c%s" % n, namespace = onto) for n in range(1000)]
+    for n, c in enumerate(cs):
+      c.d = [n]
+      if n: c.p = [cs[n - 1]]
+    with onto2: cs[0].p = [cs[999]]
+    storids = [c.storid for c in cs]
+    
+    values = world._get_obj_triples_ssp_so(storids, p.storid)
+    assert len(values) == 1000
+    assert values[cs[5].storid] == [cs[4].storid]
+    assert set(values[cs[0].storid]) == { cs[999].storid }
+    assert world._get_obj_triples_ssp_sco([cs[0].storid], p.storid)[cs[0].storid] == [(onto2.graph.c, cs[999].storid)]
+    assert set(world._get_obj_triples_sspi_so(storids[:2], p.storid, i.storid)[cs[1].storid]) == { cs[0].storid }
+    assert world._get_data_triples_ssp_sod(storids, d.storid)[cs[42].storid] == [(42, _universal_datatype_2_abbrev[int])]
+    assert world._get_triples_ssp_sod(storids[:3], d.storid)[cs[2].storid] == [(2, _universal_datatype_2_abbrev[int])]
+    assert world._get_obj_triples_ssps_spo(storids[:3], [p.storid, d.storid])[cs[2].storid, p.storid] == [cs[1].storid]
+    assert world._get_data_triples_ssps_spod(storids[:3], [p.storid, d.storid])[cs[2].storid, d.storid] == [(2, _universal_datatype_2_abbrev[int])]
+    assert len(world._get_triples_ssps_spod(storids, [p.storid, d.storid])) == 2000
+    assert world._get_obj_triples_psos_pos([p.storid], storids[:2])[p.storid, cs[0].storid] == [cs[1].storid]
+    assert len(onto._get_obj_triples_ssp_so(storids, p.storid)) == 999
+    assert len(onto2._get_obj_triples_ssp_so(storids, p.storid)) == 1
+    assert onto2._get_obj_triples_ssp_so(storids[1:], p.storid) == {}
+    
+    assert set(cs[1].INDIRECT_p) == { cs[0] }
+    assert set(cs[1].INDIRECT_i) == { cs[2] }
+    assert cs[7].INDIRECT_d == [7]
+    
+  def test_world_20(self):
+    world = World()
+    onto  = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      class p(DataProperty): pass
+    for i in range(2000): C("c%s" % i, p = ["x" * 100])
+    
+    snapshot = self.new_tmp_file()
+    progress = []
+    world.snapshot_to(snapshot, lambda copied, total: progress.append((copied, total)))
+    assert progress and (progress[-1][0] == progress[-1][1])
+    
+    world2 = World(filename = snapshot)
+    onto2  = world2.get_ontology("http://test.org/test.owl")
+    assert len(list(onto2.C.instances())) == 2000
+    assert onto2.c1999.p == ["x" * 100]
+    
+    progress = []
+    world.set_backend(filename = self.new_tmp_file(), backup_progress = lambda copied, total: progress.append((copied, total)))
+    assert progress and (progress[-1][0] == progress[-1][1])
+    assert onto.c1999.p == ["x" * 100]
+    with onto: D = types.new_class("D", (C,))
+    assert world["http://test.org/test.owl#D"] is D
+    
+  def test_world_21(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      class D(Thing): pass
+      class p(ObjectProperty): pass
+    for i in range(3000): C("c%s" % i)
+    D("d", p = [onto.c1])
+    world.graph.analyze()
+    
+    assert world.graph.predicate_stats[rdf_type][0] >= 3001
+    assert world.graph.predicate_stats[p.storid] == (1, 1, 1)
+    assert world.graph.frequent_objects[rdf_type, C.storid] == 3000
+    assert world.graph.context_stats[onto.graph.c] >= 6000
+    assert world.graph.analyze_threshold == 1000
+    
+    stats = dict(world.graph.execute("""SELECT idx, stat FROM sqlite_stat1 WHERE tbl='objs'""").fetchall())
+    assert stats["index_objs_sp"].split()[:2] == [str(world.graph.nb_objs), "2"]
+    
+    likelihood_p, likelihood_o = world.graph.get_triple_likelihoods("objs", rdf_type, C.storid)
+    assert likelihood_p > 0.99 and 0.49 < likelihood_o < 0.51
+    assert world.graph.get_triple_likelihoods("objs", 999999) == (None, None)
+    
+    q = world.prepare_sparql("""SELECT ?x { ?x a <http://test.org/test.owl#C> . ?x <http://test.org/test.owl#p> ?y }""")
+    assert "LIKELIHOOD(" in q.sql
+    assert list(q.execute()) == []
+    
+    with self.patch_constants(owlready2.triplelite, _STATS_SAMPLE_SIZE = 1000): # Sample only a part of the quadstore
+      onto2 = world.get_ontology("http://test.org/test2.owl")
+      for i in range(3000): C("c%s" % i, namespace = onto2)
+      world.graph.analyze()
+    nb_objs = world.graph.nb_objs
+    assert nb_objs > 10 * 1000
+    stats = dict(world.graph.execute("""SELECT idx, stat FROM sqlite_stat1 WHERE tbl='objs'""").fetchall())
+    assert nb_objs / 3 < int(stats["index_objs_c"].split()[1]) <= nb_objs # 2 ontologies (+ a few triples in others)
+    assert nb_objs / 4 < int(stats["index_objs_op"].split()[1]) <= nb_objs # Mostly C and NamedIndividual as objects
+    assert stats["index_objs_sp"].split()[1] == "2" # Subjects are not frequent in the sample, thus not scaled
+    
+    predicate_stats = world.graph.predicate_stats
+    C("c3000", namespace = onto2)
+    world.graph.analyze(False)
+    assert world.graph.predicate_stats is predicate_stats # Not sampled again after a small change
+    assert world.graph.nb_objs > nb_objs
+    
+  def test_world_22(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/test.owl")
+    with onto:
+      class C(Thing): pass
+      class p(DataProperty): pass
+      class r(ObjectProperty): pass
+      class ri(ObjectProperty): inverse_property = r
+    a = C("a")
+    b = C("b")
+    assert a.p == [] and b.ri == []
+    
+    nb = onto.bulk_add([(a, p, 5),
+                        (a, r, b),
+                        ("http://test.org/test.owl#x", rdf_type, C),
+                        ("http://test.org/test.owl#x", p, "hello"),
+                        ("http://test.org/test.owl#x", p, "bonjour", "@fr"),
+                        ("http://test.org/test.owl#x", "http://test.org/test.owl#r", "http://test.org/test.owl#b", None),
+                        ("_:b1", p, 1.5),
+                        ("_:b1", "http://test.org/test.owl#r", "_:b1", None),
+                        ("http://test.org/test.owl#y", p, 7, "http://www.w3.org/2001/XMLSchema#integer"),
+                        ])
+    assert nb == 9
+    assert a.p == [5]
+    assert set(b.ri) == { a, onto.x } # Inverse values are invalidated too
+    assert onto.x.is_a == [C]
+    assert set(onto.x.p) == { "hello", locstr("bonjour", "fr") }
+    assert onto.x.r == [b]
+    assert onto.y.p == [7]
+    assert world.graph.execute("SELECT d FROM datas WHERE s=?", (onto.y.storid,)).fetchone()[0] == world._abbreviate("http://www.w3.org/2001/XMLSchema#integer")
+    b1 = world.graph.execute("SELECT s FROM datas WHERE o=1.5").fetchone()[0]
+    assert b1 < 0 and world._get_obj_triple_sp_o(b1, r.storid) == b1
+    
+    world.bulk_add([(onto, "http://test.org/test.owl#D", rdf_type, owl_class, None), (onto, "http://test.org/test.owl#D", rdfs_subclassof, C)])
+    assert onto.D.is_a == [C]
+    with onto: world.bulk_add([(None, a, rdf_type, onto.D)])
+    assert a.is_a == [C, onto.D] # Loaded entities are updated
+    with self.assertRaises(ValueError): world.bulk_add([(None, a, p, 6)])
+    
+    with self.patch_constants(owlready2.triplelite, _STATS_SAMPLE_SIZE = 1000): # Smaller quadstores are not sampled again automatically
+      onto.bulk_add(("http://test.org/test.owl#i%s" % i, p, i) for i in range(3000))
+    assert onto.i2999.p == [2999]
+    assert world.graph.predicate_stats[p.storid][0] >= 3000 # Statistics are refreshed
+    
+  def test_world_23(self):
+    world = self.new_world()
+    a = world.get_ontology("http://test.org/a.owl")
+    b = world.get_ontology("http://test.org/b.owl")
+    with a:
+      class C(Thing): pass
+      class p(DataProperty): pass
+      class r(ObjectProperty): pass
+      c1 = C("c1", p = [1, 'x "y"\nz', locstr("l", "en")])
+    with b:
+      class D(a.C): pass
+      D("d1", r = [c1])
+      C.is_a.append(r.some(D))
+    filename = self.new_tmp_file()
+    world.save(filename, format = "nquads")
+    
+    world2 = self.new_world()
+    a2     = world2.get_ontology("http://test.org/a.owl")
+    with a2:
+      class E(Thing): pass
+    ontologies = world2.load(filename)
+    assert (a2 in ontologies) and (world2.get_ontology("http://test.org/b.owl#") in ontologies)
+    a2, b2 = world2.get_ontology("http://test.org/a.owl#"), world2.get_ontology("http://test.org/b.owl#")
+    assert a2.loaded and b2.loaded
+    assert len(a2.graph) == len(a.graph) and len(b2.graph) == len(b.graph)
+    assert a2.E is None # Previous content is replaced
+    assert set(a2.c1.p) == { 1, 'x "y"\nz', locstr("l", "en") }
+    assert b2.d1.r == [a2.c1]
+    assert a2.C.is_a[-1].property is a2.r and a2.C.is_a[-1].value is b2.D # Blank nodes are shared between graphs
+    
+    with open(filename, "ab") as f: f.write(b"<http://test.org/a.owl#x> <http://test.org/a.owl#p> \"1\" .\n")
+    with self.assertRaises(ValueError): self.new_world().load(filename)
+    world3 = self.new_world()
+    c      = world3.get_ontology("http://test.org/c.owl")
+    world3.load(filename, default_ontology = c)
+    assert len(c.graph) == 1
+    
+  def test_world_24(self):
+    world = self.new_world()
+    ontos = [world.get_ontology("http://test.org/o%s.owl" % i) for i in range(5)]
+    for onto in ontos:
+      with onto:
+        class C(Thing): pass
+        C("c1"); C("c2")
+    directory = tempfile.TemporaryDirectory()
+    
+    saved = world.save_changed(directory.name)
+    assert set(ontos) <= set(saved)
+    assert world.save_changed(directory.name) == []
+    
+    ontos[1].c1.label = ["modified"]
+    destroy_entity(ontos[3].c2)
+    assert set(world.save_changed(directory.name)) == { ontos[1], ontos[3] }
+    assert world.save_changed(directory.name) == []
+    
+    with open(os.path.join(directory.name, "manifest.json")) as f: manifest = json.load(f)
+    entry = manifest["ontologies"][ontos[1].base_iri]
+    assert entry["file"] == "o1.owl"
+    world2 = self.new_world()
+    onto2  = world2.get_ontology(ontos[1].base_iri).load(fileobj = open(os.path.join(directory.name, entry["file"]), "rb"))
+    assert onto2.c1.label == ["modified"]
+    
+    assert set(ontos) <= set(world.save_changed(directory.name, format = "ntriples")) # Another format => all saved
+    
+    world.graph.disable_change_tracking()
+    assert not world.graph.get_context_changes()
+    assert set(ontos) <= set(world.save_changed(directory.name, format = "ntriples")) # Changes were not tracked => all saved
+    
+    assert set(ontos) <= set(world.save_changed(directory.name, format = "ntriples", compression = "gzip")) # Another compression => all saved
+    with open(os.path.join(directory.name, "manifest.json")) as f: manifest = json.load(f)
+    assert manifest["ontologies"][ontos[1].base_iri]["file"] == "o1.nt.gz"
+    with open(os.path.join(directory.name, "o1.nt.gz"), "rb") as f: assert f.read(2) == b"\x1f\x8b"
+    
   def test_ontology_1(self):
     o1 = get_ontology("http://test/test_ontology_1_1.owl")
     o2 = get_ontology("http://test/test_ontology_1_2.owl")
@@ -962,8 +1453,118 @@ class Test(BaseTest, unittest.TestCase):
 
     assert w["http://lesfleursdunormal.fr/static/_downloads/bacteria.owl#Bacterium"]
     
-
+  def test_ontology_38(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    onto_path.insert(0, temp_dir.name)
     
+    w  = self.new_world()
+    oc = w.get_ontology("http://test.org/c.owl")
+    oa = w.get_ontology("http://test.org/a.owl")
+    ob = w.get_ontology("http://test.org/b.owl")
+    o  = w.get_ontology("http://test.org/r.owl")
+    oa.imported_ontologies = [oc]
+    ob.imported_ontologies = [oc]
+    o .imported_ontologies = [oa, ob]
+    with oc:
+      class C(Thing): pass
+      class pc(DataProperty): pass
+    with oa:
+      class A(C): pass
+    with ob:
+      class pb(DataProperty): pass
+    with o:
+      A("r1", pc = [1], pb = [2])
+    for onto in [oc, oa, ob, o]: onto.save()
+    
+    for parallel_imports in [True, False]:
+      w = self.new_world()
+      o = w.get_ontology("http://test.org/r.owl").load(parallel_imports = parallel_imports)
+      oa, ob = o.imported_ontologies
+      assert oa.imported_ontologies == ob.imported_ontologies == [w.get_ontology("http://test.org/c.owl")]
+      assert all(onto.loaded and not onto._imports_pending for onto in [o, oa, ob] + oa.imported_ontologies)
+      assert o.r1.pc == [1]
+      assert o.r1.pb == [2]
+      assert o.r1.__class__.is_a == [w["http://test.org/c.owl#C"]]
+      
+    o.save(format = "ntriples")
+    w = self.new_world()
+    o = w.get_ontology("http://test.org/r.owl").load(format = "ntriples", parallel_imports = True) # Imports are still in RDF/XML
+    assert o.r1.pb == [2]
+    
+    from owlready2.driver import _parse_onto_source
+    with open(os.path.join(temp_dir.name, "b.owl"), "w") as f: f.write("<rdf:RDF")
+    excepthook = sys.excepthook
+    errors     = []
+    sys.excepthook = lambda *args: errors.append(args)
+    try:     assert _parse_onto_source((os.path.join(temp_dir.name, "b.owl"), "http://test.org/b.owl")) is None
+    finally: sys.excepthook = excepthook
+    assert not errors # Reported only when the ontology is then loaded as usual
+    with open(os.path.join(temp_dir.name, "b.owl"), "w") as f: # Guessed as N-Triples, with an error after the first 1000 characters
+      for i in range(20): f.write("<http://test.org/b.owl#x%s> <http://test.org/b.owl#p> <http://test.org/b.owl#y> .\n" % i)
+      f.write("<http://test.org/b.owl#x> <http://test.org/b.owl#p> .\n")
+    assert _parse_onto_source((os.path.join(temp_dir.name, "b.owl"), "http://test.org/b.owl")) is None
+    assert _parse_onto_source((os.path.join(temp_dir.name, "missing.owl"), "http://test.org/missing.owl")) is None
+    with self.assertRaises(AttributeError): _parse_onto_source((None, "http://test.org/b.owl")) # Not a parsing error
+    
+    onto_path.remove(temp_dir.name)
+    temp_dir.cleanup()
+    
+  def test_ontology_39(self):
+    filename = self.new_tmp_file()
+    w = self.new_world()
+    o = w.get_ontology("http://test.org/t.owl")
+    with o:
+      class p(ObjectProperty): pass
+      class d(DataProperty): pass
+      class A(Thing): pass
+      class B(A): pass
+      class C(Thing): is_a = [p.some(A), p.only(B)]
+      class D(Thing): equivalent_to = [A | B]
+      a = A("a", d = [1, 2])
+    o.save(filename)
+    
+    w2 = self.new_world()
+    o2 = w2.get_ontology("file://%s" % filename).load()
+    D2 = o2.D
+    nb = len(o2.graph)
+    
+    o2.load(reload = True, incremental = True)
+    assert o2.graph.touched_storids == set()
+    assert len(o2.graph) == nb
+    assert o2.D is D2
+    
+    with o:
+      A.label = ["A"]
+      a.d = [1]
+      C.is_a.remove(C.is_a[-1])
+      C.is_a.append(p.only(A))
+    o.save(filename)
+    
+    B2 = o2.B
+    o2.load(reload = True, incremental = True)
+    touched = o2.graph.touched_storids # Subjects and objects of the changed triples
+    assert { s for s in touched if s > 0 } == { o2.A.storid, o2.a.storid, o2.C.storid, o2.p.storid, o2.B.storid, owl_restriction }
+    assert len([s for s in touched if s < 0]) == 2 # The removed restriction and the added one
+    assert o2.D is D2
+    assert o2.B is not B2 # Subclass of a touched class
+    assert o2.A.label == ["A"]
+    assert o2.a.d == [1]
+    assert o2.C.is_a[-1].value is o2.A
+    assert o2.B.is_a == [o2.A]
+    
+    a2 = o2.a
+    B2 = o2.B
+    with o: a.d = [2]
+    o.save(filename)
+    o2.load(reload = True, incremental = True)
+    assert o2.graph.touched_storids == { a2.storid } # A single triple changed
+    assert o2.a is not a2
+    assert o2.a.d == [2]
+    assert o2.B is B2
+    
+    w3 = self.new_world()
+    o3 = w3.get_ontology("file://%s" % filename).load()
+    assert len(o3.graph) == len(o2.graph)
     
   def test_class_1(self):
     n = get_ontology("http://www.semanticweb.org/jiba/ontologies/2017/0/test")
@@ -5913,6 +6514,327 @@ multiple lines with " and ’ and \ and & and < and > and é.""", "en")
       
     self.assert_triple(prop.storid, rdf_range, enu.storid, world = world)
     
+  def test_format_33(self):
+    import owlready2.driver
+    filename = self.new_tmp_file()
+    with open(filename, "w") as f:
+      f.write("""<http://test.org/t.owl> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#Ontology> .\n""")
+      f.write("""<http://test.org/t.owl#p> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2002/07/owl#DatatypeProperty> .\n""")
+      for i in range(2000):
+        f.write("""<http://test.org/t.owl#i%s> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://test.org/t.owl#C> .\n""" % i)
+        f.write("""<http://test.org/t.owl#i%s> <http://test.org/t.owl#p> "%s"^^<http://www.w3.org/2001/XMLSchema#integer> .\n""" % (i, i))
+        f.write("""<http://test.org/t.owl#i%s> <http://test.org/t.owl#q> _:b%s .\n""" % (i, i % 10))
+        
+    assert len(owlready2.driver._split_ntriples(filename, 10000)) > 10
+    
+    with self.patch_constants(owlready2.driver, _PARALLEL_NTRIPLES_MIN_SIZE = 0, _PARALLEL_NTRIPLES_CHUNK_SIZE = 10000, _nb_cpus = lambda: 2):
+      world = self.new_world()
+      onto  = world.get_ontology("file://" + filename).load()
+      
+    assert onto.base_iri == "http://test.org/t.owl#"
+    assert len(onto.graph) == 6002
+    assert onto.i1999.p == [1999]
+    assert len(world.graph.execute("""SELECT DISTINCT o FROM objs WHERE o < 0""").fetchall()) == 10 # Blank nodes are shared between chunks
+    
+  def test_format_34(self):
+    import owlready2.driver
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    queue = owlready2.driver._FakeQueue(*onto.graph.import_triples_from_queue(None))
+    q     = owlready2.driver._EncodingQueue(queue)
+    q.put(("objs", [("http://test.org/t.owl", "http://www.w3.org/1999/02/22-rdf-syntax-ns#type", "http://www.w3.org/2002/07/owl#Ontology"),
+                    ("http://test.org/t.owl#p", "http://www.w3.org/1999/02/22-rdf-syntax-ns#type", "http://www.w3.org/2002/07/owl#DatatypeProperty"),
+                    ("http://test.org/t.owl#a", "http://test.org/t.owl#r", "_:b1")]))
+    q.put(("datas", [("http://test.org/t.owl#a", "http://test.org/t.owl#p", "1", "http://www.w3.org/2001/XMLSchema#integer"),
+                     ("http://test.org/t.owl#a", "http://test.org/t.owl#p", "un", "@fr"),
+                     ("http://test.org/t.owl#a", "http://test.org/t.owl#p", "x", "")]))
+    q.put(("objs", [("_:b1", "http://test.org/t.owl#r", "http://test.org/t.owl#a")]))
+    q.put(("finish", None))
+    
+    assert len(onto.graph) == 7
+    assert set(onto.p[onto.a]) == { 1, locstr("un", "fr"), "x" }
+    b = world.graph.execute("""SELECT o FROM objs WHERE s=? AND p=?""", (onto.a.storid, world._abbreviate("http://test.org/t.owl#r"))).fetchone()[0]
+    assert b < 0
+    assert world.graph.execute("""SELECT o FROM objs WHERE s=?""", (b,)).fetchone()[0] == onto.a.storid
+    
+  def test_format_35(self):
+    import owlready2.driver
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class C(Thing): pass
+      class p(DataProperty): pass
+      for i in range(1000): C("i%s" % i, p = [i, locstr("l%s" % i, "en")])
+    xml_filename = self.new_tmp_file()
+    nt_filename  = self.new_tmp_file()
+    onto.save(xml_filename, format = "rdfxml")
+    onto.save(nt_filename,  format = "ntriples")
+    
+    start_method = multiprocessing.get_start_method(allow_none = True)
+    multiprocessing.set_start_method("spawn", force = True)
+    try:
+      with self.patch_constants(owlready2.driver, _PARALLEL_MIN_SIZE = 0, _PARALLEL_NTRIPLES_MIN_SIZE = 0, _PARALLEL_NTRIPLES_CHUNK_SIZE = 20000, _nb_cpus = lambda: 2):
+        world2 = self.new_world()
+        onto2  = world2.get_ontology("file://" + xml_filename).load()
+        world3 = self.new_world()
+        onto3  = world3.get_ontology("file://" + nt_filename).load()
+    finally:
+      multiprocessing.set_start_method(start_method, force = True)
+      
+    for o in [onto2, onto3]:
+      assert len(o.graph) == len(onto.graph)
+      assert set(o.i999.p) == { 999, locstr("l999", "en") }
+      
+  def test_format_36(self):
+    world    = self.new_world()
+    filename = self.new_tmp_file()
+    with open(filename, "w") as f:
+      f.write("""# A comment
+@prefix : <http://test.org/t.owl#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+@base <http://test.org/t.owl> .
+
+<> a owl:Ontology .
+:C a owl:Class ; rdfs:label "C"@en, 'Cé'@fr ;
+  rdfs:comment \"\"\"multi
+line "quoted" \\u00e9\"\"\" .
+:p a owl:DatatypeProperty .
+:r a owl:ObjectProperty .
+<#i1> a :C ; :p 1, 2.5, true, "x" ;
+  :r [ a :C ; :p -3 ], _:b1 .
+_:b1 :r _:b1 .
+:D a owl:Class ; rdfs:subClassOf [ a owl:Class ; owl:unionOf ( :C :E ) ] .
+:E a owl:Class .
+GRAPH :g { :i2 a :C . :i3 a :C }
+""")
+    with open(filename, "rb") as f:
+      assert owlready2.driver._guess_format(f) == "turtle"
+      onto = world.get_ontology("http://test.org/t.owl").load(fileobj = f)
+    assert onto.C.label == [locstr("C", "en"), locstr("Cé", "fr")]
+    assert onto.C.comment == ["multi\nline \"quoted\" é"]
+    assert set(onto.i1.p) == { 1, 2.5, True, "x" }
+    assert len(onto.i1.r) == 2
+    b1 = [i for i in onto.i1.r if not isinstance(i, onto.C)][0]
+    assert onto.r[b1] == [b1]
+    assert (onto.C | onto.E) in onto.D.is_a
+    assert set(onto.C.instances()) == { onto.i1, onto.i2, onto.i3, onto.i1.r[0] } - { b1 }
+    
+  def test_format_37(self):
+    world    = self.new_world()
+    filename = self.new_tmp_file()
+    with open(filename, "w") as f:
+      f.write("""@prefix : <http://test.org/t.owl#> .
+:x :p :y .
+:z :p "a"^^<http://www.w3.org/2001/XMLSchema#unknown_prefix .
+""")
+    with open(filename, "rb") as f, self.assertRaises(OwlReadyOntologyParsingError) as cm:
+      world.get_ontology("http://test.org/t.owl").load(fileobj = f)
+    assert "line 3" in str(cm.exception)
+    
+  def test_format_38(self):
+    import gzip, bz2, lzma
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class C(Thing): pass
+      class p(DataProperty): pass
+      C("c1", p = [1])
+    rdfxml = BytesIO(); onto.save(rdfxml, format = "rdfxml")
+    nt     = BytesIO(); onto.save(nt,     format = "ntriples")
+    ttl    = b"""@prefix : <http://test.org/t.owl#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+:p a owl:DatatypeProperty .
+:c1 :p 1 .
+"""
+    
+    temp_dir = tempfile.TemporaryDirectory()
+    for module, data, name in [(gzip, rdfxml.getvalue(), "t.owl.gz"), (bz2, nt.getvalue(), "t.nt.bz2"), (lzma, ttl, "t.ttl.xz"), (gzip, ttl, "t")]:
+      filename = os.path.join(temp_dir.name, name)
+      with module.open(filename, "wb") as f: f.write(data)
+      
+      world2 = self.new_world()
+      if name == "t.owl.gz":
+        onto_path.insert(0, temp_dir.name)
+        try:     world2.get_ontology("http://test.org/t.owl").load()
+        finally: onto_path.remove(temp_dir.name)
+      else:
+        world2.get_ontology("http://test.org/t.owl").load(fileobj = open(filename, "rb"))
+      assert world2["http://test.org/t.owl#c1"].p == [1]
+      os.unlink(filename)
+    temp_dir.cleanup()
+    
+  def test_format_39(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class p(ObjectProperty): pass
+      class A(Thing): pass
+      for i in range(300):
+        C = types.new_class("C%s" % i, (Thing,))
+        C.is_a.append(p.some(A))
+      comment[C, rdfs_subclassof, C.is_a[-1]] = ["annotated"] # Annotated axiom on a blank node, needs the blank node bookkeeping
+    rdfxml = BytesIO(); onto.save(rdfxml, format = "rdfxml")
+    nt     = BytesIO(); onto.save(nt,     format = "ntriples")
+    
+    for data in [rdfxml, nt]:
+      world2 = self.new_world()
+      onto2  = world2.get_ontology("http://test.org/t.owl").load(fileobj = BytesIO(data.getvalue()), memory_budget = 1)
+      assert len(onto2.graph) == len(onto.graph)
+      assert comment[onto2.C299, rdfs_subclassof, onto2.C299.is_a[-1]] == ["annotated"]
+      
+    from owlready2.rdfxml_2_ntriples import _SpillingDict
+    d = _SpillingDict(100, set)
+    for i in range(1000): d[i].add(i)
+    assert d.nb_spilled > 0
+    assert len(d) == 1000
+    assert d[5] == {5}
+    assert (5 in d) and not (-1 in d)
+    assert dict(d.items()) == { i : { i } for i in range(1000) }
+    
+    from owlready2.rdfxml_2_ntriples import _SpillingListDict, _index_blank_nodes_by_content
+    l = _SpillingListDict(d, "test")
+    l["b"].append(1); l["a"].append(2); l["b"].insert(0, 0); l["b"].append(3)
+    assert len(l) == 4
+    assert list(l.items()) == [("a", [2]), ("b", [0, 1, 3])]
+    
+    index = _index_blank_nodes_by_content(d, lambda bn: bn == 7)
+    assert index.get(frozenset({ 5 })) == [5]
+    assert index.get(frozenset({ 7 })) == []
+    index.add_new(frozenset({ 5 }), 1005)
+    assert index.get(frozenset({ 5 })) == [5, 1005]
+    
+  def test_format_40(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class A(Thing): pass
+      for i in range(300): A("a%s" % i)
+    rdfxml = BytesIO(); onto.save(rdfxml, format = "rdfxml")
+    nt     = BytesIO(); onto.save(nt,     format = "ntriples")
+    
+    for data in [rdfxml, nt]:
+      events = []
+      world2 = self.new_world()
+      onto2  = world2.get_ontology("http://test.org/t.owl").load(fileobj = BytesIO(data.getvalue()), progress = events.append)
+      phases = [event["phase"] for event in events]
+      assert "parse" in phases
+      assert phases[-3:] == ["imports", "load_properties", "done"]
+      assert "analyze" in phases
+      done = events[-1]
+      assert done["triples_parsed"] == done["triples_inserted"] == len(onto2.graph) == len(onto.graph)
+      assert done["bytes_read"] == done["bytes_total"] == len(data.getvalue())
+      assert set(done["timings"]) >= { "parse", "abbreviate", "insert", "analyze", "imports", "load_properties" }
+      assert done["triples_per_second"] > 0.0
+      
+  def test_format_41(self):
+    world = self.new_world(exclusive = False)
+    for i in range(3):
+      onto = world.get_ontology("http://test.org/t%s.owl" % i)
+      with onto:
+        class p(DataProperty): pass
+        class A(Thing): pass
+        a = A("a")
+        a.p = [1.5, 1 / 3, 7, -3, 2 ** 62, True, "x\"y\\z\nw\r", locstr("é", "fr"), normstr("n"), datetime.date(2020, 1, 2)]
+        A.is_a.append(p.some(int))
+        
+    def lines(graph, format, **kargs):
+      f = BytesIO()
+      graph.save(f, format, **kargs)
+      return sorted(f.getvalue().decode("utf8").split("\n"))
+    
+    for format in ["ntriples", "nquads"]:
+      for graph in [world.graph, onto.graph]:
+        assert lines(graph, format) == lines(graph, format, filter = lambda *args: True) # Filter => lines built in Python
+      assert lines(world.graph, format, parallel = True) == lines(world.graph, format)
+      
+    self.assertRaises(ValueError, lambda: self.new_world().graph.save(BytesIO(), "nquads", parallel = True))
+    
+  def test_format_42(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class p(DataProperty): pass
+      class r(ObjectProperty): pass
+      class A(Thing): pass
+      class B(Thing): pass
+      for i in range(50):
+        C = types.new_class("C%s" % i, (Thing,))
+        C.equivalent_to = [A & (B | r.some(A & C)) & r.only(OneOf([A("a%s" % i), A("b%s" % i)]))]
+        C.is_a.append(p.some(OneOf([i, "x%s" % i])))
+        comment[C, rdfs_subclassof, Thing] = ["annotated %s" % i] # Blank node not nested in another resource
+      AllDisjoint([A, B, C])
+      
+    with self.patch_constants(owlready2.driver, _SAVE_SPOOL_SIZE = 1000, _SAVE_BLANK_NODES_IN_MEMORY = 20):
+      rdfxml = BytesIO(); onto.save(rdfxml, format = "rdfxml")
+    self.assert_reload_equivalent(onto, rdfxml.getvalue())
+    
+  def test_format_43(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class A(Thing): pass
+      for i in range(100): A("a%s" % i, label = ["\u00e9 %s" % i])
+    nt = BytesIO(); onto.save(nt, format = "ntriples")
+    
+    for ext, format, magic in [(".nt.gz", "ntriples", b"\x1f\x8b"), (".owl.bz2", "rdfxml", b"BZh"), (".nt.xz", "ntriples", b"\xfd7zXZ")]:
+      filename = self.new_tmp_file() + ext
+      onto.save(filename, format = format)
+      with open(filename, "rb") as f: assert f.read(len(magic)) == magic
+      
+      with open(filename, "rb") as f: self.assert_reload_equivalent(onto, f)
+      
+    f = BytesIO(); onto.save(f, format = "ntriples", compression = "gzip", compression_level = 1)
+    assert gzip.decompress(f.getvalue()) == nt.getvalue()
+    
+    self.assertRaises(ValueError, lambda : onto.save(BytesIO(), format = "ntriples", compression = "rar"))
+    
+  def test_format_44(self):
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl")
+    with onto:
+      class p(DataProperty): pass
+      class r(ObjectProperty): pass
+      class A(Thing): pass
+      class B(Thing): pass
+      for i in range(10):
+        C = types.new_class("C%s" % i, (Thing,))
+        C.equivalent_to = [A & (B | r.some(A & C)) & r.only(OneOf([A("a%s" % i), A("b%s" % i)]))]
+        C.is_a.append(p.some(OneOf([i, 'x "%s"\n\\' % i])))
+      AllDisjoint([A, B, C])
+      A.label = [locstr("\u00e9", "fr"), 1.5, True]
+      A("a b"); A("1.x"); A("y.")
+      shared = world.new_blank_node()
+      onto._add_obj_triple_spo(A.storid, comment.storid, shared)
+      onto._add_obj_triple_spo(B.storid, comment.storid, shared)
+      onto._add_data_triple_spod(shared, label.storid, "shared", 0)
+      
+    ttl = BytesIO(); onto.save(ttl, format = "turtle")
+    nt  = BytesIO(); onto.save(nt,  format = "ntriples")
+    assert len(ttl.getvalue()) < len(nt.getvalue()) / 3
+    assert b"@prefix owl: <http://www.w3.org/2002/07/owl#> ." in ttl.getvalue()
+    assert b"owl:oneOf ( :a0 :b0 )" in ttl.getvalue()
+    
+    self.assert_reload_equivalent(onto, ttl.getvalue(), format = "turtle")
+    
+  def test_format_45(self):
+    from owlready2.driver import _guess_format
+    
+    assert _guess_format(BytesIO(b"""<http://test.org/t.owl#a> <http://test.org/t.owl#p> "x"@en .\n_:b <http://test.org/t.owl#p> <http://test.org/t.owl#a> .\n""")) == "ntriples"
+    assert _guess_format(BytesIO(b"""<http://test.org/t.owl#a> <http://test.org/t.owl#p> <http://test.org/t.owl#b>, <http://test.org/t.owl#c> .\n""")) == "turtle"
+    assert _guess_format(BytesIO(b"""_:b <http://test.org/t.owl#p> [ <http://test.org/t.owl#p> "x" ] .\n""")) == "turtle"
+    assert _guess_format(BytesIO(b"""<urn:a> <urn:p> <urn:b> .\n""")) == "ntriples"
+    assert _guess_format(BytesIO(b"""<rdf:RDF>\n<owl:Ontology rdf:about="http://test.org/t.owl"/>\n</rdf:RDF>\n""")) == "rdfxml"
+    assert _guess_format(BytesIO(b"""<!--x-->\n<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n</rdf:RDF>\n""")) == "rdfxml"
+    assert _guess_format(BytesIO(b"""<Ontology xmlns="http://www.w3.org/2002/07/owl#" ontologyIRI="http://test.org/t.owl">\n</Ontology>\n""")) == "owlxml"
+    
+    world = self.new_world()
+    onto  = world.get_ontology("http://test.org/t.owl").load(fileobj = BytesIO(b"""
+<http://test.org/t.owl> a <http://www.w3.org/2002/07/owl#Ontology> .
+<http://test.org/t.owl#C> a <http://www.w3.org/2002/07/owl#Class> ;
+  <http://www.w3.org/2000/01/rdf-schema#label> "C" .
+"""))
+    assert onto.C.label == ["C"]
     
   def test_search_1(self):
     world = self.new_world()
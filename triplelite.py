@@ -18,19 +18,28 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import sys, os, os.path, sqlite3, time, re
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, deque, Counter
+from operator import itemgetter
 from itertools import chain
+from bisect import bisect_right
+from array import array
 
 import owlready2
 from owlready2.base import *
 from owlready2.driver import BaseMainGraph, BaseSubGraph
-from owlready2.driver import _guess_format, _save
+from owlready2.driver import _guess_format, _save, _ntriples_lines, _nb_cpus
 from owlready2.util import FTS, _LazyListMixin
 from owlready2.base import _universal_abbrev_2_iri
 
 if   (sqlite3.sqlite_version == "3.40.0") or (sqlite3.sqlite_version == "3.41.2"):
   print("\nWarning: SQLite3 version 3.40.0 and 3.41.2 have huge performance regressions; please install version 3.41.1 or 3.42!\n", file = sys.stderr)
 
+_INDEXED_BY = re.compile(r"\s+INDEXED\s+BY\s+\w+")
+_CLOSURE_PREDICATES = { rdfs_subclassof, rdfs_subpropertyof, owl_equivalentclass }
+
+_SQL_SPACES   = re.compile(r"\s+")
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?\b") # Storids are often inlined in requests
+
 def all_combinations(l):
   """returns all the combinations of the sublist in the given list (i.e. l[0] x l[1] x ... x l[n])."""
   if len(l) == 0: return ()
@@ -39,7 +48,79 @@ def all_combinations(l):
   for a in l[0]: r.extend((a,) + b for b in all_combinations(l[1:]))
   return r
 
+_STATS_SAMPLE_SIZE  = 20000
+_STATS_NB_WINDOWS   = 20
+_STATS_MIN_FREQUENT = 10 # Minimum number of occurences of an object in the sample, for recording it in frequent_objects
+
+_BATCH_SIZE = 400 # Keeps IN (...) lists (possibly used twice in a request) under SQLite's historical limit of 999 variables
+
+def _execute_batched(execute, sql, ss, make_args, batch_size = _BATCH_SIZE):
+  """executes sql once per chunk of ss; each %s in sql is replaced by the chunk's placeholders, and make_args(chunk) gives the arguments."""
+  ss = list(ss)
+  for i in range(0, len(ss), batch_size):
+    chunk = ss[i : i + batch_size]
+    marks = ",".join("?" * len(chunk))
+    yield from execute(sql % ((marks,) * sql.count("%s")), make_args(chunk)).fetchall()
+    
+def _backup_db(source, target, progress = None, pages = 1024):
+  """copies the source SQLite3 database into target, a chunk of pages at a time; progress(copied_pages, total_pages) is called after each chunk."""
+  if progress: source.backup(target, pages = pages, progress = lambda status, remaining, total: progress(total - remaining, total))
+  else:        source.backup(target, pages = pages)
+  
+def _group_rows(rows, nb_key = 1):
+  """groups rows by their first nb_key columns; values are the remaining column, or a tuple of the remaining columns."""
+  groups = defaultdict(list)
+  for row in rows:
+    key = row[0] if nb_key == 1 else row[:nb_key]
+    if len(row) == nb_key + 1: groups[key].append(row[nb_key])
+    else:                      groups[key].append(row[nb_key:])
+  return groups
+
+def _blank_node_signatures(objs, datas, canonical):
+  """computes a signature for each blank node subject of the given (s,p,o) objs and (s,p,o,d) datas rows, from its triples
+and (recursively) the signatures of the blank nodes it refers to. Signatures are ids in canonical (a dict shared between the
+graphs to compare), hence two blank nodes have the same signature if and only if they have the same content (as in ntriples_diff)."""
+  contents = defaultdict(list)
+  children = defaultdict(list)
+  for s, p, o in objs:
+    if o < 0: children[s].append((p, o))
+    else:     contents[s].append((p, o))
+  for s, p, o, d in datas: contents[s].append((p, o, d))
+  
+  signatures = { bnode : canonical.setdefault(frozenset(content), len(canonical)) for bnode, content in contents.items() if not bnode in children }
+  pending    = set()
+  for root in children:
+    stack = [root]
+    while stack: # Iterative post-order, for long RDF lists
+      bnode = stack[-1]
+      if bnode in signatures: stack.pop(); continue
+      pending.add(bnode)
+      todo = [o for p, o in children[bnode] if not ((o in signatures) or (o in pending))]
+      if todo: stack.extend(todo); continue
+      content = frozenset(contents.get(bnode, [])) | frozenset((p, "_", signatures.get(o, -1)) for p, o in children[bnode]) # -1 for cycles
+      signatures[bnode] = canonical.setdefault(content, len(canonical))
+      pending.discard(bnode)
+      stack.pop()
+  return signatures
+
 
+class _ProfiledCursor(object):
+  """A cursor whose rows have already been fetched, for timing requests and counting rows without executing them twice."""
+  def __init__(self, cursor, rows):
+    self.cursor = cursor
+    self.rows   = rows
+    self._iter  = iter(rows)
+    
+  def __iter__(self): return self._iter
+  def __next__(self): return next(self._iter)
+  def fetchone(self): return next(self._iter, None)
+  def fetchall(self): return list(self._iter)
+  def fetchmany(self, size = None):
+    if size is None: size = self.cursor.arraysize
+    return [row for i, row in zip(range(size), self._iter)]
+  def __getattr__(self, attr): return getattr(self.cursor, attr)
+  
+  
 class _Connexion(object):
   def __init__(self, pool, uri):
     self.pool    = pool
@@ -60,9 +141,130 @@ class _ConnexionPool(object):
     self.get = self.queue.get
     
 
+def _ntriples_sql(quads = False, c = None):
+  """returns the SQL queries (for objs and datas) yielding (line, rowid) rows, where line is the N-Triples (or N-Quads)
+line of the triple, built by SQLite. line is NULL if the triple must be formatted in Python, i.e. for non-text and
+non-integer literals (SQLite and Python do not format floats in the same way) and for missing IRIs."""
+  def term(x): return "CASE WHEN q.%s < 0 THEN '_:' || -q.%s ELSE '<' || r%s.iri || '>' END" % (x, x, x)
+  if quads: end = "' <' || ont.iri || '> .' || char(10)"; joins = " LEFT JOIN ontologies ont ON ont.c=q.c"
+  else:     end = "' .' || char(10)";                     joins = ""
+  joins += " LEFT JOIN resources rs ON rs.storid=q.s LEFT JOIN resources rp ON rp.storid=q.p"
+  where  = " WHERE q.c=%s" % c if c else ""
+  literal = """CASE typeof(q.o) WHEN 'text' THEN '"' || replace(replace(replace(q.o, '\\', '\\\\'), '"', '\\"'), char(10), '\\n') || '"' WHEN 'integer' THEN '"' || q.o || '"' END
+|| CASE WHEN typeof(q.d) = 'text' AND substr(q.d, 1, 1) = '@' THEN q.d WHEN q.d = 0 THEN '' ELSE '^^<' || rd.iri || '>' END"""
+  return [
+    ("objs",  "SELECT %s || ' <' || rp.iri || '> ' || %s || %s, q.rowid FROM objs q%s LEFT JOIN resources ro ON ro.storid=q.o%s" % (term("s"), term("o"), end, joins, where)),
+    ("datas", "SELECT %s || ' <' || rp.iri || '> ' || %s || %s, q.rowid FROM datas q%s LEFT JOIN resources rd ON rd.storid=q.d%s" % (term("s"), literal, end, joins, where)),
+  ]
+
+def _iter_ntriples_rows(db, quads = False, c = None, batch_size = 20000):
+  """yields batches of (line, s, p, o, d, c) rows; s, p, o, d and c are given only for the triples without line."""
+  cursor = db.cursor()
+  for table, sql in _ntriples_sql(quads, c):
+    select = "SELECT NULL, s, p, o, %s, c FROM %s WHERE rowid=?" % ("NULL" if table == "objs" else "d", table)
+    cursor.execute(sql)
+    while True:
+      rows = cursor.fetchmany(batch_size)
+      if not rows: break
+      yield [row if row[0] else db.execute(select, (row[1],)).fetchone() for row in rows]
+      
+def _ntriples_of_context(args):
+  """returns the N-Triples (or N-Quads) of the context c of the quadstore file, as bytes; executed in a worker process."""
+  filename, quads, c = args
+  db = sqlite3.connect("file:%s?mode=ro" % filename, uri = True)
+  try:
+    def _unabbreviate(storid): return db.execute("SELECT iri FROM resources WHERE storid=? LIMIT 1", (storid,)).fetchone()[0]
+    c_2_iri = dict(db.execute("SELECT c, iri FROM ontologies").fetchall()) if quads else None
+    return b"".join([_ntriples_lines(rows, _unabbreviate, c_2_iri).encode("utf8") for rows in _iter_ntriples_rows(db, quads, c)])
+  finally:
+    db.close()
+    
+    
+def _merge_intervals(intervals):
+  intervals.sort()
+  r = [intervals[0]]
+  for low, high in intervals[1:]:
+    if low <= r[-1][1] + 1:
+      if high > r[-1][1]: r[-1] = (r[-1][0], high)
+    else: r.append((low, high))
+  return r
+
+class _HierarchyLabels(object):
+  """Multi-interval labelling of a hierarchy (e.g. rdfs:subClassOf), for testing subsumption without querying the quadstore.
+
+Each node has a post-order number, and the sorted list of the intervals of the post-order numbers of its descendants
+(including itself). Nodes that are not in the hierarchy have no label.
+
+Raises ValueError if the labelling requires more than max_intervals intervals."""
+  def __init__(self, edges, max_intervals = None):
+    children   = defaultdict(list)
+    has_parent = set()
+    for s, o in edges:
+      children[o].append(s)
+      has_parent.add(s)
+    nodes = set(children) | has_parent
+    
+    self.post      = {}
+    self.intervals = {}
+    self.nodes     = [] # Nodes by post-order number
+    self.cyclics   = set()
+    has_cycle      = False
+    nb_intervals   = 0
+    for root in chain([node for node in nodes if not node in has_parent], nodes): # Remaining nodes are in cycles
+      if root in self.post: continue
+      stack    = [(root, iter(children.get(root, ())), len(self.nodes))]
+      on_stack = { root }
+      while stack:
+        node, child_iter, low = stack[-1]
+        for child in child_iter:
+          if   child in on_stack: has_cycle = True
+          elif not child in self.post:
+            on_stack.add(child)
+            stack.append((child, iter(children.get(child, ())), len(self.nodes)))
+            break
+        else:
+          stack.pop()
+          on_stack.discard(node)
+          self.post[node] = post = len(self.nodes)
+          self.nodes.append(node)
+          intervals = [(low, post)]
+          for child in children.get(node, ()): intervals.extend(self.intervals.get(child, ()))
+          self.intervals[node] = intervals = _merge_intervals(intervals)
+          nb_intervals += len(intervals)
+          if max_intervals and (nb_intervals > max_intervals): raise ValueError("Too many intervals for labelling the hierarchy!")
+          
+    if has_cycle: # Nodes in a cycle were labelled before the end of the cycle => propagate until stable
+      changed = True
+      while changed:
+        changed = False
+        for node in self.nodes:
+          intervals = list(self.intervals[node])
+          for child in children.get(node, ()): intervals.extend(self.intervals[child])
+          intervals = _merge_intervals(intervals)
+          if intervals != self.intervals[node]:
+            self.intervals[node] = intervals
+            changed = True
+      self.cyclics = { node for node in nodes if any(self.is_descendant(node, child) for child in children.get(node, ())) }
+      
+  def is_descendant(self, x, y):
+    if x == y: return True
+    post      = self.post.get(x)
+    intervals = self.intervals.get(y)
+    if (post is None) or (intervals is None): return False
+    i = bisect_right(intervals, (post, sys.maxsize)) - 1
+    return (i >= 0) and (intervals[i][1] >= post)
+  
+  def descendants(self, y, include_self = True):
+    intervals = self.intervals.get(y)
+    if intervals is None: return [y] if include_self else []
+    r = [x for low, high in intervals for x in self.nodes[low : high + 1]]
+    if not (include_self or (y in self.cyclics)): r.remove(y)
+    return r
+  
+  
 class Graph(BaseMainGraph):
   _SUPPORT_CLONING = True
-  def __init__(self, filename, clone = None, exclusive = True, sqlite_tmp_dir = "", world = None, profiling = False, read_only = False, enable_thread_parallelism = False, lock = None, extra_lock = None, connection = None, journal_mode = None):
+  def __init__(self, filename, clone = None, exclusive = True, sqlite_tmp_dir = "", world = None, profiling = False, read_only = False, enable_thread_parallelism = False, lock = None, extra_lock = None, connection = None, journal_mode = None, abbreviate_cache_size = None, id_block_size = 1000, backup_progress = None):
     exists        = os.path.exists(filename) and os.path.getsize(filename) # BEFORE creating db!
     initialize_db = (clone is None) and ((filename == ":memory:") or (not exists))
     
@@ -102,47 +304,9 @@ class Graph(BaseMainGraph):
     else:
       self.db.execute("""PRAGMA temp_store = memory""")
       
-    if profiling:
-      import time
-      from collections import Counter
-      self.requests_counts = Counter()
-      self.requests_times  = Counter()
-      
-      def execute(s, args = ()):
-        if "SELECT" in s:
-          self.requests_counts[s] += 1
-          t0 = time.time()
-          r = list(self.db.execute(s, args))
-          t = time.time() - t0
-          self.requests_times[s] += t
-        return self.db.execute(s, args)
-      self.execute = execute
-      
-      def reset_profiling():
-        self.requests_counts = Counter()
-        self.requests_times  = Counter()
-      self.reset_profiling = reset_profiling
-      
-      def show_profiling():
-        print(file = sys.stderr)
-        print("Request counts:", file = sys.stderr)
-        for s, nb in self.requests_counts.most_common():
-          print(" ", nb, "\t", s.replace("\n", " "), file = sys.stderr)
-        print(file = sys.stderr)
-        print("Request total times:", file = sys.stderr)
-        for s, nb in self.requests_times.most_common():
-          print(" ", nb, "\t", s.replace("\n", " "), file = sys.stderr)
-        print(file = sys.stderr)
-        print("Request mean times:", file = sys.stderr)
-        rmt = Counter()
-        for s, nb in self.requests_counts.most_common():
-          rmt[s] = self.requests_times[s] / nb
-        for s, nb in rmt.most_common():
-          print(" ", nb, "\t", s.replace("\n", " "), file = sys.stderr)
-      self.show_profiling = show_profiling
-      
-    else:
-      self.execute  = self.db.execute
+    self.profiling        = False
+    self._profiling_stats = {}
+    self._execute = self.execute = self.db.execute
       
     self.has_thread_parallelism = enable_thread_parallelism
     if enable_thread_parallelism:
@@ -155,6 +319,20 @@ class Graph(BaseMainGraph):
     self.world             = world
     self.c                 = None
     self.nb_added_triples  = 0
+    self.analyze_threshold = 1000
+    self.nb_objs           = 0
+    self.nb_datas          = 0
+    self.predicate_stats   = {} # p => (nb triples, nb distinct subjects, nb distinct objects)
+    self.frequent_objects  = {} # (p, o) => nb triples, for the most frequent objects only
+    self.context_stats     = {} # c => nb triples
+    self.index_stats       = None # Average number of rows per key prefix of each index, computed from the last sample
+    self.nb_sampled        = 0    # Number of rows in objs and datas when the last sample was taken
+    self.current_changes   = 0
+    self.id_block_size     = id_block_size
+    self.exclusive         = exclusive
+    self._hierarchy_labels = {}
+    self._hierarchy_delays = {}
+    self._next_storid = self._last_storid = self._next_blank = self._last_blank = 0 # Ranges of reserved ids, as (next, last]
     
     if   lock:
       self.lock = lock
@@ -173,7 +351,9 @@ class Graph(BaseMainGraph):
     self.lock_level = 0
     
     if initialize_db:
-      self.prop_fts = set()
+      self.prop_fts           = set()
+      self.transitive_closure = False
+      self.change_tracking    = False
       
       self.execute("""CREATE TABLE store (version INTEGER, current_blank INTEGER, current_resource INTEGER)""")
       self.execute("""INSERT INTO store VALUES (12, 0, 300)""")
@@ -210,8 +390,8 @@ class Graph(BaseMainGraph):
     else:
       self.indexed = True
       if clone:
-        s = "\n".join(clone.db.iterdump())
-        self.db.cursor().executescript(s)
+        clone.commit()
+        _backup_db(clone.db, self.db, backup_progress)
         
       version = self.execute("SELECT version FROM store").fetchone()[0]
       if version < 12:
@@ -219,7 +399,13 @@ class Graph(BaseMainGraph):
         update_graph(self, version)      
         
       self.prop_fts = { storid for (storid,) in self.execute("""SELECT storid FROM prop_fts;""") }
+      self.transitive_closure = bool(self.execute("""SELECT 1 FROM sqlite_master WHERE type='table' AND name='closure'""").fetchone())
+      self.change_tracking    = bool(self.execute("""SELECT 1 FROM sqlite_master WHERE type='table' AND name='context_changes'""").fetchone())
       
+      if (not read_only) and self.execute("""SELECT 1 FROM sqlite_master WHERE type='table' AND name='deferred_indexes'""").fetchone():
+        print("* Owlready2 * Rebuilding quadstore indexes (interrupted bulk loading)...", file = sys.stderr)
+        self.set_indexed(True)
+        
       self.analyze()
       
     # Unindexed table for deprioritizing SPARQL subqueries
@@ -228,7 +414,12 @@ class Graph(BaseMainGraph):
     self.execute("""INSERT INTO one VALUES (1)""")
     
     self.current_changes = self.db.total_changes
-    self.select_abbreviate_method()
+    
+    # In non-exclusive mode, other processes may modify the resources table => no cache by default
+    if abbreviate_cache_size is None: abbreviate_cache_size = 100000 if exclusive else 0
+    self.set_abbreviate_cache_size(abbreviate_cache_size)
+    
+    if profiling: self.set_profiling(True)
 
   #def execute_long_with_gevent(self, sql, args = ()):
   #  with self.connexion_pool.get() as db:
@@ -246,32 +437,32 @@ class Graph(BaseMainGraph):
     if mode == True: mode = "wal"
     self.execute("PRAGMA journal_mode=%s" % mode)
     
-  def analyze(self):
+  def analyze(self, force = True):
+    """Updates the statistics used by the SQLite query planner. If force is False (automatic updates after parsing
+or after adding many triples), the quadstore is sampled again only if it has at least _STATS_SAMPLE_SIZE triples and its size
+has doubled or halved since the last sample; otherwise, only the numbers of triples are updated."""
     self.nb_added_triples = 0
     
-    if self.read_only: return
+    if self.read_only or not self.indexed: return # Statistics are computed when reindexing
     if sqlite3.sqlite_version_info[1] < 33: return # ANALYZE sqlite_schema not supported
-
-    #self.db.execute("""PRAGMA cache_size = -100""") # The two following queries are * faster * with a small cache!
-    #import time
-    #t0 = time.perf_counter()
+    
     nb_datas = self.execute("""SELECT COUNT() FROM datas INDEXED BY index_datas_c""").fetchone()[0]
-    #nb_datas = self.execute("""SELECT MAX(rowid) FROM datas""").fetchone()[0] or 10
-    #if nb_datas: print(nb_datas, time.perf_counter() - t0)
-    #t0 = time.perf_counter()
     nb_objs  = self.execute("""SELECT COUNT() FROM objs INDEXED BY index_objs_c""" ).fetchone()[0]
-    #nb_objs  = self.execute("""SELECT MAX(rowid) FROM objs""" ).fetchone()[0] or 10
-    #if nb_objs: print(nb_objs, time.perf_counter() - t0)
-    #self.db.execute("""PRAGMA cache_size = -200000""")
     nb_iris  = self.execute("""SELECT MAX(storid) FROM resources""" ).fetchone()[0] or 300
     
-    #nb_datas, nb_objs, nb_iris = 1889602, 1469278, 457914
-    #nb_datas, nb_objs, nb_iris = 506257, 520138, 172489
-    #nb_datas, nb_objs, nb_iris = 1889602, 1069278, 172489
-
-    #print("ANALYZE", nb_datas, nb_objs, nb_iris)
-    #nb_p  = self.execute("""SELECT COUNT() FROM objs WHERE p=6 AND o IN (13,14,15)""" ).fetchone()[0] or 1
-    #print("NB p", nb_p)
+    # Sampling costs much more than counting. When not forced, it is done again only if the store is not small,
+    # and its size has doubled or halved since the last sample; its total cost is thus at most twice the cost of the last sample.
+    nb = nb_objs + nb_datas
+    if force or (self.index_stats is None) or ((nb >= _STATS_SAMPLE_SIZE) and not (self.nb_sampled / 2 <= nb <= self.nb_sampled * 2)):
+      obj_sample  = self._sample_table("objs",  nb_objs)
+      data_sample = self._sample_table("datas", nb_datas)
+      self._collect_statistics(nb_objs, obj_sample, nb_datas, data_sample)
+      self.index_stats = self._index_statistics(nb_objs, obj_sample, nb_datas, data_sample)
+      self.nb_sampled  = nb
+    else:
+      self.nb_objs  = nb_objs
+      self.nb_datas = nb_datas
+    self.analyze_threshold = max(1000, nb // 10)
     
     try:
       self.execute("""DELETE FROM sqlite_stat1""")
@@ -280,22 +471,230 @@ class Graph(BaseMainGraph):
       self.execute("""ANALYZE""")
       self.execute("""DELETE FROM sqlite_stat1""")
       
+    # sqlite_stat4 is not written: only SQLite builds with SQLITE_ENABLE_STAT4 (not the usual ones) read it,
+    # and the skew of frequent objects is given to the planner by LIKELIHOOD() in SPARQL queries instead (see get_triple_likelihoods())
+    o_p_c, s_p, c = self.index_stats["objs"]
+    self.execute("""INSERT INTO sqlite_stat1 VALUES
+('objs', 'index_objs_op', '%s %s %s %s 1'),
+('objs', 'index_objs_sp', '%s %s %s'),
+('objs', 'index_objs_c', '%s %s')""" % (nb_objs, *o_p_c, nb_objs, *s_p, nb_objs, *(c or [max(1, nb_objs)])))
+    
+    o_p_c, s_p, c = self.index_stats["datas"]
+    self.execute("""INSERT INTO sqlite_stat1 VALUES
+('datas', 'index_datas_op', '%s %s %s %s %s 1'),
+('datas', 'index_datas_sp', '%s %s %s'),
+('datas', 'index_datas_c', '%s %s')""" % (nb_datas, *o_p_c, o_p_c[-1], nb_datas, *s_p, nb_datas, *(c or [max(1, nb_datas)])))
+    
     self.execute("""INSERT INTO sqlite_stat1 VALUES
-('objs', 'index_objs_op', '%s 4 3 3 1'),
-('objs', 'index_objs_sp', '%s 3 2'),
-('datas', 'index_datas_op', '%s 4 3 3 3 1'),
-('datas', 'index_datas_sp', '%s 3 2'),
 ('resources', 'index_resources_iri', '%s 1'),
 ('resources', 'resources', '%s 1')
-""" % (nb_objs, nb_objs, nb_datas, nb_datas, nb_iris, nb_iris))
-
-    #self.execute("""PRAGMA analysis_limit = 100""")
-    #self.execute("""ANALYZE""")
+""" % (nb_iris, nb_iris))
+    
     self.execute("""ANALYZE sqlite_schema""")
     
-  def set_indexed(self, indexed): pass
+  def _index_statistics(self, nb_objs, obj_sample, nb_datas, data_sample):
+    def averages(nb, sample, *keys): # Average number of rows per distinct value of the first 1, 2, ... columns of keys
+      if not sample: return None
+      scale = nb / len(sample)
+      r     = []
+      for n in range(1, len(keys) + 1):
+        nb_by_key = Counter(map(itemgetter(*keys[:n]), sample))
+        # Values frequent in the sample are probably all in it; each other value stands for scale values in the table
+        nb_distinct = sum(1 if nb_key >= _STATS_MIN_FREQUENT else scale for nb_key in nb_by_key.values())
+        r.append(max(1, min(nb, round(nb / nb_distinct))))
+      return r
+    
+    return { "objs"  : (averages(nb_objs,  obj_sample,  3, 2, 0) or [4, 3, 3], averages(nb_objs,  obj_sample,  1, 2) or [3, 2], averages(nb_objs,  obj_sample,  0)),
+             "datas" : (averages(nb_datas, data_sample, 3, 2, 0) or [4, 3, 3], averages(nb_datas, data_sample, 1, 2) or [3, 2], averages(nb_datas, data_sample, 0)) }
+  
+  def _sample_table(self, table, nb):
+    """returns about _STATS_SAMPLE_SIZE (c,s,p,o) rows of table. Large tables are sampled by windows of consecutive rowids, because consecutive rows often share their subject."""
+    if nb <= _STATS_SAMPLE_SIZE: return self.execute("""SELECT c,s,p,o FROM %s""" % table).fetchall()
+    min_rowid, max_rowid = self.execute("""SELECT MIN(rowid), MAX(rowid) FROM %s""" % table).fetchone()
+    step   = (max_rowid - min_rowid) // _STATS_NB_WINDOWS
+    sample = []
+    for i in range(_STATS_NB_WINDOWS):
+      sample.extend(self.execute("""SELECT c,s,p,o FROM %s WHERE rowid>=? LIMIT %s""" % (table, _STATS_SAMPLE_SIZE // _STATS_NB_WINDOWS), (min_rowid + i * step + step // 2,))) # Not at min_rowid, where the (often small) first ontologies are
+    return sample
+  
+  def _collect_statistics(self, nb_objs, obj_sample, nb_datas, data_sample):
+    predicate_stats  = {}
+    frequent_objects = {}
+    context_stats    = defaultdict(float)
+    for nb, sample in [(nb_objs, obj_sample), (nb_datas, data_sample)]:
+      if not sample: continue
+      scale = nb / len(sample)
+      by_p  = defaultdict(list)
+      for c, s, p, o in sample:
+        by_p[p].append((s, o))
+        context_stats[c] += scale
+      for p, sos in by_p.items():
+        predicate_stats[p] = (round(len(sos) * scale), max(1, round(len({ s for s, o in sos }) * scale)), max(1, round(len({ o for s, o in sos }) * scale)))
+        nb_by_o = defaultdict(int)
+        for s, o in sos: nb_by_o[o] += 1
+        for o, nb_o in nb_by_o.items():
+          if nb_o >= _STATS_MIN_FREQUENT: frequent_objects[p, o] = round(nb_o * scale)
+          
+    self.nb_objs          = nb_objs
+    self.nb_datas         = nb_datas
+    self.predicate_stats  = predicate_stats
+    self.frequent_objects = frequent_objects
+    self.context_stats    = { c : round(nb) for c, nb in context_stats.items() }
+    
+  def get_triple_likelihoods(self, table_type, p, o = None):
+    """returns the estimated likelihoods of the conditions on p and o (given p) for a row of table_type ('objs', 'datas' or 'quads2'), or None when unknown."""
+    if   table_type == "objs":  nb = self.nb_objs
+    elif table_type == "datas": nb = self.nb_datas
+    else:                       nb = self.nb_objs + self.nb_datas
+    stats = self.predicate_stats.get(p)
+    if not (nb and stats): return None, None
+    
+    likelihood_p = min(1.0, stats[0] / nb)
+    if o is None: return likelihood_p, None
+    nb_o = self.frequent_objects.get((p, o)) or (stats[0] / stats[2])
+    return likelihood_p, min(1.0, nb_o / stats[0])
+  
+  def set_indexed(self, indexed):
+    """Drops (indexed = False) or rebuilds (indexed = True) the secondary indexes and the full-text search triggers.
+
+Loading huge ontologies without indexes is faster. The definitions of the dropped indexes and triggers are kept in the
+deferred_indexes table; if the program stops before reindexing, indexes are rebuilt when the quadstore is opened again."""
+    if indexed:
+      if not self.execute("""SELECT 1 FROM sqlite_master WHERE type='table' AND name='deferred_indexes'""").fetchone():
+        self.indexed = True
+        return
+      
+      if not self.db.in_transaction: self.execute("BEGIN")
+      deferreds = self.execute("""SELECT type, name, sql FROM deferred_indexes""").fetchall()
+      for type, name, sql in deferreds:
+        if sql.startswith("CREATE UNIQUE INDEX"): # Remove duplicates inserted while the unique index was missing
+          table, columns = re.search(r"ON\s+(\w+)\s*\(([^)]*)\)", sql).groups()
+          self.execute("""DELETE FROM %s WHERE rowid NOT IN (SELECT MIN(rowid) FROM %s GROUP BY %s)""" % (table, table, columns))
+      for type, name, sql in deferreds:
+        if type == "index": self.execute(sql)
+      for type, name, sql in deferreds:
+        if type == "trigger": self.execute(sql)
+      for prop_storid in self.prop_fts: # Triggers were missing => repopulate full-text search tables
+        self.execute("""INSERT INTO fts_%s(fts_%s) VALUES('delete-all')""" % (prop_storid, prop_storid))
+        self.execute("""INSERT INTO fts_%s(rowid, s, o, d) SELECT rowid, s, o, d FROM datas WHERE p=%s""" % (prop_storid, prop_storid))
+      self.execute("""DROP TABLE deferred_indexes""")
+      self.indexed = True
+      self.select_execute_method()
+      self._update_closure()
+      self.analyze()
+      self.commit()
+      
+      if self.world:
+        for onto in list(self.c_2_onto.values()):
+          if onto.loaded: onto._load_properties()
+          
+    else:
+      if not self.indexed: return
+      if not self.db.in_transaction: self.execute("BEGIN")
+      self._invalidate_closure()
+      self.execute("""CREATE TABLE IF NOT EXISTS deferred_indexes (type TEXT, name TEXT, sql TEXT)""")
+      deferreds = self.execute("""SELECT type, name, sql FROM sqlite_master WHERE (type='index' AND tbl_name IN ('objs', 'datas') AND sql IS NOT NULL) OR (type='trigger' AND name GLOB 'fts_*')""").fetchall()
+      self.db.executemany("""INSERT INTO deferred_indexes VALUES (?,?,?)""", deferreds)
+      for type, name, sql in deferreds:
+        self.execute("""DROP %s %s""" % (type.upper(), name))
+      self.indexed = False
+      self.select_execute_method()
+      
+  def select_execute_method(self):
+    if self.indexed:
+      self.execute = self._execute
+    else: # Indexes are missing => remove index hints from requests
+      _execute = self._execute
+      def execute(sql, args = ()): return _execute(_INDEXED_BY.sub("", sql), args)
+      self.execute = execute
+    for subgraph in self.onto_2_subgraph.values():
+      subgraph.execute = self.execute
+      
+  def set_profiling(self, profiling, nb_samples = 1000):
+    """Enables or disables the instrumentation of SQL requests.
+
+When enabled, the number of calls, the execution times (cumulative, median and 99th percentile, computed on the last
+nb_samples calls) and the number of rows returned are recorded, per normalized SQL request and per calling function.
+The rows are fetched once at execution time, so that requests are not executed twice."""
+    if profiling:
+      db_execute      = self.db.execute
+      stats           = self._profiling_stats
+      normalized_sqls = {}
+      perf_counter    = time.perf_counter
+      module_globals  = globals()
+      def execute(sql, args = ()):
+        t0 = perf_counter()
+        cursor = db_execute(sql, args)
+        if cursor.description is None: rows = None
+        else:                          rows = cursor.fetchall()
+        t = perf_counter() - t0
+        
+        normalized_sql = normalized_sqls.get(sql)
+        if normalized_sql is None:
+          if len(normalized_sqls) > 10000: normalized_sqls.clear()
+          normalized_sql = normalized_sqls[sql] = _SQL_LITERALS.sub("?", _SQL_SPACES.sub(" ", sql).strip())
+        frame = sys._getframe(1)
+        while (frame.f_code.co_name == "execute") and (frame.f_globals is module_globals): frame = frame.f_back # Skip wrappers
+        caller = "%s.%s" % (frame.f_globals.get("__name__", "").replace("owlready2.", ""), getattr(frame.f_code, "co_qualname", frame.f_code.co_name))
+        
+        stat = stats.get((normalized_sql, caller))
+        if stat is None: stat = stats[normalized_sql, caller] = [0, 0.0, 0, deque(maxlen = nb_samples)]
+        stat[0] += 1
+        stat[1] += t
+        stat[3].append(t)
+        if rows is None: return cursor
+        stat[2] += len(rows)
+        return _ProfiledCursor(cursor, rows)
+      self._execute = execute
+      
+    else:
+      self._execute = self.db.execute
+      
+    self.profiling = profiling
+    self.select_execute_method()
+    
+  def reset_profiling(self):
+    self._profiling_stats.clear()
+    
+  def get_profiling_stats(self, format = "dict"):
+    """Returns the recorded statistics, as a dict mapping normalized SQL requests to callers and statistics, or as a JSON
+string if format is "json". Times are in seconds."""
+    r = defaultdict(dict)
+    for (sql, caller), (nb, total_time, nb_rows, times) in self._profiling_stats.items():
+      times = sorted(times)
+      r[sql][caller] = {
+        "count"      : nb,
+        "total_time" : total_time,
+        "mean_time"  : total_time / nb,
+        "p50_time"   : times[min(len(times) - 1, len(times) // 2)],
+        "p99_time"   : times[min(len(times) - 1, int(len(times) * 0.99))],
+        "rows"       : nb_rows,
+      }
+    r = dict(r)
+    if format == "json":
+      import json
+      return json.dumps(r, indent = 2)
+    return r
   
+  def show_profiling(self, nb = 30):
+    stats = [(stat["total_time"], sql, caller, stat)
+             for sql, callers in self.get_profiling_stats().items()
+             for caller, stat in callers.items()]
+    stats.sort(key = lambda x: x[0], reverse = True)
+    print(file = sys.stderr)
+    print("Requests by total time (count, total, p50, p99, rows, caller, request):", file = sys.stderr)
+    for total_time, sql, caller, stat in stats[:nb]:
+      print("  %s\t%.6f\t%.6f\t%.6f\t%s\t%s\t%s" % (stat["count"], total_time, stat["p50_time"], stat["p99_time"], stat["rows"], caller, sql), file = sys.stderr)
+    print(file = sys.stderr)
+    
+  def snapshot_to(self, filename, progress = None):
+    self.commit()
+    target = sqlite3.connect(filename)
+    try:     _backup_db(self.db, target, progress)
+    finally: target.close()
+    
   def close(self):
+    self._next_storid = self._last_storid = self._next_blank = self._last_blank = 0 # Uncommitted reservations are lost with the transaction
     self.db.close()
     
   def acquire_write_lock(self):
@@ -357,15 +756,185 @@ class Graph(BaseMainGraph):
     r = self.execute("SELECT storid FROM resources WHERE iri=? LIMIT 1", (iri,)).fetchone()
     if r: return r[0]
     if create_if_missing:
-      #storid = max(self.execute("SELECT MAX(storid)+1 FROM resources").fetchone()[0], 301) # First 300 values are reserved
-      storid = self.execute("UPDATE store SET current_resource=current_resource+1").execute("SELECT current_resource FROM store").fetchone()[0]
-      
+      storid = self._new_storid()
       self.execute("INSERT INTO resources VALUES (?,?)", (storid, iri))
       return storid
     
+  def _abbreviate_many(self, iris, create_if_missing = True):
+    """returns a dict mapping the given IRIs to their storids; IRIs are looked up, and created if missing, by batches."""
+    iris    = list(dict.fromkeys(iris))
+    abbrevs = dict(_execute_batched(self.execute, "SELECT iri, storid FROM resources WHERE iri IN (%s)", iris, tuple))
+    if create_if_missing:
+      new_abbrevs = [(self._new_storid(), iri) for iri in iris if not iri in abbrevs]
+      if new_abbrevs:
+        self.db.executemany("INSERT INTO resources VALUES (?,?)", new_abbrevs)
+        abbrevs.update((iri, storid) for storid, iri in new_abbrevs)
+    return abbrevs
+  
+  def _create_import_abbreviate(self, cur):
+    """returns (abbrevs, abbreviate) for importing batches of triples. abbreviate(iris) adds the given IRIs to the abbrevs dict
+(IRI => storid), looking up and creating resources with batched requests. Blank nodes get new storids; language tags are
+kept as is, and the empty datatype ("" or None) becomes 60."""
+    abbrevs        = { "" : 60, None : 60 }
+    new_storid     = self._new_storid
+    new_blank_node = self.new_blank_node
+    def abbreviate(iris):
+      unknowns = [iri for iri in dict.fromkeys(iris) if not iri in abbrevs]
+      if not unknowns: return
+      abbrevs.update(_execute_batched(cur.execute, "SELECT iri, storid FROM resources WHERE iri IN (%s)", [iri for iri in unknowns if not (iri.startswith("_") or iri.startswith("@"))], tuple))
+      new_abbrevs = []
+      for iri in unknowns:
+        if   iri in abbrevs:      continue
+        elif iri.startswith("@"): abbrevs[iri] = iri # Language tag
+        elif iri.startswith("_"): abbrevs[iri] = new_blank_node()
+        else:
+          storid = abbrevs[iri] = new_storid()
+          new_abbrevs.append((storid, iri))
+      if new_abbrevs: cur.executemany("INSERT INTO resources VALUES (?,?)", new_abbrevs)
+    return abbrevs, abbreviate
+  
+  def _bulk_add_raw(self, objs, datas):
+    """inserts (c,s,p,o) object quads and (c,s,p,o,d) data quads with one request per table."""
+    if objs:  self.db.executemany("INSERT OR IGNORE INTO objs VALUES (?,?,?,?)",    objs)
+    if datas: self.db.executemany("INSERT OR IGNORE INTO datas VALUES (?,?,?,?,?)", datas)
+    for p in (rdfs_subclassof, rdfs_subpropertyof):
+      if (p in self._hierarchy_labels) and any(quad[2] == p for quad in objs): self._invalidate_hierarchy_labels(p)
+    self.nb_added_triples += len(objs) + len(datas)
+    if self.nb_added_triples > self.analyze_threshold: self.analyze(False)
+    
+  def import_quads_from_queue(self, queue, get_context, filename = None, delete_existing_triples = True):
+    """imports ("objs", [(s,p,o,g)]) and ("datas", [(s,p,o,d,g)]) batches of quads in several contexts at once, in a single transaction.
+get_context(g) returns the context for the graph IRI g (None for the default graph); if delete_existing_triples is true,
+the triples of each context are deleted when the context is first met. Blank nodes are shared by all contexts."""
+    cur = self.db.cursor()
+    
+    if not self.db.in_transaction: cur.execute("BEGIN")
+    self._invalidate_closure()
+    self._invalidate_hierarchy_labels()
+    
+    abbrevs, abbreviate = self._create_import_abbreviate(cur)
+    contexts = {}
+    def _get_context(g):
+      c = contexts[g] = get_context(g)
+      if delete_existing_triples:
+        cur.execute("DELETE FROM objs WHERE c=?",  (c,))
+        cur.execute("DELETE FROM datas WHERE c=?", (c,))
+      return c
+    
+    if filename: date = os.path.getmtime(filename)
+    else:        date = time.time()
+    
+    def insert_objs(quads):
+      abbreviate(chain.from_iterable((s, p, o) for s, p, o, g in quads))
+      objs = [(contexts.get(g) or _get_context(g), abbrevs[s], abbrevs[p], abbrevs[o]) for s, p, o, g in quads]
+      cur.executemany("INSERT OR IGNORE INTO objs VALUES (?,?,?,?)", objs)
+      
+    def insert_datas(quads):
+      abbreviate(chain.from_iterable((s, p, d) for s, p, o, d, g in quads))
+      datas = [(contexts.get(g) or _get_context(g), abbrevs[s], abbrevs[p], o, abbrevs[d]) for s, p, o, d, g in quads]
+      cur.executemany("INSERT OR IGNORE INTO datas VALUES (?,?,?,?,?)", datas)
+      
+    def finish():
+      cur.executemany("UPDATE ontologies SET last_update=? WHERE c=?", [(date, c) for c in contexts.values()])
+      self.select_abbreviate_method()
+      self._update_closure()
+      self.analyze(False)
+      return list(contexts.values())
+    
+    if queue:
+      while True:
+        command, quads = queue.get()
+        if   command == "objs":   insert_objs (quads)
+        elif command == "datas":  insert_datas(quads)
+        elif command == "finish": return finish()
+        elif command == "error":
+          import owlready2
+          raise owlready2.OwlReadyOntologyParsingError(*quads)
+        
+    return insert_objs, insert_datas, finish
+  
+  def _new_storid(self):
+    if self._next_storid >= self._last_storid: # Reserve a new block of storids
+      self.execute("UPDATE store SET current_resource=current_resource+?", (self.id_block_size,))
+      self._last_storid = self.execute("SELECT current_resource FROM store").fetchone()[0]
+      self._next_storid = self._last_storid - self.id_block_size
+    self._next_storid += 1
+    return self._next_storid
+  
+  def _release_reserved_ids(self):
+    # Give back the unused ids, unless another connection has reserved ids in the meantime (in that case, they are just skipped)
+    if self._next_storid < self._last_storid:
+      self.execute("UPDATE store SET current_resource=? WHERE current_resource=?", (self._next_storid, self._last_storid))
+    if self._next_blank < self._last_blank:
+      self.execute("UPDATE store SET current_blank=? WHERE current_blank=?", (self._next_blank, self._last_blank))
+    self._next_storid = self._last_storid = self._next_blank = self._last_blank = 0
+    
   def _unabbreviate(self, storid):
     return self.execute("SELECT iri FROM resources WHERE storid=? LIMIT 1", (storid,)).fetchone()[0]
   
+  def set_abbreviate_cache_size(self, size):
+    """Sets the maximum number of IRI <=> storid pairs kept in memory (0 disables the cache)."""
+    self.abbreviate_cache_size  = size
+    self.abbreviate_cache_hits  = 0
+    self.abbreviate_cache_miss  = 0
+    self._iri_2_storid          = OrderedDict()
+    self._storid_2_iri          = OrderedDict()
+    if size:
+      self._abbreviate   = self._abbreviate_cached
+      self._unabbreviate = self._unabbreviate_cached
+    else:
+      self.__dict__.pop("_abbreviate",   None)
+      self.__dict__.pop("_unabbreviate", None)
+    self.select_abbreviate_method()
+    
+  def get_abbreviate_cache_stats(self):
+    return {
+      "size"     : len(self._iri_2_storid),
+      "max_size" : self.abbreviate_cache_size,
+      "hits"     : self.abbreviate_cache_hits,
+      "misses"   : self.abbreviate_cache_miss,
+    }
+  
+  def _cache_abbreviation(self, storid, iri):
+    self._iri_2_storid[iri]    = storid
+    self._storid_2_iri[storid] = iri
+    if len(self._iri_2_storid) > self.abbreviate_cache_size:
+      old_iri, old_storid = self._iri_2_storid.popitem(False)
+      self._storid_2_iri.pop(old_storid, None)
+    if len(self._storid_2_iri) > self.abbreviate_cache_size:
+      old_storid, old_iri = self._storid_2_iri.popitem(False)
+      self._iri_2_storid.pop(old_iri, None)
+      
+  def _uncache_abbreviation(self, storid):
+    iri = self._storid_2_iri.pop(storid, None)
+    if not iri is None: self._iri_2_storid.pop(iri, None)
+    
+  def _clear_abbreviate_cache(self):
+    self._iri_2_storid.clear()
+    self._storid_2_iri.clear()
+    
+  def _abbreviate_cached(self, iri, create_if_missing = True):
+    storid = self._iri_2_storid.get(iri)
+    if not storid is None:
+      self.abbreviate_cache_hits += 1
+      self._iri_2_storid.move_to_end(iri)
+      return storid
+    self.abbreviate_cache_miss += 1
+    storid = Graph._abbreviate(self, iri, create_if_missing)
+    if not storid is None: self._cache_abbreviation(storid, iri) # Missing IRIs are not cached, since they may be created later
+    return storid
+  
+  def _unabbreviate_cached(self, storid):
+    iri = self._storid_2_iri.get(storid)
+    if not iri is None:
+      self.abbreviate_cache_hits += 1
+      self._storid_2_iri.move_to_end(storid)
+      return iri
+    self.abbreviate_cache_miss += 1
+    iri = Graph._unabbreviate(self, storid)
+    self._cache_abbreviation(storid, iri)
+    return iri
+  
   def get_storid_dict(self):
     return dict(self.execute("SELECT storid, iri FROM resources").fetchall())
   
@@ -396,10 +965,13 @@ class Graph(BaseMainGraph):
     
   
   def _refactor(self, storid, new_iri):
+    self._uncache_abbreviation(storid)
+    self._iri_2_storid.pop(new_iri, None)
     self.execute("UPDATE resources SET iri=? WHERE storid=?", (new_iri, storid,))
     
   def _refactor_onto(self, storid, old_base_iri, new_base_iri):
     self._refactor(storid, new_base_iri)
+    self._clear_abbreviate_cache() # Many IRIs may be renamed
 
     if old_base_iri.endswith("#"):
       self.execute("UPDATE resources SET iri=?||SUBSTR(iri,?) WHERE SUBSTR(iri,1,?)=?", (new_base_iri, len(old_base_iri) + 1, len(old_base_iri), old_base_iri))
@@ -410,6 +982,8 @@ class Graph(BaseMainGraph):
   def has_changes(self): return self.current_changes != self.db.total_changes
 
   def commit(self):
+    if self._last_storid or self._last_blank: self._release_reserved_ids()
+    if self.transitive_closure and (not self.read_only): self._update_closure() # Ends the updates left by other write operations
     if (self.current_changes != self.db.total_changes) or self.db.in_transaction:
       self.current_changes = self.db.total_changes
       self.db.commit()
@@ -422,10 +996,12 @@ class Graph(BaseMainGraph):
     return user_c
   
   def new_blank_node(self):
-    #blank = self.execute("SELECT current_blank+1 FROM store").fetchone()[0]
-    #self.execute("UPDATE store SET current_blank=?", (blank,))
-    blank = self.execute("UPDATE store SET current_blank=current_blank+1").execute("SELECT current_blank FROM store").fetchone()[0]
-    return -blank
+    if self._next_blank >= self._last_blank: # Reserve a new block of blank node ids
+      self.execute("UPDATE store SET current_blank=current_blank+?", (self.id_block_size,))
+      self._last_blank = self.execute("SELECT current_blank FROM store").fetchone()[0]
+      self._next_blank = self._last_blank - self.id_block_size
+    self._next_blank += 1
+    return -self._next_blank
     
   def _get_obj_triples_spo_spo(self, s, p, o):
     if s is None:
@@ -564,6 +1140,37 @@ class Graph(BaseMainGraph):
 
   def _get_triples_sp_od(self, s, p):
     return self.execute("SELECT o,d FROM quads WHERE s=? AND p=?", (s, p)).fetchall()
+  
+  def _get_obj_triples_ssp_so(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o FROM objs WHERE s IN (%s) AND p=?", ss, lambda chunk: (*chunk, p)))
+  
+  def _get_obj_triples_ssp_sco(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,c,o FROM objs WHERE s IN (%s) AND p=?", ss, lambda chunk: (*chunk, p)))
+  
+  def _get_obj_triples_sspi_so(self, ss, p, i):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o FROM objs WHERE s IN (%s) AND p=? UNION SELECT o,s FROM objs WHERE p=? AND o IN (%s)", ss, lambda chunk: (*chunk, p, i, *chunk)))
+  
+  def _get_data_triples_ssp_sod(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o,d FROM datas WHERE s IN (%s) AND p=?", ss, lambda chunk: (*chunk, p)))
+  
+  def _get_triples_ssp_sod(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o,d FROM quads WHERE s IN (%s) AND p=?", ss, lambda chunk: (*chunk, p)))
+  
+  def _get_obj_triples_ssps_spo(self, ss, ps):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT s,p,o FROM objs WHERE s IN (%%s) AND p IN (%s)" % ",".join("?" * len(ps)), ss, lambda chunk: (*chunk, *ps)), 2)
+  
+  def _get_data_triples_ssps_spod(self, ss, ps):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT s,p,o,d FROM datas WHERE s IN (%%s) AND p IN (%s)" % ",".join("?" * len(ps)), ss, lambda chunk: (*chunk, *ps)), 2)
+  
+  def _get_triples_ssps_spod(self, ss, ps):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT s,p,o,d FROM quads WHERE s IN (%%s) AND p IN (%s)" % ",".join("?" * len(ps)), ss, lambda chunk: (*chunk, *ps)), 2)
+  
+  def _get_obj_triples_psos_pos(self, ps, os):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT p,o,s FROM objs WHERE p IN (%s) AND o IN (%%s)" % ",".join("?" * len(ps)), os, lambda chunk: (*ps, *chunk)), 2)
     
   def _get_data_triples_s_pod(self, s):
     return self.execute("SELECT p,o,d FROM datas WHERE s=?", (s,)).fetchall()
@@ -571,6 +1178,12 @@ class Graph(BaseMainGraph):
   def _get_triples_s_pod(self, s):
     return self.execute("SELECT p,o,d FROM quads WHERE s=?", (s,)).fetchall()
     
+  def _get_triples_ps_spod(self, ps):
+    return self.execute("SELECT s,p,o,d FROM quads WHERE p IN (%s)" % ",".join("?" * len(ps)), tuple(ps)).fetchall()
+    
+  def _get_shared_blank_nodes(self):
+    return { x for (x,) in self.execute("SELECT o FROM objs WHERE o<0 GROUP BY o HAVING COUNT()>1").fetchall() }
+    
   def _get_obj_triples_po_s(self, p, o):
     for (x,) in self.execute("SELECT s FROM objs WHERE p=? AND o=?", (p, o)).fetchall(): yield x
     
@@ -635,6 +1248,7 @@ class Graph(BaseMainGraph):
     return not cur.fetchone() is None
   
   def _del_obj_triple_raw_spo(self, s, p, o):
+    if (p is None) or (p == rdfs_subclassof) or (p == rdfs_subpropertyof): self._invalidate_hierarchy_labels(p)
     if s is None:
       if p is None:
         if o is None: self.execute("DELETE FROM objs")
@@ -649,7 +1263,8 @@ class Graph(BaseMainGraph):
       else:
         if o is None: self.execute("DELETE FROM objs WHERE s=? AND p=?", (s, p,))
         else:         self.execute("DELETE FROM objs INDEXED BY index_objs_sp WHERE s=? AND p=? AND o=?", (s, p, o,))
-        
+    if self.transitive_closure and ((p is None) or (p in _CLOSURE_PREDICATES)): self._update_closure()
+    
   def _del_data_triple_raw_spod(self, s, p, o, d):
     if s is None:
       if p is None:
@@ -685,6 +1300,9 @@ class Graph(BaseMainGraph):
 
 
   def _get_obj_triples_transitive_sp(self, s, p):
+    if ((p == rdfs_subclassof) or (p == rdfs_subpropertyof)) and self._check_closure(p): # Not owl_equivalentclass, whose closure also includes rdfs:subClassOf
+      for (x,) in self.execute("SELECT o FROM closure WHERE p=? AND s=?", (p, s)).fetchall(): yield x
+      return
     for (x,) in self.execute("""
 WITH RECURSIVE transit(x)
 AS (  SELECT o FROM objs WHERE s=? AND p=?
@@ -694,6 +1312,14 @@ SELECT x FROM transit""", (s, p, p)).fetchall(): yield x
 
     
   def _get_obj_triples_transitive_po(self, p, o):
+    if (p == rdfs_subclassof) or (p == rdfs_subpropertyof):
+      labels = self._get_hierarchy_labels(p)
+      if labels:
+        yield from labels.descendants(o, False)
+        return
+      if self._check_closure(p):
+        for (x,) in self.execute("SELECT s FROM closure WHERE p=? AND o=?", (p, o)).fetchall(): yield x
+        return
     for (x,) in self.execute("""
 WITH RECURSIVE transit(x)
 AS (  SELECT s FROM objs WHERE p=? AND o=?
@@ -753,30 +1379,29 @@ SELECT c, o FROM objs q1 WHERE s=? AND o < 0 AND (SELECT COUNT() FROM objs q2 WH
         self._destroy_collect_storids(destroyed_storids, modified_relations, blank_used)
       
   def _rdf_list_analyze(self, blank):
-    previouss = []
-    nexts     = []
-    length    = 1
-    b         = self._get_obj_triple_sp_o(blank, rdf_rest)
-    while b != rdf_nil:
-      nexts.append(b)
-      length += 1
-      b       = self._get_obj_triple_sp_o(b, rdf_rest)
-      
-    b         = self._get_obj_triple_po_s(rdf_rest, blank)
-    if b:
-      while b:
-        previouss.append(b)
-        length += 1
-        root    = b
-        b       = self._get_obj_triple_po_s(rdf_rest, b)
-    else:
-      root = blank
+    # Walk the list in both directions with one recursive request each, rather than one request per item
+    nexts     = [b for (b,) in self.execute("""
+WITH RECURSIVE l(b, i) AS (
+  SELECT o, 1 FROM objs WHERE s=? AND p=?
+UNION
+  SELECT objs.o, l.i+1 FROM l, objs WHERE objs.s=l.b AND objs.p=? AND l.b!=?
+) SELECT b FROM l WHERE b!=? ORDER BY i""", (blank, rdf_rest, rdf_rest, rdf_nil, rdf_nil))]
+    previouss = [b for (b,) in self.execute("""
+WITH RECURSIVE l(b, i) AS (
+  SELECT s, 1 FROM objs WHERE p=? AND o=?
+UNION
+  SELECT objs.s, l.i+1 FROM l, objs WHERE objs.p=? AND objs.o=l.b
+) SELECT b FROM l ORDER BY i""", (rdf_rest, blank, rdf_rest))]
+    length    = 1 + len(nexts) + len(previouss)
+    if previouss: root = previouss[-1]
+    else:         root = blank
       
     list_user, prop_user = self.execute("SELECT s, p FROM objs WHERE o=? LIMIT 1", (root,)).fetchone() or (None, None)
     return list_user, prop_user, root, previouss, nexts, length
   
   def restore_iri(self, storid, iri):
     self.execute("INSERT INTO resources VALUES (?,?)", (storid, iri))
+    if self.abbreviate_cache_size: self._cache_abbreviation(storid, iri)
       
   def destroy_entity(self, storid, destroyer, relation_updater, undoer_objs = None, undoer_datas = None):
     destroyed_storids   = { storid }
@@ -796,17 +1421,20 @@ SELECT c, o FROM objs q1 WHERE s=? AND o < 0 AND (SELECT COUNT() FROM objs q2 WH
     for storid in destroyed_storids:
       destroyer(storid)
       
+    self._invalidate_hierarchy_labels()
     for storid in destroyed_storids:
       if undoer_objs is not None:
         undoer_objs .extend(self.execute("SELECT c,s,p,o FROM objs WHERE s=? OR o=?", (storid, storid)))
         undoer_datas.extend(self.execute("SELECT c,s,p,o,d FROM datas WHERE s=?", (storid,)))
       self.execute("DELETE FROM objs  WHERE s=? OR o=?", (storid, storid))
       self.execute("DELETE FROM datas WHERE s=?", (storid,))
-
+    if self.transitive_closure: self._update_closure()
+    
     for s, ps in modified_relations.items():
       relation_updater(destroyed_storids, s, ps)
       
     self.execute("DELETE FROM resources WHERE storid=?", (storid,)) # At the end, so as the resource is still available for logging during destroying
+    self._uncache_abbreviation(storid)
     
     return destroyed_storids
   
@@ -816,6 +1444,22 @@ SELECT c, o FROM objs q1 WHERE s=? AND o < 0 AND (SELECT COUNT() FROM objs q2 WH
     else:
       return self.execute("SELECT c, iri FROM ontologies").fetchall()
     
+  def _save_ntriples(self, f, quads = False, parallel = False, c = None):
+    """writes the triples in N-Triples (or N-Quads) format. The lines are built by SQLite, joining the triples with the
+resources table, and written by large blocks. If parallel is true, each context is formatted in a worker process; this
+requires a quadstore file opened with exclusive = False, and commits it first."""
+    c_2_iri = dict(self._iter_ontology_iri()) if quads else None
+    if parallel and not c:
+      if (self.filename == ":memory:") or self.exclusive: raise ValueError("Cannot save in parallel an in-memory or exclusive quadstore! Please use a quadstore file and 'exclusive=False'.")
+      if not self.read_only: self.commit()
+      import multiprocessing
+      cs = [c for (c,) in self.execute("SELECT DISTINCT c FROM objs UNION SELECT DISTINCT c FROM datas").fetchall()]
+      with multiprocessing.Pool(max(2, _nb_cpus())) as pool:
+        for data in pool.imap(_ntriples_of_context, [(self.filename, quads, c) for c in cs]): f.write(data)
+    else:
+      for rows in _iter_ntriples_rows(self.db, quads, c):
+        f.write(_ntriples_lines(rows, self._unabbreviate, c_2_iri).encode("utf8"))
+        
   def _iter_triples(self, quads = False, sort_by_s = False, c = None):
     cursor = self.db.cursor() # Use a new cursor => can iterate without loading all data in a big list, while still being able to query the default cursor
     sql = ""
@@ -862,6 +1506,225 @@ END;""" % (prop_storid, prop_storid, prop_storid,   prop_storid, prop_storid, pr
     self.execute("""DROP TRIGGER fts_%s_after_delete""" % prop_storid)
     self.execute("""DROP TRIGGER fts_%s_after_update""" % prop_storid)
     
+  def enable_transitive_closure(self):
+    """Materializes the transitive closure of rdfs:subClassOf, rdfs:subPropertyOf and
+(rdfs:subClassOf|owl:equivalentClass|^owl:equivalentClass) in the closure table.
+
+The closure is updated incrementally by triggers when such triples are added. When they are removed, the triggers only
+remove the closure of the entities below the removed triple, and record these entities in the closure_work table;
+their closure is derived again, through the remaining triples, at the end of the write operation (deletion, entity destruction,
+SPARQL update) or at the next commit(). The closure is rebuilt in bulk at the end of parsing, or by update_closure().
+As long as it is not up to date, recursive SQL is used instead."""
+    if self.transitive_closure: return
+    self.execute("""CREATE TABLE closure (p INTEGER, s INTEGER, o INTEGER, PRIMARY KEY (p,o,s)) WITHOUT ROWID""")
+    self.execute("""CREATE INDEX index_closure_ps ON closure(p,s)""")
+    self.execute("""CREATE TABLE closure_work (p INTEGER, x INTEGER, PRIMARY KEY (p,x)) WITHOUT ROWID""")
+    
+    def up_to_date(kind): return "EXISTS (SELECT 1 FROM closure WHERE p=%s AND s=0 AND o=0)" % kind
+    def pending   (kind): return "EXISTS (SELECT 1 FROM closure_work WHERE p=%s)" % kind
+    
+    def insert_sql(kind, s, o):
+      return """INSERT OR IGNORE INTO closure SELECT %s, d.s, a.o
+    FROM (SELECT %s AS s UNION SELECT s FROM closure WHERE p=%s AND o=%s) d, (SELECT %s AS o UNION SELECT o FROM closure WHERE p=%s AND s=%s) a
+    WHERE %s""" % (kind, s, kind, s, o, kind, o, up_to_date(kind))
+    
+    def stale_sql(kind, x, condition): # x and the entities below it need their closure to be derived again
+      below = "SELECT %s UNION SELECT s FROM closure WHERE p=%s AND o=%s" % (x, kind, x)
+      return """INSERT OR IGNORE INTO closure_work SELECT %s, * FROM (%s) WHERE %s;
+  DELETE FROM closure WHERE p=%s AND s IN (%s) AND %s;
+  DELETE FROM closure WHERE p=%s AND s=0 AND o=0 AND %s""" % (kind, below, condition, kind, below, condition, kind, condition)
+    
+    def removed_sql(kind, x): return stale_sql(kind, x, "(%s OR %s)" % (up_to_date(kind), pending(kind)))
+    def added_sql  (kind, x): return stale_sql(kind, x, "(NOT %s) AND %s" % (up_to_date(kind), pending(kind)))
+    
+    self.db.cursor().executescript("""
+CREATE TRIGGER closure_after_insert_subclassof AFTER INSERT ON objs WHEN new.p=%s
+BEGIN
+  %s;
+  %s;
+  %s;
+  %s;
+END;
+CREATE TRIGGER closure_after_insert_subpropertyof AFTER INSERT ON objs WHEN new.p=%s
+BEGIN
+  %s;
+  %s;
+END;
+CREATE TRIGGER closure_after_insert_equivalentclass AFTER INSERT ON objs WHEN new.p=%s
+BEGIN
+  %s;
+  %s;
+  %s;
+  %s;
+END;
+CREATE TRIGGER closure_after_delete_subclassof AFTER DELETE ON objs WHEN old.p=%s
+BEGIN
+  %s;
+  %s;
+END;
+CREATE TRIGGER closure_after_delete_subpropertyof AFTER DELETE ON objs WHEN old.p=%s
+BEGIN
+  %s;
+END;
+CREATE TRIGGER closure_after_delete_equivalentclass AFTER DELETE ON objs WHEN old.p=%s
+BEGIN
+  %s;
+  %s;
+END;
+CREATE TRIGGER closure_after_update AFTER UPDATE ON objs WHEN old.p IN (%s,%s,%s) OR new.p IN (%s,%s,%s)
+BEGIN
+  %s;
+END;""" % (
+  rdfs_subclassof,
+  insert_sql(rdfs_subclassof, "new.s", "new.o"),
+  insert_sql(owl_equivalentclass, "new.s", "new.o"),
+  added_sql(rdfs_subclassof, "new.s"),
+  added_sql(owl_equivalentclass, "new.s"),
+  rdfs_subpropertyof,
+  insert_sql(rdfs_subpropertyof, "new.s", "new.o"),
+  added_sql(rdfs_subpropertyof, "new.s"),
+  owl_equivalentclass,
+  insert_sql(owl_equivalentclass, "new.s", "new.o"),
+  insert_sql(owl_equivalentclass, "new.o", "new.s"),
+  added_sql(owl_equivalentclass, "new.s"),
+  added_sql(owl_equivalentclass, "new.o"),
+  rdfs_subclassof,
+  removed_sql(rdfs_subclassof, "old.s"),
+  removed_sql(owl_equivalentclass, "old.s"),
+  rdfs_subpropertyof,
+  removed_sql(rdfs_subpropertyof, "old.s"),
+  owl_equivalentclass,
+  removed_sql(owl_equivalentclass, "old.s"),
+  removed_sql(owl_equivalentclass, "old.o"),
+  rdfs_subclassof, rdfs_subpropertyof, owl_equivalentclass, rdfs_subclassof, rdfs_subpropertyof, owl_equivalentclass,
+  ";\n  ".join(removed_sql(kind, x) for kind in _CLOSURE_PREDICATES for x in ["old.s", "old.o", "new.s", "new.o"])))
+    self.transitive_closure = True
+    self._update_closure()
+    if self.world: self.world._prepare_sparql.cache_clear()
+    
+  def disable_transitive_closure(self):
+    if not self.transitive_closure: return
+    for trigger in ["insert_subclassof", "insert_subpropertyof", "insert_equivalentclass", "delete_subclassof", "delete_subpropertyof", "delete_equivalentclass", "update"]:
+      self.execute("""DROP TRIGGER closure_after_%s""" % trigger)
+    self.execute("""DROP TABLE closure""")
+    self.execute("""DROP TABLE closure_work""")
+    self.transitive_closure = False
+    if self.world: self.world._prepare_sparql.cache_clear()
+    
+  def enable_change_tracking(self):
+    """Counts the changes (inserted, deleted or updated triples) of each context in the context_changes table, with triggers;
+used by World.save_changed(). Context 0 holds the time when the tracking was enabled, in milliseconds."""
+    if self.change_tracking: return
+    self.execute("""CREATE TABLE context_changes (c INTEGER PRIMARY KEY, changes INTEGER)""")
+    self.execute("""INSERT INTO context_changes VALUES (0, ?)""", (int(time.time() * 1000),))
+    script = []
+    for table in ["objs", "datas"]:
+      for event, rows in [("insert", ["new"]), ("delete", ["old"]), ("update", ["old", "new"])]:
+        script.append("""CREATE TRIGGER changes_after_%s_%s AFTER %s ON %s
+BEGIN
+%s
+END;""" % (event, table, event.upper(), table, "\n".join("  INSERT INTO context_changes VALUES (%s.c, 1) ON CONFLICT(c) DO UPDATE SET changes=changes+1;" % row for row in rows)))
+    self.db.cursor().executescript("\n".join(script))
+    self.change_tracking = True
+    
+  def disable_change_tracking(self):
+    if not self.change_tracking: return
+    for table in ["objs", "datas"]:
+      for event in ["insert", "delete", "update"]:
+        self.execute("""DROP TRIGGER changes_after_%s_%s""" % (event, table))
+    self.execute("""DROP TABLE context_changes""")
+    self.change_tracking = False
+    
+  def get_context_changes(self):
+    """Returns a dict mapping each context to its number of changes (see enable_change_tracking())."""
+    if not self.change_tracking: return {}
+    return dict(self.execute("""SELECT c, changes FROM context_changes""").fetchall())
+  
+  def _get_hierarchy_labels(self, p):
+    """Returns the interval labelling of the hierarchy of predicate p (e.g. rdfs:subClassOf), or None if not available.
+
+The labelling is computed lazily and invalidated when the hierarchy changes. After an invalidation, it is rebuilt only
+after a number of requests proportional to the size of the hierarchy; in the meantime, requests are answered with SQL."""
+    labels = self._hierarchy_labels.get(p)
+    if labels is None:
+      if not self.exclusive: return None # Other processes may modify the hierarchy
+      delay = self._hierarchy_delays.get(p, 0)
+      if delay > 0:
+        self._hierarchy_delays[p] = delay - 1
+        return None
+      edges = self.execute("SELECT s,o FROM objs WHERE p=?", (p,)).fetchall()
+      try:               labels = _HierarchyLabels(edges, 100 * len(edges) + 1000)
+      except ValueError: labels = False # Too many multiple inheritances
+      self._hierarchy_labels[p] = labels
+    return labels or None
+  
+  def _invalidate_hierarchy_labels(self, p = None):
+    for p in (list(self._hierarchy_labels) if p is None else [p]):
+      labels = self._hierarchy_labels.pop(p, None)
+      if not labels is None: self._hierarchy_delays[p] = max(100, len(labels.nodes) // 100) if labels else 10000
+      
+  def _is_subsumed(self, s, p, os):
+    """Returns True if s is one of os, or is linked to one of them by a chain of p (e.g. rdfs:subClassOf)."""
+    if s in os: return True
+    labels = self._get_hierarchy_labels(p)
+    if labels:
+      is_descendant = labels.is_descendant
+      for o in os:
+        if is_descendant(s, o): return True
+      return False
+    return not set(self._get_obj_triples_transitive_sp(s, p)).isdisjoint(os)
+  
+  def _check_closure(self, p):
+    """Returns True if the closure of predicate p is available and up to date. Never writes; if it returns False,
+the caller falls back to recursive SQL."""
+    if not self.transitive_closure: return False
+    return bool(self.execute("""SELECT 1 FROM closure WHERE p=? AND s=0 AND o=0""", (p,)).fetchone())
+  
+  def update_closure(self):
+    """Rebuilds the parts of the transitive closure that have been invalidated (see enable_transitive_closure())."""
+    if (not self.transitive_closure) or self.read_only: return
+    self.acquire_write_lock()
+    try:     self._update_closure()
+    finally: self.release_write_lock()
+    
+  def _update_closure(self): # The write lock must be held
+    if (not self.transitive_closure) or (not self.indexed): return # Rebuilt when reindexing
+    for p in _CLOSURE_PREDICATES:
+      if not self._check_closure(p):
+        self._rebuild_closure(p, bool(self.execute("""SELECT 1 FROM closure_work WHERE p=? LIMIT 1""", (p,)).fetchone()))
+        
+  def _invalidate_closure(self):
+    if self.transitive_closure:
+      self.execute("""DELETE FROM closure""")
+      self.execute("""DELETE FROM closure_work""")
+      
+  def _rebuild_closure(self, p, incremental = False):
+    """Rebuilds the closure of predicate p; if incremental is True, only for the entities recorded in the closure_work table."""
+    if incremental:
+      from_s = "objs JOIN closure_work ON closure_work.p=%s AND closure_work.x=objs.s" % p
+      from_o = "objs JOIN closure_work ON closure_work.p=%s AND closure_work.x=objs.o" % p
+    else:
+      self.execute("""DELETE FROM closure WHERE p=?""", (p,))
+      from_s = from_o = "objs"
+    if p == owl_equivalentclass:
+      self.execute("""
+INSERT OR IGNORE INTO closure
+WITH RECURSIVE transit(s,o)
+AS (  SELECT objs.s,objs.o FROM %s WHERE objs.p IN (%s,%s)
+UNION SELECT objs.o,objs.s FROM %s WHERE objs.p=%s
+UNION SELECT transit.s, objs.o FROM transit, objs WHERE objs.s=transit.o AND objs.p IN (%s,%s)
+UNION SELECT transit.s, objs.s FROM transit, objs WHERE objs.o=transit.o AND objs.p=%s)
+SELECT %s, s, o FROM transit""" % (from_s, rdfs_subclassof, owl_equivalentclass, from_o, owl_equivalentclass, rdfs_subclassof, owl_equivalentclass, owl_equivalentclass, owl_equivalentclass))
+    else:
+      self.execute("""
+INSERT OR IGNORE INTO closure
+WITH RECURSIVE transit(s,o)
+AS (  SELECT objs.s,objs.o FROM %s WHERE objs.p=%s
+UNION SELECT transit.s, objs.o FROM transit, objs WHERE objs.s=transit.o AND objs.p=%s)
+SELECT %s, s, o FROM transit""" % (from_s, p, p, p))
+    self.execute("""DELETE FROM closure_work WHERE p=?""", (p,))
+    self.execute("""INSERT INTO closure VALUES (?,0,0)""", (p,)) # Marks the closure as up to date
+    
 
 
 
@@ -871,7 +1734,7 @@ class SubGraph(BaseSubGraph):
     BaseSubGraph.__init__(self, parent, onto)
     self.c      = c
     self.db     = db
-    self.execute          = db.execute
+    self.execute          = parent.execute
     self._abbreviate       = parent._abbreviate
     self._unabbreviate     = parent._unabbreviate
     self._new_numbered_iri = parent._new_numbered_iri
@@ -879,53 +1742,84 @@ class SubGraph(BaseSubGraph):
     self.parent.onto_2_subgraph[onto] = self
     self.read_only = parent.read_only
     
-  def import_triples_from_queue(self, queue, filename = None, delete_existing_triples = True):
+  def import_triples_from_queue(self, queue, filename = None, delete_existing_triples = True, incremental = False, progress = None):
     cur = self.db.cursor()
-    new_abbrevs = []
-
+    
     if not self.db.in_transaction: cur.execute("BEGIN")
-    if delete_existing_triples:
-      cur.execute("DELETE FROM objs WHERE c=?",  (self.c,))
-      cur.execute("DELETE FROM datas WHERE c=?", (self.c,))
-      
-    # Re-implement _abbreviate() for speed and blank node support
-    abbrevs = { "" : 60 }
-    #current_resource = max(self.execute("SELECT MAX(storid) FROM resources").fetchone()[0], 300) # First 300 values are reserved
-    current_resource = self.execute("SELECT current_resource FROM store").fetchone()[0]
-    def _abbreviate(iri):
-        nonlocal current_resource
-        storid = abbrevs.get(iri)
-        if storid is None:
-          if iri.startswith("_"): # A blank node
-            storid = abbrevs[iri] = self.parent.new_blank_node()
-          else:
-            r = cur.execute("SELECT storid FROM resources WHERE iri=? LIMIT 1", (iri,)).fetchone()
-            if r:
-              storid = abbrevs[iri] = r[0]
-            else:
-              current_resource += 1
-              storid = abbrevs[iri] = current_resource
-              new_abbrevs.append((storid, iri))
-        return storid
+    self.parent._invalidate_closure() # Rebuilt in bulk when needed, rather than updated for each triple
+    self.parent._invalidate_hierarchy_labels()
+    if incremental: # Parse in staging tables, then apply only the differences (see _apply_staged_triples())
+      cur.execute("CREATE TEMP TABLE IF NOT EXISTS staged_objs (s INTEGER, p INTEGER, o INTEGER)")
+      cur.execute("CREATE TEMP TABLE IF NOT EXISTS staged_datas (s INTEGER, p INTEGER, o BLOB, d INTEGER)")
+      cur.execute("DELETE FROM staged_objs")
+      cur.execute("DELETE FROM staged_datas")
+      insert_objs_sql  = "INSERT INTO staged_objs VALUES (?,?,?)"
+      insert_datas_sql = "INSERT INTO staged_datas VALUES (?,?,?,?)"
+    else:
+      if delete_existing_triples:
+        cur.execute("DELETE FROM objs WHERE c=?",  (self.c,))
+        cur.execute("DELETE FROM datas WHERE c=?", (self.c,))
+      insert_objs_sql  = "INSERT OR IGNORE INTO objs VALUES (%s,?,?,?)"    % self.c
+      insert_datas_sql = "INSERT OR IGNORE INTO datas VALUES (%s,?,?,?,?)" % self.c
       
+    abbrevs, abbreviate = self.parent._create_import_abbreviate(cur)
+    
     if filename: date = os.path.getmtime(filename)
     else:        date = time.time()
     
     def insert_objs(triples):
-      objs = [(_abbreviate(s), _abbreviate(p), _abbreviate(o)) for s, p, o in triples]
-      cur.executemany("INSERT OR IGNORE INTO objs VALUES (%s,?,?,?)" % self.c, objs)
-      if new_abbrevs:
-        cur.executemany("INSERT INTO resources VALUES (?,?)", new_abbrevs)
-        new_abbrevs.clear()
-        
+      t0   = time.perf_counter()
+      abbreviate(chain.from_iterable(triples))
+      objs = [(abbrevs[s], abbrevs[p], abbrevs[o]) for s, p, o in triples]
+      t1   = time.perf_counter()
+      cur.executemany(insert_objs_sql, objs)
+      if progress: progress.batch(len(objs), cur.rowcount, t1 - t0, time.perf_counter() - t1)
+      
     def insert_datas(triples):
-      datas = [(_abbreviate(s), _abbreviate(p), o, _abbreviate(d) if (d and (not d.startswith("@"))) else d or 60) for s, p, o, d in triples]
-      cur.executemany("INSERT OR IGNORE INTO datas VALUES (%s,?,?,?,?)" % self.c, datas)
-      if new_abbrevs:
-        cur.executemany("INSERT INTO resources VALUES (?,?)", new_abbrevs)
-        new_abbrevs.clear()
+      t0    = time.perf_counter()
+      abbreviate(chain.from_iterable((s, p, d) for s, p, o, d in triples))
+      datas = [(abbrevs[s], abbrevs[p], o, abbrevs[d]) for s, p, o, d in triples]
+      t1    = time.perf_counter()
+      cur.executemany(insert_datas_sql, datas)
+      if progress: progress.batch(len(datas), cur.rowcount, t1 - t0, time.perf_counter() - t1)
+      
+    # Batches encoded by parser workers (see driver._EncodingQueue): IRIs are replaced by local ids, and new IRIs are sent first
+    local_storids = [] # Local id => storid (or language tag)
+    def insert_iris(start, iris):
+      t0 = time.perf_counter()
+      del local_storids[start:]
+      abbreviate(iris)
+      local_storids.extend(map(abbrevs.__getitem__, iris))
+      if progress: progress.batch(0, 0, time.perf_counter() - t0, 0.0)
+      
+    def decode_ids(buffer):
+      ids = array("q")
+      ids.frombytes(buffer)
+      return iter(list(map(local_storids.__getitem__, ids)))
+    
+    def insert_encoded(command, args):
+      if   command == "iris":     insert_iris(*args)
+      elif command == "objs_ids":
+        t0      = time.perf_counter()
+        storids = decode_ids(args)
+        t1      = time.perf_counter()
+        cur.executemany(insert_objs_sql, zip(storids, storids, storids))
+        if progress: progress.batch(len(args) // 24, cur.rowcount, t1 - t0, time.perf_counter() - t1)
+      elif command == "datas_ids":
+        t0      = time.perf_counter()
+        buffer, values = args
+        storids = decode_ids(buffer)
+        t1      = time.perf_counter()
+        cur.executemany(insert_datas_sql, [(s, p, o, d) for s, p, d, o in zip(storids, storids, storids, values)])
+        if progress: progress.batch(len(values), cur.rowcount, t1 - t0, time.perf_counter() - t1)
+      elif command == "bytes_read":
+        if progress: progress.add_bytes_read(args)
         
     def finish():
+      if incremental:
+        t = time.perf_counter()
+        self.touched_storids = self._apply_staged_triples(cur)
+        if progress: progress.phase("diff", time.perf_counter() - t)
       onto_base_iri = cur.execute("SELECT resources.iri FROM objs, resources WHERE objs.c=? AND objs.o=? AND resources.storid=objs.s LIMIT 1", (self.c, owl_ontology)).fetchone()
       if onto_base_iri: onto_base_iri = onto_base_iri[0]
       else:             onto_base_iri = ""
@@ -938,10 +1832,11 @@ class SubGraph(BaseSubGraph):
       else:
         cur.execute("UPDATE ontologies SET last_update=? WHERE c=?", (date, self.c,))
         
-      cur.execute("UPDATE store SET current_resource=?", (current_resource,))
-      
       self.parent.select_abbreviate_method()
-      self.parent.analyze()
+      self.parent._update_closure()
+      t = time.perf_counter()
+      self.parent.analyze(False)
+      if progress: progress.phase("analyze", time.perf_counter() - t)
       return onto_base_iri
     
     if queue:
@@ -959,8 +1854,84 @@ class SubGraph(BaseSubGraph):
           import owlready2
           raise owlready2.OwlReadyOntologyParsingError(*triples)
         
-    return insert_objs, insert_datas, finish
+        else: insert_encoded(command, triples)
+        
+    return insert_objs, insert_datas, finish, insert_encoded
 
+  def _apply_staged_triples(self, cur):
+    """replaces the triples of the ontology by those in the staging tables, by deleting and inserting only the differences.
+Blank nodes are matched by content, since they get new storids when parsed. Returns the set of the modified storids."""
+    canonical  = {}
+    signatures = []
+    parents    = defaultdict(set)  # Blank node => (subject, predicate) referring to it
+    children   = defaultdict(list) # Blank node => blank nodes it refers to
+    for objs_table, datas_table, where in [("objs", "datas", "c=%s AND " % self.c), ("staged_objs", "staged_datas", "")]:
+      for o, s, p in cur.execute("SELECT o,s,p FROM %s WHERE %so<0" % (objs_table, where)):
+        parents[o].add((s, p))
+        if s < 0: children[s].append(o)
+      signatures.append(_blank_node_signatures(
+        cur.execute("SELECT s,p,o FROM %s WHERE %ss<0"   % (objs_table,  where)).fetchall(),
+        cur.execute("SELECT s,p,o,d FROM %s WHERE %ss<0" % (datas_table, where)).fetchall(), canonical))
+    old_signatures, new_signatures = signatures
+    
+    if new_signatures:
+      # Match blank nodes having the same content and referred by the same entities, parents first
+      bnode_map = {}
+      def key(bnode, signature):
+        l = parents.get(bnode)
+        if not l:      return signature
+        if len(l) > 1: return signature, tuple(sorted((bnode_map.get(s, s), p) for s, p in l))
+        for s, p in l: return signature, bnode_map.get(s, s), p
+      olds_by_key = defaultdict(list)
+      for old, signature in old_signatures.items(): olds_by_key[key(old, signature)].append(old)
+      
+      nb_bnode_parents = { bnode : sum(s < 0 for s, p in parents.get(bnode, ())) for bnode in new_signatures }
+      ordered = [bnode for bnode, nb in nb_bnode_parents.items() if nb == 0]
+      for bnode in ordered: # Topological order; ordered grows during the loop
+        for child in children.get(bnode, ()):
+          if child in nb_bnode_parents:
+            nb_bnode_parents[child] -= 1
+            if nb_bnode_parents[child] == 0: ordered.append(child)
+      if len(ordered) < len(new_signatures): ordered.extend(set(new_signatures).difference(ordered)) # Cycles
+      
+      unmatched = []
+      for bnode in ordered:
+        olds = olds_by_key.get(key(bnode, new_signatures[bnode]))
+        if olds: bnode_map[bnode] = olds.pop()
+        else:    unmatched.append(bnode)
+        
+      if unmatched: # Then, any old blank node having the same content
+        used = set(bnode_map.values())
+        olds_by_signature = defaultdict(list)
+        for old, signature in old_signatures.items():
+          if not old in used: olds_by_signature[signature].append(old)
+        for bnode in unmatched:
+          olds = olds_by_signature.get(new_signatures[bnode])
+          if olds: bnode_map[bnode] = olds.pop()
+          
+      cur.execute("CREATE TEMP TABLE IF NOT EXISTS staged_bnodes (new INTEGER PRIMARY KEY, old INTEGER)")
+      cur.execute("DELETE FROM staged_bnodes")
+      cur.executemany("INSERT INTO staged_bnodes VALUES (?,?)", bnode_map.items())
+      for table, column in [("staged_objs", "s"), ("staged_objs", "o"), ("staged_datas", "s")]:
+        cur.execute("UPDATE %s SET %s=(SELECT old FROM staged_bnodes WHERE new=%s) WHERE %s<0 AND %s IN (SELECT new FROM staged_bnodes)" % (table, column, column, column, column))
+        
+    removed_objs  = cur.execute("SELECT s,p,o FROM objs WHERE c=? EXCEPT SELECT s,p,o FROM staged_objs", (self.c,)).fetchall()
+    added_objs    = cur.execute("SELECT s,p,o FROM staged_objs EXCEPT SELECT s,p,o FROM objs WHERE c=?", (self.c,)).fetchall()
+    removed_datas = cur.execute("SELECT s,p,o,d FROM datas WHERE c=? EXCEPT SELECT s,p,o,d FROM staged_datas", (self.c,)).fetchall()
+    added_datas   = cur.execute("SELECT s,p,o,d FROM staged_datas EXCEPT SELECT s,p,o,d FROM datas WHERE c=?", (self.c,)).fetchall()
+    
+    cur.executemany("DELETE FROM objs WHERE c=%s AND s=? AND p=? AND o=?" % self.c, removed_objs)
+    cur.executemany("DELETE FROM datas WHERE c=%s AND s=? AND p=? AND o=? AND d=?" % self.c, removed_datas)
+    cur.executemany("INSERT OR IGNORE INTO objs VALUES (%s,?,?,?)" % self.c, added_objs)
+    cur.executemany("INSERT OR IGNORE INTO datas VALUES (%s,?,?,?,?)" % self.c, added_datas)
+    cur.execute("DELETE FROM staged_objs")
+    cur.execute("DELETE FROM staged_datas")
+    
+    touched = set()
+    for s, p, o    in chain(removed_objs, added_objs):   touched.add(s); touched.add(o)
+    for s, p, o, d in chain(removed_datas, added_datas): touched.add(s)
+    return touched
+  
   def create_parse_func(self, filename = None, delete_existing_triples = True, datatype_attr = "http://www.w3.org/1999/02/22-rdf-syntax-ns#datatype"):
     objs         = []
     datas        = []
@@ -969,24 +1940,23 @@ class SubGraph(BaseSubGraph):
     cur = self.db.cursor()
     
     if not self.db.in_transaction: cur.execute("BEGIN")
+    self.parent._invalidate_closure() # Rebuilt in bulk when needed, rather than updated for each triple
+    self.parent._invalidate_hierarchy_labels()
     if delete_existing_triples:
       cur.execute("DELETE FROM objs WHERE c=?", (self.c,))
       cur.execute("DELETE FROM datas WHERE c=?", (self.c,))
       
     # Re-implement _abbreviate() for speed
-    abbrevs = {}
-    #current_resource = max(self.execute("SELECT MAX(storid) FROM resources").fetchone()[0], 300) # First 300 values are reserved
-    current_resource = self.execute("SELECT current_resource FROM store").fetchone()[0]
+    abbrevs    = {}
+    new_storid = self.parent._new_storid
     def _abbreviate(iri):
-        nonlocal current_resource
         storid = abbrevs.get(iri)
         if not storid is None: return storid
         r = cur.execute("SELECT storid FROM resources WHERE iri=? LIMIT 1", (iri,)).fetchone()
         if r:
           abbrevs[iri] = r[0]
           return r[0]
-        current_resource += 1
-        storid = current_resource
+        storid = new_storid()
         new_abbrevs.append((storid, iri))
         abbrevs[iri] = storid
         return storid
@@ -1038,10 +2008,9 @@ class SubGraph(BaseSubGraph):
       else:
         cur.execute("UPDATE ontologies SET last_update=? WHERE c=?", (date, self.c,))
         
-      cur.execute("UPDATE store SET current_resource=?", (current_resource,))
-      
       self.parent.select_abbreviate_method()
-      self.parent.analyze()
+      self.parent._update_closure()
+      self.parent.analyze(False)
       
       return onto_base_iri
     
@@ -1060,25 +2029,31 @@ class SubGraph(BaseSubGraph):
     if not self.read_only: self.execute("UPDATE ontologies SET last_update=? WHERE c=?", (t, self.c))
     
   def destroy(self):
+    self.parent._invalidate_hierarchy_labels()
     self.execute("DELETE FROM objs WHERE c=?",       (self.c,))
     self.execute("DELETE FROM datas WHERE c=?",      (self.c,))
     self.execute("DELETE FROM ontologies WHERE c=?", (self.c,))
+    self.parent._update_closure()
     
   def _set_obj_triple_raw_spo(self, s, p, o):
     if (s is None) or (p is None) or (o is None): raise ValueError
+    if (p == rdfs_subclassof) or (p == rdfs_subpropertyof): self.parent._invalidate_hierarchy_labels(p)
     #self.execute("DELETE FROM objs WHERE c=? AND s=? AND p=?", (self.c, s, p,))
     self.execute("DELETE FROM objs WHERE s=? AND p=?", (s, p,))
     self.execute("INSERT INTO objs VALUES (?, ?, ?, ?)", (self.c, s, p, o))
+    if self.parent.transitive_closure and (p in _CLOSURE_PREDICATES): self.parent._update_closure()
     self.parent.nb_added_triples += 1
-    if self.parent.nb_added_triples > 1000: self.parent.analyze()
+    if self.parent.nb_added_triples > self.parent.analyze_threshold: self.parent.analyze(False)
     
   def _add_obj_triple_raw_spo(self, s, p, o):
     if (s is None) or (p is None) or (o is None): raise ValueError
+    if (p == rdfs_subclassof) or (p == rdfs_subpropertyof): self.parent._invalidate_hierarchy_labels(p)
     self.execute("INSERT OR IGNORE INTO objs VALUES (?, ?, ?, ?)", (self.c, s, p, o))
     self.parent.nb_added_triples += 1
-    if self.parent.nb_added_triples > 1000: self.parent.analyze()
+    if self.parent.nb_added_triples > self.parent.analyze_threshold: self.parent.analyze(False)
     
   def _del_obj_triple_raw_spo(self, s = None, p = None, o = None):
+    if (p is None) or (p == rdfs_subclassof) or (p == rdfs_subpropertyof): self.parent._invalidate_hierarchy_labels(p)
     if s is None:
       if p is None:
         if o is None: self.execute("DELETE FROM objs WHERE c=?", (self.c,))
@@ -1093,20 +2068,21 @@ class SubGraph(BaseSubGraph):
       else:
         if o is None: self.execute("DELETE FROM objs WHERE c=? AND s=? AND p=?", (self.c, s, p,))
         else:         self.execute("DELETE FROM objs INDEXED BY index_objs_sp WHERE c=? AND s=? AND p=? AND o=?", (self.c, s, p, o,))
-        
+    if self.parent.transitive_closure and ((p is None) or (p in _CLOSURE_PREDICATES)): self.parent._update_closure()
+    
   def _set_data_triple_raw_spod(self, s, p, o, d):
     if (s is None) or (p is None) or (o is None) or (d is None): raise ValueError
     #self.execute("DELETE FROM datas WHERE c=? AND s=? AND p=?", (self.c, s, p,))
     self.execute("DELETE FROM datas WHERE s=? AND p=?", (s, p,))
     self.execute("INSERT INTO datas VALUES (?, ?, ?, ?, ?)", (self.c, s, p, o, d))
     self.parent.nb_added_triples += 1
-    if self.parent.nb_added_triples > 1000: self.parent.analyze()
+    if self.parent.nb_added_triples > self.parent.analyze_threshold: self.parent.analyze(False)
 
   def _add_data_triple_raw_spod(self, s, p, o, d):
     if (s is None) or (p is None) or (o is None) or (d is None): raise ValueError
     self.execute("INSERT OR IGNORE INTO datas VALUES (?, ?, ?, ?, ?)", (self.c, s, p, o, d))
     self.parent.nb_added_triples += 1
-    if self.parent.nb_added_triples > 1000: self.parent.analyze()
+    if self.parent.nb_added_triples > self.parent.analyze_threshold: self.parent.analyze(False)
     
   def _del_data_triple_raw_spod(self, s, p, o, d):
     if s is None:
@@ -1265,12 +2241,49 @@ class SubGraph(BaseSubGraph):
     
   def _get_data_triples_sp_od(self, s, p):
     return self.execute("SELECT o,d FROM datas WHERE c=? AND s=? AND p=?", (self.c, s, p)).fetchall()
+  
+  def _get_obj_triples_ssp_so(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o FROM objs WHERE c=? AND s IN (%s) AND p=?", ss, lambda chunk: (self.c, *chunk, p)))
+  
+  def _get_obj_triples_ssp_sco(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,c,o FROM objs WHERE c=? AND s IN (%s) AND p=?", ss, lambda chunk: (self.c, *chunk, p)))
+  
+  def _get_obj_triples_sspi_so(self, ss, p, i):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o FROM objs WHERE c=? AND s IN (%s) AND p=? UNION SELECT o,s FROM objs WHERE c=? AND p=? AND o IN (%s)", ss, lambda chunk: (self.c, *chunk, p, self.c, i, *chunk)))
+  
+  def _get_data_triples_ssp_sod(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o,d FROM datas WHERE c=? AND s IN (%s) AND p=?", ss, lambda chunk: (self.c, *chunk, p)))
+  
+  def _get_triples_ssp_sod(self, ss, p):
+    return _group_rows(_execute_batched(self.execute, "SELECT s,o,d FROM quads WHERE c=? AND s IN (%s) AND p=?", ss, lambda chunk: (self.c, *chunk, p)))
+  
+  def _get_obj_triples_ssps_spo(self, ss, ps):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT s,p,o FROM objs WHERE c=? AND s IN (%%s) AND p IN (%s)" % ",".join("?" * len(ps)), ss, lambda chunk: (self.c, *chunk, *ps)), 2)
+  
+  def _get_data_triples_ssps_spod(self, ss, ps):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT s,p,o,d FROM datas WHERE c=? AND s IN (%%s) AND p IN (%s)" % ",".join("?" * len(ps)), ss, lambda chunk: (self.c, *chunk, *ps)), 2)
+  
+  def _get_triples_ssps_spod(self, ss, ps):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT s,p,o,d FROM quads WHERE c=? AND s IN (%%s) AND p IN (%s)" % ",".join("?" * len(ps)), ss, lambda chunk: (self.c, *chunk, *ps)), 2)
+  
+  def _get_obj_triples_psos_pos(self, ps, os):
+    ps = tuple(ps)
+    return _group_rows(_execute_batched(self.execute, "SELECT p,o,s FROM objs WHERE c=? AND p IN (%s) AND o IN (%%s)" % ",".join("?" * len(ps)), os, lambda chunk: (self.c, *ps, *chunk)), 2)
 
   def _get_data_triples_s_pod(self, s):
     return self.execute("SELECT p,o,d FROM datas WHERE c=? AND s=?", (self.c, s)).fetchall()
     
   def _get_triples_s_pod(self, s):
     return self.execute("SELECT p,o,d FROM quads WHERE c=? AND s=?", (self.c, s)).fetchall()
+    
+  def _get_triples_ps_spod(self, ps):
+    return self.execute("SELECT s,p,o,d FROM quads WHERE c=? AND p IN (%s)" % ",".join("?" * len(ps)), (self.c, *ps)).fetchall()
+    
+  def _get_shared_blank_nodes(self):
+    return { x for (x,) in self.execute("SELECT o FROM objs WHERE c=? AND o<0 GROUP BY o HAVING COUNT()>1", (self.c,)).fetchall() }
    
   def _get_obj_triples_po_s(self, p, o):
     for (x,) in self.execute("SELECT s FROM objs WHERE c=? AND p=? AND o=?", (self.c, p, o)).fetchall(): yield x
@@ -1322,6 +2335,8 @@ class SubGraph(BaseSubGraph):
   def _iter_triples(self, quads = False, sort_by_s = False):
     return self.parent._iter_triples(quads, sort_by_s, self.c)
   
+  def _save_ntriples(self, f, quads = False, parallel = False): self.parent._save_ntriples(f, quads, False, self.c)
+  
   def _refactor(self, storid, new_iri): return self.parent._refactor(storid, new_iri)
     
   def _refactor_onto(self, storid, old_base_iri, new_base_iri): return self.parent._refactor_onto(storid, old_base_iri, new_base_iri)
@@ -1357,7 +2372,8 @@ class _SearchMixin(list):
   
   def sql_request(self):
     transits, sql, params = self.sql_components()
-    if transits: sql = "WITH RECURSIVE %s %s" % (", ".join(transits), sql)
+    if transits:
+      sql = "WITH RECURSIVE %s %s" % (", ".join(transits), sql)
     return sql, params
     
   def _do_search(self):
@@ -1477,7 +2493,19 @@ class _SearchList(FirstList, _SearchMixin, _LazyListMixin):
         else:
           if isinstance(v, Or): v = "), (".join(str(c.storid) for c in v.Classes)
           transit_name = "transit_%s" % i
-          self.transits.append("""%s(x)
+          if world.graph.transitive_closure: # If the closure is not up to date, it is empty and the last SELECT is used instead
+            self.transits.append("""%s_classes(x)
+AS (      VALUES (%s)
+UNION     SELECT s FROM closure WHERE p=%s AND o IN (%s)
+UNION     SELECT objs.s FROM objs, %s_classes WHERE NOT EXISTS (SELECT 1 FROM closure WHERE p=%s AND s=0 AND o=0) AND objs.o=%s_classes.x AND objs.p=%s),
+%s(x)
+AS (      SELECT x FROM %s_classes
+UNION ALL SELECT objs.s FROM objs, %s_classes WHERE objs.o=%s_classes.x AND objs.p=%s)
+""" % (transit_name, v, rdfs_subclassof, str(v).replace("), (", ", "),
+       transit_name, rdfs_subclassof, transit_name, rdfs_subclassof,
+       transit_name, transit_name, transit_name, transit_name, rdf_type))
+          else:
+            self.transits.append("""%s(x)
 AS (      VALUES (%s)
 UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p IN (%s, %s))
 """ % (transit_name, v,
@@ -1498,7 +2526,15 @@ UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p IN (%s, %s))
         else:
           if isinstance(v, Or): v = "), (".join(str(c.storid) for c in v.Classes)
           transit_name = "transit_%s" % i
-          self.transits.append("""%s(x)
+          if world.graph.transitive_closure: # If the closure is not up to date, it is empty and the last SELECT is used instead
+            self.transits.append("""%s(x)
+AS (      VALUES (%s)
+UNION     SELECT s FROM closure WHERE p=%s AND o IN (%s)
+UNION     SELECT objs.s FROM objs, %s WHERE NOT EXISTS (SELECT 1 FROM closure WHERE p=%s AND s=0 AND o=0) AND objs.o=%s.x AND objs.p=%s)
+""" % (transit_name, v, rdfs_subclassof, str(v).replace("), (", ", "),
+       transit_name, rdfs_subclassof, transit_name, rdfs_subclassof))
+          else:
+            self.transits.append("""%s(x)
 AS (      VALUES (%s)
 UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p=%s)
 """ % (transit_name, v, transit_name, transit_name, rdfs_subclassof))
@@ -1518,7 +2554,15 @@ UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p=%s)
         else:
           if isinstance(v, Or): v = "), (".join(str(c.storid) for c in v.Classes)
           transit_name = "transit_%s" % i
-          self.transits.append("""%s(x)
+          if world.graph.transitive_closure: # If the closure is not up to date, it is empty and the last SELECT is used instead
+            self.transits.append("""%s(x)
+AS (      VALUES (%s)
+UNION     SELECT s FROM closure WHERE p=%s AND o IN (%s)
+UNION     SELECT objs.s FROM objs, %s WHERE NOT EXISTS (SELECT 1 FROM closure WHERE p=%s AND s=0 AND o=0) AND objs.o=%s.x AND objs.p=%s)
+""" % (transit_name, v, rdfs_subclassof, str(v).replace("), (", ", "),
+       transit_name, rdfs_subclassof, transit_name, rdfs_subclassof))
+          else:
+            self.transits.append("""%s(x)
 AS (      VALUES (%s)
 UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p=%s)
 """ % (transit_name, v, transit_name, transit_name, rdfs_subclassof))
@@ -1538,7 +2582,15 @@ UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p=%s)
         else:
           if isinstance(v, Or): v = "), (".join(str(c.storid) for c in v.Classes)
           transit_name = "transit_%s" % i
-          self.transits.append("""%s(x)
+          if world.graph.transitive_closure: # If the closure is not up to date, it is empty and the last SELECT is used instead
+            self.transits.append("""%s(x)
+AS (      VALUES (%s)
+UNION     SELECT s FROM closure WHERE p=%s AND o IN (%s)
+UNION     SELECT objs.s FROM objs, %s WHERE NOT EXISTS (SELECT 1 FROM closure WHERE p=%s AND s=0 AND o=0) AND objs.o=%s.x AND objs.p=%s)
+""" % (transit_name, v, rdfs_subpropertyof, str(v).replace("), (", ", "),
+       transit_name, rdfs_subpropertyof, transit_name, rdfs_subpropertyof))
+          else:
+            self.transits.append("""%s(x)
 AS (      VALUES (%s)
 UNION ALL SELECT objs.s FROM objs, %s WHERE objs.o=%s.x AND objs.p=%s)
 """ % (transit_name, v, transit_name, transit_name, rdfs_subpropertyof))
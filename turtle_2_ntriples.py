@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+# Owlready2
+# Copyright (C) 2013-2019 Jean-Baptiste LAMY
+# LIMICS (Laboratoire d'informatique médicale et d'ingénierie des connaissances en santé), UMR_S 1142
+# University Paris 13, Sorbonne paris-Cité, Bobigny, France
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys, re, codecs
+from collections import defaultdict
+from urllib.parse import urljoin
+
+try:
+  from owlready2.base import OwlReadyOntologyParsingError
+except:
+  class OwlReadyOntologyParsingError(Exception): pass
+
+INT_DATATYPES   = { "http://www.w3.org/2001/XMLSchema#integer", "http://www.w3.org/2001/XMLSchema#byte", "http://www.w3.org/2001/XMLSchema#short", "http://www.w3.org/2001/XMLSchema#int", "http://www.w3.org/2001/XMLSchema#long", "http://www.w3.org/2001/XMLSchema#unsignedByte", "http://www.w3.org/2001/XMLSchema#unsignedShort", "http://www.w3.org/2001/XMLSchema#unsignedInt", "http://www.w3.org/2001/XMLSchema#unsignedLong", "http://www.w3.org/2001/XMLSchema#negativeInteger", "http://www.w3.org/2001/XMLSchema#nonNegativeInteger", "http://www.w3.org/2001/XMLSchema#positiveInteger" }
+FLOAT_DATATYPES = { "http://www.w3.org/2001/XMLSchema#decimal", "http://www.w3.org/2001/XMLSchema#double", "http://www.w3.org/2001/XMLSchema#float", "http://www.w3.org/2002/07/owl#real" }
+
+RDF_TYPE  = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDF_FIRST = "http://www.w3.org/1999/02/22-rdf-syntax-ns#first"
+RDF_REST  = "http://www.w3.org/1999/02/22-rdf-syntax-ns#rest"
+RDF_NIL   = "http://www.w3.org/1999/02/22-rdf-syntax-ns#nil"
+
+_CHUNK_SIZE = 1048576
+_MARGIN     = 4096 # Minimum number of characters ahead of the current token, to avoid cutting it at the end of the buffer
+
+_LOCAL_ESCAPE = r"""\\[_~.!$&'()*+,;=/?\#@%-]"""
+TOKEN = re.compile(r"""(?:\s+|\#[^\n]*)*(?:
+  <(?P<iri>[^<>"{}|^`\x00-\x20]*)>
+| \"\"\"(?P<long1>(?:[^"\\]|\\.|"(?!""))*)\"\"\"
+| '''(?P<long2>(?:[^'\\]|\\.|'(?!''))*)'''
+| (?P<unclosed>\"\"\"|''')
+| "(?P<string1>(?:[^"\\\n\r]|\\.)*)"
+| '(?P<string2>(?:[^'\\\n\r]|\\.)*)'
+| @(?P<at>[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+| (?P<datatype>\^\^)
+| (?P<double>[+-]?(?:\d+\.\d*[eE][+-]?\d+|\.\d+[eE][+-]?\d+|\d+[eE][+-]?\d+))
+| (?P<decimal>[+-]?\d*\.\d+)
+| (?P<integer>[+-]?\d+)
+| _:(?P<bnode>\w(?:[\w.-]*[\w-])?)
+| (?P<pname>(?:[^\W\d_](?:[\w.-]*[\w-])?)?:(?:(?:[\w:%%-]|%s)(?:(?:[\w.:%%-]|%s)*(?:[\w:%%-]|%s))?)?)
+| (?P<word>[A-Za-z]+)
+| (?P<punct>[.;,\[\]()\{\}])
+| (?P<end>\Z)
+)""" % (_LOCAL_ESCAPE, _LOCAL_ESCAPE, _LOCAL_ESCAPE), re.X)
+
+_ESCAPE  = re.compile(r"""\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))""", re.S)
+_ESCAPES = { "t" : "\t", "b" : "\b", "n" : "\n", "r" : "\r", "f" : "\f" }
+def _unescape_match(m):
+  if m.group(3) is None: return chr(int(m.group(1) or m.group(2), 16))
+  return _ESCAPES.get(m.group(3), m.group(3))
+
+def unescape(s):
+  if "\\" in s: return _ESCAPE.sub(_unescape_match, s)
+  return s
+
+_SCHEME = re.compile(r"""[A-Za-z][A-Za-z0-9+.-]*:""")
+
+
+def parse(f, on_prepare_obj = None, on_prepare_data = None, new_blank = None, default_base = ""):
+  """parses a Turtle or TriG file incrementally, calling on_prepare_obj(s,p,o) and on_prepare_data(s,p,o,d) for each triple.
+The triples of the named graphs of TriG files are merged with those of the default graph."""
+  prefixes      = {}
+  base          = default_base[:-1] if default_base.endswith("#") else default_base
+  current_blank = 0
+  nb_triple     = 0
+  
+  if not on_prepare_obj:
+    def on_prepare_obj(s,p,o):
+      nonlocal nb_triple
+      nb_triple += 1
+      if not s.startswith("_"): s = "<%s>" % s
+      if not o.startswith("_"): o = "<%s>" % o
+      print("%s %s %s ." % (s,"<%s>" % p,o))
+    
+    def on_prepare_data(s,p,o,d):
+      nonlocal nb_triple
+      nb_triple += 1
+      if not s.startswith("_"): s = "<%s>" % s
+      
+      if isinstance(o, str): o = o.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+      if d and d.startswith("@"):
+        print('%s %s "%s"%s .' % (s,"<%s>" % p,o,d))
+      elif d:
+        print('%s %s "%s"^^<%s> .' % (s,"<%s>" % p,o,d))
+      else:
+        print('%s %s "%s" .' % (s,"<%s>" % p,o))
+  
+  if not new_blank:
+    def new_blank():
+      nonlocal current_blank
+      current_blank += 1
+      return "_:%s" % current_blank
+  
+  label_2_blank = defaultdict(new_blank)
+  
+  # Tokenizer, reading the file by chunks
+  
+  decoder    = codecs.getincrementaldecoder("utf8")()
+  buffer     = ""
+  pos        = 0
+  eof        = False
+  line_start = 1 # Line number at the beginning of buffer
+  
+  def read_more():
+    nonlocal buffer, pos, eof, line_start
+    data = f.read(_CHUNK_SIZE)
+    eof  = not data
+    if isinstance(data, bytes): data = decoder.decode(data, eof)
+    line_start += buffer.count("\n", 0, pos)
+    if (not buffer) and (line_start == 1) and data.startswith("\ufeff"): data = data[1:] # Ignore byte-order mask
+    buffer = buffer[pos:] + data
+    pos    = 0
+  
+  def tokens():
+    nonlocal pos
+    match = TOKEN.match
+    while True:
+      while (not eof) and (len(buffer) - pos < _MARGIN): read_more()
+      current = buffer
+      size    = len(current)
+      limit   = size if eof else size - _MARGIN
+      while pos <= limit:
+        m = match(current, pos)
+        if (m is None) or (m.lastgroup == "unclosed") or ((m.end() == size) and not eof): break
+        kind = m.lastgroup
+        if kind == "end": return
+        pos = m.end()
+        yield kind, m.group(kind)
+      else:
+        continue
+      if eof: raise ValueError("Unexpected character '%s'" % current[pos])
+      read_more()
+  
+  def current_line(): return line_start + buffer.count("\n", 0, pos)
+  
+  token_iter = tokens()
+  kind = value = None
+  def next_token():
+    nonlocal kind, value
+    kind, value = next(token_iter, (None, None))
+  
+  def expect(punct):
+    if (kind != "punct") or (value != punct): raise ValueError("Expected '%s', got '%s'" % (punct, value))
+    next_token()
+  
+  # Parser
+  
+  def resolve(iri):
+    iri = unescape(iri)
+    if _SCHEME.match(iri) or not base: return iri
+    if iri.startswith("#"): return "%s%s" % (base.split("#", 1)[0], iri)
+    return urljoin(base, iri)
+  
+  def expand(pname):
+    prefix, local = pname.split(":", 1)
+    if not prefix in prefixes: raise ValueError("Undefined prefix '%s:'" % prefix)
+    return "%s%s" % (prefixes[prefix], unescape(local))
+  
+  def parse_iri():
+    if   kind == "iri":   iri = resolve(value)
+    elif kind == "pname": iri = expand(value)
+    else: raise ValueError("Expected IRI, got '%s'" % value)
+    next_token()
+    return iri
+  
+  def parse_collection():
+    next_token()
+    items = []
+    while not ((kind == "punct") and (value == ")")):
+      if kind is None: raise ValueError("Unterminated collection")
+      items.append(parse_object())
+    next_token()
+    if not items: return RDF_NIL
+    bn = bn0 = new_blank()
+    for i, item in enumerate(items):
+      if isinstance(item, tuple): on_prepare_data(bn, RDF_FIRST, *item)
+      else:                       on_prepare_obj (bn, RDF_FIRST, item)
+      if i == len(items) - 1:
+        on_prepare_obj(bn, RDF_REST, RDF_NIL)
+      else:
+        bn_next = new_blank()
+        on_prepare_obj(bn, RDF_REST, bn_next)
+        bn = bn_next
+    return bn0
+  
+  def parse_blank_node_property_list():
+    next_token()
+    bn = new_blank()
+    if not ((kind == "punct") and (value == "]")): parse_predicate_object_list(bn)
+    expect("]")
+    return bn
+  
+  def parse_subject():
+    if   kind == "bnode":
+      s = label_2_blank[value]
+      next_token()
+      return s
+    elif kind == "punct":
+      if value == "[": return parse_blank_node_property_list()
+      if value == "(": return parse_collection()
+    return parse_iri()
+  
+  def parse_object():
+    # Returns the object IRI or blank node, or a (value, datatype) tuple for literals
+    if kind in ("string1", "string2", "long1", "long2"):
+      o = unescape(value)
+      next_token()
+      if   kind == "at":
+        d = "@%s" % value
+        next_token()
+      elif kind == "datatype":
+        next_token()
+        d = parse_iri()
+        if   d in INT_DATATYPES:   o = int  (o)
+        elif d in FLOAT_DATATYPES: o = float(o)
+      else:
+        d = ""
+      return o, d
+    if kind == "integer":
+      o = int(value)
+      next_token()
+      return o, "http://www.w3.org/2001/XMLSchema#integer"
+    if kind == "decimal":
+      o = float(value)
+      next_token()
+      return o, "http://www.w3.org/2001/XMLSchema#decimal"
+    if kind == "double":
+      o = float(value)
+      next_token()
+      return o, "http://www.w3.org/2001/XMLSchema#double"
+    if (kind == "word") and ((value == "true") or (value == "false")):
+      o = value
+      next_token()
+      return o, "http://www.w3.org/2001/XMLSchema#boolean"
+    return parse_subject()
+  
+  def parse_predicate_object_list(s):
+    while True:
+      if (kind == "word") and (value == "a"):
+        p = RDF_TYPE
+        next_token()
+      else:
+        p = parse_iri()
+      while True:
+        o = parse_object()
+        if isinstance(o, tuple): on_prepare_data(s, p, *o)
+        else:                    on_prepare_obj (s, p, o)
+        if (kind == "punct") and (value == ","): next_token()
+        else: break
+      if not ((kind == "punct") and (value == ";")): return
+      while (kind == "punct") and (value == ";"): next_token()
+      if (kind == "punct") and (value in ".]}"): return
+      if kind is None: return
+  
+  def parse_triples(s = None):
+    # The subject may have been parsed already, when looking for a TriG graph name
+    if s is None:
+      is_property_list = (kind == "punct") and (value == "[")
+      s = parse_subject()
+    else:
+      is_property_list = False
+    if is_property_list and (kind == "punct") and (value in ".{}"): return
+    parse_predicate_object_list(s)
+  
+  def parse_graph_block():
+    expect("{")
+    while not ((kind == "punct") and (value == "}")):
+      if kind is None: raise ValueError("Unterminated graph")
+      parse_triples()
+      if (kind == "punct") and (value == "."): next_token()
+      elif not ((kind == "punct") and (value == "}")): raise ValueError("Expected '.' or '}', got '%s'" % value)
+    next_token()
+  
+  def parse_directive(directive, sparql_style):
+    nonlocal base
+    if directive == "prefix":
+      if kind != "pname" or not value.endswith(":"): raise ValueError("Expected prefix, got '%s'" % value)
+      prefix = value[:-1]
+      next_token()
+      if kind != "iri": raise ValueError("Expected IRI, got '%s'" % value)
+      prefixes[prefix] = resolve(value)
+    else:
+      if kind != "iri": raise ValueError("Expected IRI, got '%s'" % value)
+      base = resolve(value)
+    next_token()
+    if not sparql_style: expect(".")
+  
+  try:
+    next_token()
+    while kind is not None:
+      if   (kind == "at") and (value in ("prefix", "base")):
+        directive = value
+        next_token()
+        parse_directive(directive, False)
+      elif (kind == "word") and (value.lower() in ("prefix", "base")):
+        directive = value.lower()
+        next_token()
+        parse_directive(directive, True)
+      elif (kind == "word") and (value.lower() == "graph"):
+        next_token()
+        parse_subject()
+        parse_graph_block()
+      elif (kind == "punct") and (value == "{"):
+        parse_graph_block()
+      elif kind in ("iri", "pname", "bnode"):
+        s = parse_subject()
+        if (kind == "punct") and (value == "{"): parse_graph_block() # TriG named graph
+        else:
+          parse_triples(s)
+          expect(".")
+      else:
+        parse_triples()
+        if (kind == "punct") and (value == "{"): parse_graph_block() # TriG graph named by a blank node
+        else: expect(".")
+  
+  except Exception as e:
+    raise OwlReadyOntologyParsingError("Turtle parsing error in file %s, line %s: %s." % (getattr(f, "name", getattr(f, "url", "???")), current_line(), e)) from e
+  
+  return nb_triple
+
+
+if __name__ == "__main__":
+  filename = sys.argv[-1]
+  
+  import time
+  t = time.time()
+  with open(filename, "rb") as f: nb_triple = parse(f)
+  t = time.time() - t
+  print("# %s triples read in %ss" % (nb_triple, t), file = sys.stderr)